@@ -1,10 +1,198 @@
 import os
+import hashlib
 import io
-import json
+import itertools
+import mmap
 import re
 import sqlite3
-import urllib.request
-from pypdf import PdfReader
+import sys
+import time
+import urllib.parse
+from assignment0.cache import PAGE_CACHE
+from assignment0.dedup import INCIDENT_KEY_FILTER
+from assignment0.instrumentation import METRICS
+from assignment0.output import JSON_WRITER
+from assignment0.queries import (
+    NATURE_RECOUNT_QUERY, SCHEMA_VERSION, build_incident_query, check_nature_counts, is_partitioned,
+    location_trigrams, parse_minute, partition_month, partition_table, partition_tables, print_record,
+    prune_partitions, query_incidents, search_locations, status
+)
+from assignment0.records import FIELDS, Incident, incident_row, incident_timestamp, iso_date
+from assignment0.vocabulary import NATURE_VOCABULARY
+
+# HTTP headers to simulate a request from a web browser
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (X11; Linux i686) AppleWebKit/537.17 (KHTML, like Gecko) Chrome/24.0.1312.27 "
+                  "Safari/537.17"
+}
+
+# version of the page parser, part of the parsed page cache key so a parser change never serves stale pages
+PARSER_VERSION = 3
+
+# connection settings applied while bulk loading incidents
+LOAD_PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    ("cache_size", -64000),
+    ("temp_store", "MEMORY"),
+)
+
+# pages of the report being extracted that failed and were skipped, as (page number, error), cleared per report
+QUARANTINED_PAGES = []
+
+# last date on a page, found by backtracking from the end of the page
+LAST_DATE_PATTERN = re.compile(r"(?s:.*)(?<!\d)(\d{1,2}/\d{1,2}/\d{4})")
+
+# fixed fields of an incident: date, time, incident number with any location text glued
+# to it, location and nature tokens and the ORI, the last token before the next date
+RECORD_PATTERN = re.compile(
+    r"(?<!\d)(\d{1,2}/\d{1,2}/\d{4})\s+(\S+)\s+(\d{4}-\d{8})(\S*)"
+    r"((?:\s+(?!\d{1,2}/\d{1,2}/\d{4})\S+)*)\s+((?!\d{1,2}/\d{1,2}/\d{4})\S+)"
+)
+
+# lookup tables dictionary-encoding the repeated text columns: (table, id column, value column)
+LOOKUP_TABLES = (
+    ("locations", "location_id", "incident_location"),
+    ("natures", "nature_id", "incident_nature"),
+    ("oris", "ori_id", "incident_ori"),
+)
+
+# minute of the day of an H:MM incident time, a virtual column so time ranges can use an index
+INCIDENT_MINUTE_COLUMN = (
+    "incident_minute INTEGER GENERATED ALWAYS AS ("
+    "CAST(substr(incident_time, 1, instr(incident_time, ':') - 1) AS INTEGER) * 60 + "
+    "CAST(substr(incident_time, instr(incident_time, ':') + 1) AS INTEGER)) VIRTUAL"
+)
+
+# nature_counts statements run by the triggers for the NEW or OLD row of incident_facts
+NATURE_COUNT_INCREMENT = (
+    "INSERT INTO nature_counts (nature_id, count) VALUES (COALESCE({row}.nature_id, 0), 1) "
+    "ON CONFLICT (nature_id) DO UPDATE SET count = count + 1"
+)
+NATURE_COUNT_DECREMENT = (
+    "UPDATE nature_counts SET count = count - 1 WHERE nature_id = COALESCE({row}.nature_id, 0); "
+    "DELETE FROM nature_counts WHERE nature_id = COALESCE({row}.nature_id, 0) AND count <= 0"
+)
+
+
+def nature_count_triggers(table="incident_facts"):
+    """Triggers keeping nature_counts current on every write to an incident table.
+
+    Params:
+        table (str): incident_facts or one of its monthly partitions
+    Return:
+        triggers (dict): trigger name to CREATE TRIGGER statement, the triggers of incident_facts keep their
+        original names
+    """
+    suffix = table[len("incident_facts"):]
+    return {
+        f"nature_counts_insert{suffix}": f"CREATE TRIGGER IF NOT EXISTS nature_counts_insert{suffix} AFTER INSERT "
+        f"ON {table} BEGIN {NATURE_COUNT_INCREMENT.format(row='NEW')}; END",
+        f"nature_counts_delete{suffix}": f"CREATE TRIGGER IF NOT EXISTS nature_counts_delete{suffix} AFTER DELETE "
+        f"ON {table} BEGIN {NATURE_COUNT_DECREMENT.format(row='OLD')}; END",
+        f"nature_counts_update{suffix}": f"CREATE TRIGGER IF NOT EXISTS nature_counts_update{suffix} AFTER UPDATE OF "
+        f"nature_id ON {table} WHEN OLD.nature_id IS NOT NEW.nature_id BEGIN "
+        f"{NATURE_COUNT_DECREMENT.format(row='OLD')}; {NATURE_COUNT_INCREMENT.format(row='NEW')}; END",
+    }
+
+
+# triggers keeping nature_counts current, populate_db replaces them by one adjustment per load
+NATURE_COUNT_TRIGGERS = nature_count_triggers()
+
+# triggers keeping the location search index current, populate_db indexes the new locations once per load
+LOCATION_SEARCH_TRIGGERS = {
+    "locations_fts_insert": "CREATE TRIGGER IF NOT EXISTS locations_fts_insert AFTER INSERT ON locations BEGIN "
+    "INSERT INTO locations_fts (rowid, incident_location) VALUES (NEW.location_id, NEW.incident_location); END",
+    "locations_fts_delete": "CREATE TRIGGER IF NOT EXISTS locations_fts_delete AFTER DELETE ON locations BEGIN "
+    "INSERT INTO locations_fts (locations_fts, rowid, incident_location) "
+    "VALUES ('delete', OLD.location_id, OLD.incident_location); END",
+}
+
+# columns of incident_facts and of each of its monthly partitions, in table order
+FACT_COLUMNS = (
+    "report_date", "incident_time", "incident_number", "location_id", "nature_id", "ori_id", "incident_minute",
+    "incident_timestamp",
+)
+
+# incident table, either incident_facts itself or one of its monthly partitions, with the natural key of an
+# incident, needed by upserts before any row is loaded
+FACT_TABLE_QUERIES = (
+    "CREATE TABLE IF NOT EXISTS {table}(report_date TEXT NOT NULL DEFAULT '', incident_time TEXT, "
+    "incident_number TEXT, location_id INTEGER REFERENCES locations, nature_id INTEGER REFERENCES natures, "
+    f"ori_id INTEGER REFERENCES oris, {INCIDENT_MINUTE_COLUMN}, incident_timestamp TEXT)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_{table}_natural_key ON {table} (report_date, incident_number, ori_id)",
+)
+
+# normalized incident schema, the incidents view keeps the flat shape of the original table
+SCHEMA_QUERIES = (
+    "CREATE TABLE IF NOT EXISTS locations(location_id INTEGER PRIMARY KEY, incident_location TEXT NOT NULL UNIQUE)",
+    "CREATE TABLE IF NOT EXISTS natures(nature_id INTEGER PRIMARY KEY, incident_nature TEXT NOT NULL UNIQUE)",
+    "CREATE TABLE IF NOT EXISTS oris(ori_id INTEGER PRIMARY KEY, incident_ori TEXT NOT NULL UNIQUE)",
+    "CREATE VIEW IF NOT EXISTS incidents AS "
+    "SELECT f.report_date, f.incident_time, f.incident_number, l.incident_location, n.incident_nature, "
+    "o.incident_ori, f.incident_timestamp FROM incident_facts AS f LEFT JOIN locations AS l USING (location_id) "
+    "LEFT JOIN natures AS n USING (nature_id) LEFT JOIN oris AS o USING (ori_id)",
+    # writes through the view encode the text values, populate_db encodes them itself which is faster
+    "CREATE TRIGGER IF NOT EXISTS incidents_insert INSTEAD OF INSERT ON incidents BEGIN "
+    "INSERT OR IGNORE INTO locations (incident_location) VALUES (NEW.incident_location); "
+    "INSERT OR IGNORE INTO natures (incident_nature) VALUES (NEW.incident_nature); "
+    "INSERT OR IGNORE INTO oris (incident_ori) VALUES (NEW.incident_ori); "
+    "INSERT INTO incident_facts (report_date, incident_time, incident_number, location_id, nature_id, ori_id, "
+    "incident_timestamp) "
+    "SELECT COALESCE(NEW.report_date, ''), NEW.incident_time, NEW.incident_number, "
+    "(SELECT location_id FROM locations WHERE incident_location = NEW.incident_location), "
+    "(SELECT nature_id FROM natures WHERE incident_nature = NEW.incident_nature), "
+    "(SELECT ori_id FROM oris WHERE incident_ori = NEW.incident_ori), NEW.incident_timestamp WHERE true "
+    "ON CONFLICT (report_date, incident_number, ori_id) DO UPDATE SET incident_time = excluded.incident_time, "
+    "location_id = excluded.location_id, nature_id = excluded.nature_id, "
+    "incident_timestamp = excluded.incident_timestamp; END",
+    "CREATE TRIGGER IF NOT EXISTS incidents_delete INSTEAD OF DELETE ON incidents BEGIN "
+    "DELETE FROM incident_facts WHERE report_date = OLD.report_date AND incident_number IS OLD.incident_number "
+    "AND ori_id IS (SELECT ori_id FROM oris WHERE incident_ori = OLD.incident_ori); END",
+    # trigram index of the distinct locations for fuzzy search, kept current as locations are added
+    "CREATE VIRTUAL TABLE IF NOT EXISTS locations_fts USING fts5(incident_location, content='locations', "
+    "content_rowid='location_id', tokenize='trigram')",
+    *LOCATION_SEARCH_TRIGGERS.values(),
+    # incidents per nature kept current on every write, nature id 0 counts incidents without a nature
+    "CREATE TABLE IF NOT EXISTS nature_counts(nature_id INTEGER PRIMARY KEY, count INTEGER NOT NULL)",
+)
+
+# checkpoint journal: the outcome of every report of a run, done or failed, and the pages skipped as unreadable
+JOURNAL_QUERIES = (
+    "CREATE TABLE IF NOT EXISTS checkpoints(source TEXT PRIMARY KEY, status TEXT NOT NULL, content_hash TEXT, "
+    "report_date TEXT, row_count INTEGER, error TEXT, updated_at TEXT)",
+    "CREATE TABLE IF NOT EXISTS quarantine(source TEXT NOT NULL, page INTEGER NOT NULL, error TEXT, "
+    "quarantined_at TEXT, PRIMARY KEY (source, page))",
+)
+
+# ORI and incident number of every loaded incident with the report it was first loaded from, across all monthly
+# partitions, its primary key finds an incident listed again by another report
+INCIDENT_KEY_QUERIES = (
+    "CREATE TABLE IF NOT EXISTS incident_keys(ori_id INTEGER NOT NULL, incident_number TEXT NOT NULL, "
+    "report_date TEXT NOT NULL, PRIMARY KEY (ori_id, incident_number)) WITHOUT ROWID",
+)
+
+# insert an encoded incident or refresh it when its natural key is already loaded
+UPSERT_QUERY = (
+    "INSERT INTO {table} (report_date, incident_time, incident_number, location_id, nature_id, ori_id, "
+    "incident_timestamp) VALUES (?, ?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT (report_date, incident_number, ori_id) DO UPDATE SET "
+    "incident_time = excluded.incident_time, location_id = excluded.location_id, nature_id = excluded.nature_id, "
+    "incident_timestamp = excluded.incident_timestamp"
+)
+
+# indexes built after the incidents are loaded
+INDEX_QUERIES = (
+    # superseded by the nature and report date index
+    "DROP INDEX IF EXISTS idx_{table}_nature",
+    # composite indexes of the query filters, date ranges alone use the natural key
+    "CREATE INDEX IF NOT EXISTS idx_{table}_nature_date ON {table} (nature_id, report_date)",
+    "CREATE INDEX IF NOT EXISTS idx_{table}_ori_date ON {table} (ori_id, report_date)",
+    "CREATE INDEX IF NOT EXISTS idx_{table}_location_date ON {table} (location_id, report_date)",
+    "CREATE INDEX IF NOT EXISTS idx_{table}_minute ON {table} (incident_minute)",
+    # rows of one call linked across agencies share the time and location, grouped in index order
+    "CREATE INDEX IF NOT EXISTS idx_{table}_call ON {table} (incident_timestamp, location_id)",
+)
 
 
 def delete_existing_db(db_name):
@@ -29,58 +217,375 @@ def delete_existing_db(db_name):
         print("ERROR in deleting database file: ", ex)
 
 
-def fetch_incidents(url):
+def fetch_incidents(url, cache=None, offline=False, parts=4):
     """Download PDF data from provided URL
 
+    The report is streamed to a file in chunks, in parallel byte ranges when the server accepts
+    Range requests, and memory-mapped once its size and SHA-256 digest are verified, so it is never
+    held in memory twice. An interrupted download resumes on the next run. When a download cache is
+    given the request is conditional on the cached ETag / Last-Modified, a 304 response is served
+    from the cache and a new report is moved into it.
+
     Params:
-        url (str): API to download PDF Document
+    - url (str): API to download PDF Document
+    - cache (DownloadCache/None): download cache of previously fetched reports
+    - offline (bool): serve the report from the cache only, without any request
+    - parts (int): maximum number of byte ranges downloaded in parallel
     Return:
-        data (bytes): Data of the PDF Document
+        data (MappedReport): Data of the PDF Document
     """
     try:
-        # define a dictionary of HTTP headers to simulate a request from a web browser
-        headers = {
-            "User-Agent": "Mozilla/5.0 (X11; Linux i686) AppleWebKit/537.17 (KHTML, like Gecko) Chrome/24.0.1312.27 "
-                          "Safari/537.17"
-        }
-        # make an HTTP GET request to the specified URL with the headers
-        data = urllib.request.urlopen(
-            urllib.request.Request(url, headers=headers)
-        ).read()
+        with METRICS.stage("download"):
+            split_url = urllib.parse.urlsplit(url)
+            if split_url.scheme == "file":
+                from urllib.request import url2pathname
+                return map_report(url2pathname(split_url.path))
+            if offline:
+                path = cache.path(url) if cache is not None else None
+                if path is None:
+                    print("ERROR in fetching incidents: report is not cached for offline use: ", url)
+                    return None
+                return map_report(path)
+            from assignment0 import backfill
+            # a stable file name per URL lets an interrupted download resume
+            path = backfill.download_path(url, cache)
+            # add conditional headers when the report is already cached
+            headers = cache.conditional_headers(url) if cache is not None else {}
+            result = backfill.download_report(url, path, parts=parts, headers=headers)
+            if result["path"] is None:
+                # report has not changed since it was cached
+                return map_report(cache.path(url))
+            if cache is not None:
+                path = cache.put_file(url, path, result["sha256"], result["etag"], result["last_modified"])
+            report = map_report(path)
+            if cache is None:
+                # the memory map keeps the data of the removed file readable, but the path cannot be opened again
+                os.remove(path)
+                report.path = None
         # return the content of the HTTP response
-        return data
+        return report
     except Exception as ex:
         print("ERROR in fetching incidents: ", ex)
 
 
-def extract_incidents(incident_data):
+class MappedReport(mmap.mmap):
+    """Read-only memory map of a PDF document on disk that remembers its path."""
+
+
+def is_url(source):
+    """Check whether a report source is a URL rather than a local path.
+
+    Params:
+        source (str): report URL or local path
+    Return:
+        url (bool): True for http, https and file URLs
+    """
+    return urllib.parse.urlsplit(source).scheme in ("http", "https", "file")
+
+
+def find_local_reports(pattern):
+    """Expand a local path, directory or glob into PDF documents.
+
+    Params:
+        pattern (str): PDF file path, directory of PDF files or glob pattern
+    Return:
+        paths (List[str]): PDF file paths in sorted order
+    """
+    import glob
+    if os.path.isdir(pattern):
+        return sorted(glob.glob(os.path.join(pattern, "*.pdf")))
+    if any(char in pattern for char in "*?["):
+        return sorted(glob.glob(pattern))
+    return [pattern]
+
+
+def map_report(path):
+    """Memory-map a local PDF document so it is read without copying it into memory.
+
+    Params:
+        path (str): PDF file path
+    Return:
+        report (MappedReport): read-only view of the PDF document data
+    """
+    try:
+        with METRICS.stage("read"), open(path, "rb") as f:
+            report = MappedReport(f.fileno(), 0, access=mmap.ACCESS_READ)
+        report.path = path
+        METRICS.count("read", bytes=len(report))
+        return report
+    except Exception as ex:
+        print("ERROR in reading local report: ", ex)
+
+
+def pdf_stream(incident_data):
+    """Stream PdfReader reads a PDF document from.
+
+    Params:
+        incident_data (bytes/MappedReport): PDF document data
+    Return:
+        stream (IO): the memory map itself, or a buffer over the downloaded bytes
+    """
+    if isinstance(incident_data, mmap.mmap):
+        return incident_data
+    # convert download data to bytes object
+    return io.BytesIO(incident_data)
+
+
+def open_pdf(stream):
+    """Open a PDF document reader, importing pypdf on first use.
+
+    pypdf is the slowest import of the pipeline, so it is only loaded by the commands that read PDF documents and
+    the read-only commands start without it.
+
+    Params:
+        stream (IO): PDF document stream
+    Return:
+        reader (PdfReader): reader over the whole PDF document
+    """
+    from pypdf import PdfReader
+    return PdfReader(stream)
+
+
+def extract_incidents(incident_data, workers=1):
     """Extracts and gather incidents from PDF Document page-wise
 
     Params:
-        incident_data (bytes): PDF document data
+    - incident_data (bytes/MappedReport): PDF document data
+    - workers (int): number of worker processes used to extract pages, 1 extracts serially
     Return:
         incidents (list): All incidents with extracted fields
     """
-    # convert download data to bytes object
-    pdf_buffer = io.BytesIO(incident_data)
     # create PDFReader object
-    reader = PdfReader(pdf_buffer)
+    reader = open_pdf(pdf_stream(incident_data))
     # get total number of pages
     tot_pages = len(reader.pages)
 
-    incidents = []
-    for page_num in range(tot_pages):
-        # create specific page object
-        page = reader.pages[page_num]
-        # extract text
-        page_text = extract_page_text(page, page_num, tot_pages)
-        # refactor page text to capture different fields of incident
-        incidents.extend(refactor_page_data(page_text))
+    if workers > 1 and tot_pages > 1:
+        # worker processes are measured as a whole, extraction and parsing together
+        with METRICS.stage("extract"):
+            incidents = extract_pages_parallel(incident_data, tot_pages, workers)
+        METRICS.count("extract", pages=tot_pages, records=len(incidents))
+    else:
+        incidents = extract_page_range(reader, 0, tot_pages, tot_pages)
 
     create_json(incidents)
     return incidents
 
 
+def iter_incidents(incident_data):
+    """Lazily extract incidents from PDF Document, one page at a time.
+
+    Params:
+        incident_data (bytes/MappedReport): PDF document data
+    Yield:
+        incident (Incident): extracted fields of each incident in page order
+    """
+    reader = open_pdf(pdf_stream(incident_data))
+    tot_pages = len(reader.pages)
+    yield from iter_page_range(reader, 0, tot_pages, tot_pages)
+
+
+def iter_page_range(reader, start, stop, tot_pages):
+    """Lazily extract incidents from a contiguous range of pages.
+
+    Params:
+    - reader (PdfReader): reader over the whole PDF document
+    - start (int): first page number of the range
+    - stop (int): page number after the last page of the range
+    - tot_pages (int): total number of pages in PDF document
+    Yield:
+        incident (Incident): extracted fields of each incident in page order
+    """
+    for page_num in range(start, stop):
+        try:
+            page_incidents = extract_page(reader, page_num, tot_pages)
+        except Exception as ex:
+            # quarantine a page that cannot be read or parsed instead of losing the whole report
+            print(f"ERROR in extracting page {page_num}: ", ex)
+            QUARANTINED_PAGES.append((page_num, repr(ex)))
+            continue
+        yield from page_incidents
+    PAGE_CACHE.flush()
+
+
+def extract_page(reader, page_num, tot_pages):
+    """Extract the incidents of one page, from the parsed page cache when the page is unchanged.
+
+    Params:
+    - reader (PdfReader): reader over the whole PDF document
+    - page_num (int): current page number
+    - tot_pages (int): total number of pages in PDF document
+    Return:
+        page_incidents (List[Incident]): incidents of the page
+    """
+    # create specific page object
+    with METRICS.stage("extract", page=page_num):
+        page = reader.pages[page_num]
+        # an unchanged page parsed in an earlier run skips text extraction and parsing
+        key = page_cache_key(page, page_num, tot_pages) if PAGE_CACHE.enabled else None
+        rows = PAGE_CACHE.get(key) if key else None
+        if rows is None:
+            # extract text
+            page_text, page_type = read_page_text(page, page_num, tot_pages)
+    if rows is not None:
+        METRICS.count("extract", pages=1)
+        page_incidents = [Incident(*row) for row in rows]
+    else:
+        METRICS.count("extract", pages=1, bytes=len(page_text))
+        # tokenize page text to capture different fields of incident
+        with METRICS.stage("parse"):
+            page_incidents = parse_page_text(page_text, page_type)
+        if key:
+            PAGE_CACHE.put(key, [incident.as_row() for incident in page_incidents])
+    METRICS.count("parse", records=len(page_incidents))
+    return page_incidents
+
+
+def _pdf_value(value):
+    # resolve indirect objects and stream data so a value hashes the same in every run
+    value = value.get_object()
+    if hasattr(value, "get_data"):
+        return value.get_data()
+    if isinstance(value, list):
+        return [_pdf_value(item) for item in value]
+    return value
+
+
+def page_cache_key(page, page_num, tot_pages):
+    """Parsed page cache key of a PDF page.
+
+    The key covers everything the incidents of a page depend on: the parser version, the
+    nature vocabulary, the position of the page in the report, its content stream and its
+    fonts, whose encodings and widths decide the extracted text.
+
+    Params:
+    - page (PageObject): specific page object
+    - page_num (int): current page number
+    - tot_pages (int): total number of pages in PDF document
+    Return:
+        key (str): SHA-256 hex digest of the page
+    """
+    position = (page_num == 0, page_num == tot_pages - 1)
+    digest = hashlib.sha256(f"{PARSER_VERSION}\0{NATURE_VOCABULARY.fingerprint()}\0{position}\0".encode())
+    contents = page.get_contents()
+    if contents is not None:
+        digest.update(contents.get_data())
+    resources = page["/Resources"].get_object() if "/Resources" in page else {}
+    fonts = resources["/Font"].get_object() if "/Font" in resources else {}
+    for name in sorted(fonts):
+        font = fonts[name].get_object()
+        for field in sorted(font):
+            # the descriptor holds the glyph outlines, which do not change the extracted text
+            if field != "/FontDescriptor":
+                digest.update(repr((name, field, _pdf_value(font[field]))).encode())
+    return digest.hexdigest()
+
+
+def extract_page_range(reader, start, stop, tot_pages):
+    """Extract incidents from a contiguous range of pages.
+
+    Params:
+    - reader (PdfReader): reader over the whole PDF document
+    - start (int): first page number of the range
+    - stop (int): page number after the last page of the range
+    - tot_pages (int): total number of pages in PDF document
+    Return:
+        incidents (list): incidents of the page range in page order
+    """
+    return list(iter_page_range(reader, start, stop, tot_pages))
+
+
+def _extract_page_range_worker(source, start, stop, tot_pages, page_cache=(None, 0)):
+    # each worker process opens its own reader over the shared PDF bytes, or maps the local file itself, and its
+    # own connection to the parsed page cache, whose hits and misses are returned to the parent process
+    PAGE_CACHE.configure(*page_cache)
+    QUARANTINED_PAGES.clear()
+    try:
+        if isinstance(source, str):
+            report = map_report(source)
+            if report is None:
+                raise OSError(f"cannot map report {source}")
+            with report:
+                incidents = extract_page_range(open_pdf(report), start, stop, tot_pages)
+        else:
+            incidents = extract_page_range(open_pdf(io.BytesIO(source)), start, stop, tot_pages)
+        return incidents, PAGE_CACHE.hits, PAGE_CACHE.misses, list(QUARANTINED_PAGES)
+    finally:
+        PAGE_CACHE.close()
+
+
+def split_page_ranges(tot_pages, workers):
+    """Split pages into contiguous ranges, one per worker.
+
+    Params:
+    - tot_pages (int): total number of pages in PDF document
+    - workers (int): number of worker processes
+    Return:
+        ranges (List[tuple]): (start, stop) page ranges in page order
+    """
+    workers = max(1, min(workers, tot_pages))
+    size, extra = divmod(tot_pages, workers)
+    ranges, start = [], 0
+    for i in range(workers):
+        # spread the remainder pages over the first ranges
+        stop = start + size + (1 if i < extra else 0)
+        ranges.append((start, stop))
+        start = stop
+    return ranges
+
+
+def extract_pages_parallel(incident_data, tot_pages, workers):
+    """Extract incidents by spreading page ranges across worker processes.
+
+    Params:
+    - incident_data (bytes/MappedReport): PDF document data
+    - tot_pages (int): total number of pages in PDF document
+    - workers (int): number of worker processes
+    Return:
+        incidents (list): All incidents merged in page order
+    """
+    ranges = split_page_ranges(tot_pages, workers)
+    # send workers the path of a mapped file rather than a copy of its content, unless the file was removed
+    source = incident_data
+    if isinstance(incident_data, MappedReport):
+        source = incident_data[:] if incident_data.path is None else incident_data.path
+    page_cache = (PAGE_CACHE.path, PAGE_CACHE.max_bytes)
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=len(ranges)) as executor:
+        futures = [
+            executor.submit(_extract_page_range_worker, source, start, stop, tot_pages, page_cache)
+            for start, stop in ranges
+        ]
+        # collect results in submission order so pages stay in document order
+        incidents = []
+        for future in futures:
+            range_incidents, hits, misses, quarantined = future.result()
+            incidents.extend(range_incidents)
+            QUARANTINED_PAGES.extend(quarantined)
+            PAGE_CACHE.hits += hits
+            PAGE_CACHE.misses += misses
+    return incidents
+
+
+def read_page_text(page, page_num, tot_pages):
+    """Read page text, removing the first page header, and tell the type of page.
+
+    Params:
+    - page (PageObject): specific page object
+    - page_num (int): current page number
+    - tot_pages (int): total number of pages in PDF document
+    Return:
+    - page_text (str): page content
+    - page_type (str/None): 'last' for the last page holding the footer, None otherwise
+    """
+    if page_num == 0:
+        # extract the page text and remove header and column heading
+        return page.extract_text()[57:-55], None
+    if page_num == tot_pages - 1:
+        return page.extract_text(), 'last'
+    return page.extract_text(), None
+
+
 def extract_page_text(page, page_num, tot_pages):
     """Extract page text based on the page number.
 
@@ -91,21 +596,10 @@ def extract_page_text(page, page_num, tot_pages):
     Return:
          split_incidents (List[str]): Extracted incidents
     """
-    if page_num == 0:
-        # extract the page text and remove header and column heading
-        page_text = page.extract_text()[57:-55]
-        # split the page text into individual incidents
-        split_incidents = split_all_incidents(page_text)
-    elif page_num == tot_pages - 1:
-        # extract the page text
-        page_text = page.extract_text()
-        # split the page text into individual incidents
-        split_incidents = split_all_incidents(page_text, 'last')
-    else:
-        # extract the page text
-        page_text = page.extract_text()
-        # split the page text into individual incidents
-        split_incidents = split_all_incidents(page_text)
+    # extract the page text
+    page_text, page_type = read_page_text(page, page_num, tot_pages)
+    # split the page text into individual incidents
+    split_incidents = split_all_incidents(page_text, page_type)
 
     # return incidents of a single page
     return split_incidents
@@ -120,8 +614,8 @@ def split_all_incidents(page_text, page_type=None):
     Return:
          extracted_incident (list): Extract incidents
     """
-    # regex for recognizing date
-    pattern = r'(?=\d{1,2}/\d{1,2}/\d{4})'
+    # regex for recognizing date, not within a two-digit month
+    pattern = r'(?<!\d)(?=\d{1,2}/\d{1,2}/\d{4})'
     # split the page text into list of incidents using date regex
     extracted_incidents = re.split(pattern, page_text.strip())
     if page_type == 'last':
@@ -134,6 +628,86 @@ def split_all_incidents(page_text, page_type=None):
     return extracted_incidents
 
 
+def tokenize_page(page_text, page_type=None):
+    """Tokenize page content into the fixed fields of each incident in one regex pass.
+
+    Params:
+    - page_text (str): page content
+    - page_type (str/None): type of page, could be 'last' or 'None'
+    Yield:
+        record (tuple): date, time, incident number, location text glued to the incident
+        number, location and nature text, ORI
+    """
+    if page_type == 'last':
+        # remove the footer, which starts with the last date on the page
+        footer = LAST_DATE_PATTERN.match(page_text)
+        if footer is not None:
+            page_text = page_text[:footer.start(1)]
+    end = 0
+    for match in RECORD_PATTERN.finditer(page_text):
+        start = match.start()
+        # records are only separated by line breaks, any other text between them is an irregular record
+        if start > end and not page_text[end:start].isspace():
+            yield from tokenize_unmatched(page_text[end:start])
+        end = match.end()
+        yield match.groups()
+    if page_text[end:].strip():
+        yield from tokenize_unmatched(page_text[end:])
+
+
+def tokenize_unmatched(text):
+    """Tokenize text between the records matched by RECORD_PATTERN the way refactor_page_data does.
+
+    Records with an irregular incident number, or without location and nature, are not matched by
+    RECORD_PATTERN. They are logged and split into their fields by position instead of being dropped.
+
+    Params:
+        text (str): page content between two matched records
+    Yield:
+        record (tuple): the fields of tokenize_page
+    Raise:
+        ValueError for text that is not an incident, so its page is quarantined
+    """
+    for incident in split_all_incidents(text):
+        record = incident.split()
+        if len(record) < 3:
+            raise ValueError(f"cannot parse incident text {incident.strip()!r}")
+        print(f"Irregular incident parsed by position: {' '.join(record)}", file=sys.stderr)
+        yield record[0], record[1], record[2][:13], record[2][13:], " ".join(record[3:-1]), record[-1]
+
+
+def parse_page_text(page_text, page_type=None):
+    """Extract the fields of each incident from page content.
+
+    Produces the same incidents as split_all_incidents followed by refactor_page_data.
+
+    Params:
+    - page_text (str): page content
+    - page_type (str/None): type of page, could be 'last' or 'None'
+    Return:
+        page_incidents (List): List of extracted fields of each incident
+    """
+    page_incidents = []
+    for rec_date, rec_time, rec_incident_num, glued, body, rec_incident_ori in tokenize_page(page_text, page_type):
+        tokens = body.split()
+        if tokens:
+            # extract location and nature
+            location, nature = extract_location_and_nature(tokens)
+        else:
+            location, nature = "", ""
+        # location text glued to the incident number belongs to the location
+        if glued:
+            location = glued + ' ' + location
+
+        # collect each incident record
+        page_incidents.append(
+            Incident(rec_time, rec_incident_num, location, nature, rec_incident_ori, iso_date(rec_date))
+        )
+
+    # return extracted fields of all the incidents of a specific page
+    return page_incidents
+
+
 def refactor_page_data(page_text):
     """Filter specific fields from the page content.
 
@@ -146,6 +720,7 @@ def refactor_page_data(page_text):
     for i in range(len(page_text)):
         # split individual incidents into tokens to extract fixed fields
         record = page_text[i].split()
+        rec_date = iso_date(record[0])
         rec_time = record[1]
         rec_incident_num = record[2]
         rec_incident_ori = record[-1]
@@ -168,6 +743,7 @@ def refactor_page_data(page_text):
                 "incident_location": location,
                 "incident_nature": nature,
                 "incident_ori": rec_incident_ori,
+                "incident_date": rec_date,
             }
         )
 
@@ -175,9 +751,47 @@ def refactor_page_data(page_text):
     return page_incidents
 
 
-def extract_location_and_nature(record):
+def extract_location_and_nature(record, vocabulary=None):
     """Extract location and nature of an incident.
 
+    The longest known nature at the end of the record is matched against the nature
+    vocabulary and kept when the tokens before it all look like a location, so an unknown
+    nature ending in a known one is not split. Other records fall back to the token heuristics.
+
+    Params:
+    - record (list): segment of an incident
+    - vocabulary (NatureVocabulary/None): known incident natures, the shared vocabulary by default
+    Return:
+    - loc_str (str): Location of an incident
+    - nature_str (str): Nature of an incident
+    """
+    if vocabulary is None:
+        vocabulary = NATURE_VOCABULARY
+    matched = vocabulary.match_suffix(record)
+    if matched and all(is_location_token(rec) for rec in record[:-matched]):
+        return " ".join(record[:-matched]), " ".join(record[-matched:])
+
+    loc_str, nature_str = heuristic_location_and_nature(record)
+    # log unknown natures so the vocabulary can grow
+    vocabulary.report_unknown(nature_str)
+    return loc_str, nature_str
+
+
+def is_location_token(rec):
+    """Check whether a token can be part of a location: numbers, upper case words, '/', ';' and '1/2'.
+
+    Params:
+        rec (str): token of an incident
+    Return:
+        location (bool): True for a location token
+    """
+    return rec not in ("MVA", "COP", "EMS", "RAMPMVA") and (
+        rec.isdecimal() or rec.isupper() or rec == "/" or ';' in rec or rec == '1/2')
+
+
+def heuristic_location_and_nature(record):
+    """Extract location and nature of an incident from the case of its tokens.
+
     Params:
         record (list): segment of an incident
     Return:
@@ -189,8 +803,7 @@ def extract_location_and_nature(record):
     location, nature = [], []
     for rec in record:
         # handle location and nature edge cases
-        if len(nature) == 0 and rec != "MVA" and rec != "COP" and rec != "EMS" and rec != "RAMPMVA" and (
-                rec.isdecimal() or rec.isupper() or rec == "/" or ';' in rec or rec == '1/2'):
+        if len(nature) == 0 and is_location_token(rec):
             location.append(rec)
         elif rec == 'HWYMotorist' or rec == 'RAMPMotorist':
             location.append(rec.split('Motorist')[0])
@@ -218,16 +831,51 @@ def extract_location_and_nature(record):
 
 
 def create_json(incidents):
-    # create json out of extracted incidents
-    with open("../incidents.json", "w") as f:
-        json.dump(incidents, f, indent=4)
+    """Write extracted incidents to the incidents JSON file of the run.
+
+    Params:
+        incidents (list): extracted incidents
+    Return:
+        None
+    """
+    JSON_WRITER.write(incidents)
+
 
+def stream_json(incidents):
+    """Write incidents to the incidents JSON file of the run as they pass through the stream.
 
-def create_db(db_name):
+    Params:
+        incidents (Iterable[Incident/dict]): stream of extracted incidents
+    Yield:
+        incident (Incident/dict): each incident, unchanged, once it is written
+    """
+    yield from JSON_WRITER.stream(incidents)
+
+
+def iter_batches(items, batch_size):
+    """Group a stream into lists of at most batch_size items.
+
+    Params:
+    - items (Iterable): stream of items
+    - batch_size (int): maximum number of items per batch
+    Yield:
+        batch (list): consecutive items of the stream
+    """
+    iterator = iter(items)
+    while True:
+        batch = list(itertools.islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def create_db(db_name, partitioned=False):
     """Creates database under resources dir.
 
     Params:
-        db_name (str): name of the database
+    - db_name (str): name of the database
+    - partitioned (bool): store the incidents in monthly partitions of incident_facts, the incidents of an
+      existing unpartitioned database are partitioned, a partitioned database stays partitioned either way
     Return:
         conn (sqlite3.Connection): Database connection object
     Raise:
@@ -240,108 +888,779 @@ def create_db(db_name):
         conn = sqlite3.connect(db_file_loc)
         # generate cursor object
         cur = conn.cursor()
-        # create incident table
+        # a flat incidents table of an older database is converted to the normalized schema
+        existing = dict(cur.execute("SELECT name, type FROM sqlite_master").fetchall())
+        migrate = existing.get("incidents") == "table"
+        # nature counts of a database created before they were maintained are rebuilt once
+        recount = "incident_facts" in existing and "nature_counts" not in existing
+        # locations of a database created before they were indexed for search are indexed once
+        reindex = "locations" in existing and "locations_fts" not in existing
+        # incidents of a database created before duplicates were detected are recorded once
+        rekey = "incident_facts" in existing and "incident_keys" not in existing
+        if migrate:
+            # add the report date to tables created before it was recorded
+            columns = [column[1] for column in cur.execute("PRAGMA table_info(incidents)").fetchall()]
+            if "report_date" not in columns:
+                cur.execute("ALTER TABLE incidents ADD COLUMN report_date TEXT NOT NULL DEFAULT ''")
+            cur.execute("ALTER TABLE incidents RENAME TO incidents_flat")
+        elif "incidents" in existing:
+            # the incidents view of a database created before incident dates were kept is recreated with them
+            columns = [column[1] for column in cur.execute("PRAGMA table_info(incidents)").fetchall()]
+            if "incident_timestamp" not in columns:
+                cur.execute("DROP VIEW incidents")
+        # create the incident tables and view, keeping them if they already exist
+        for query in SCHEMA_QUERIES:
+            cur.execute(query)
+        if existing.get("incident_facts") != "view":
+            create_fact_table(conn, "incident_facts")
+        if migrate:
+            migrate_flat_incidents(conn)
+        if recount:
+            rebuild_nature_counts(conn)
+        if reindex:
+            cur.execute("INSERT INTO locations_fts (locations_fts) VALUES ('rebuild')")
+            conn.commit()
+        if existing.get("incident_facts") != "view":
+            columns = [column[1] for column in cur.execute("PRAGMA table_xinfo(incident_facts)").fetchall()]
+            # add the minute of the day to incident tables created before time ranges were queried
+            if "incident_minute" not in columns:
+                cur.execute(f"ALTER TABLE incident_facts ADD COLUMN {INCIDENT_MINUTE_COLUMN}")
+            # add the timestamp to incident tables created before incident dates were kept, it stays empty for
+            # the incidents already loaded
+            if "incident_timestamp" not in columns:
+                cur.execute("ALTER TABLE incident_facts ADD COLUMN incident_timestamp TEXT")
+            if partitioned:
+                partition_incident_facts(conn)
+        # index the incidents of an existing database, a new one is indexed after its first load
+        if "incident_facts" in existing or migrate:
+            create_indexes(conn)
+        # create the ingestion ledger of already loaded reports
         cur.execute(
-            "CREATE TABLE incidents(incident_time TEXT, incident_number TEXT, incident_location TEXT, incident_nature "
-            "TEXT, incident_ori TEXT)"
+            "CREATE TABLE IF NOT EXISTS ingestions(content_hash TEXT PRIMARY KEY, source TEXT, report_date TEXT, "
+            "row_count INTEGER, ingested_at TEXT)"
         )
+        # create the checkpoint journal of the reports of resumable runs and the pages they quarantined
+        for query in JOURNAL_QUERIES:
+            cur.execute(query)
+        # create the incident keys of the cross-report duplicate detection
+        for query in INCIDENT_KEY_QUERIES:
+            cur.execute(query)
+        if rekey or migrate:
+            # the earliest report of an incident owns it, duplicates loaded before are kept
+            cur.execute(
+                "INSERT OR IGNORE INTO incident_keys (incident_number, ori_id, report_date) "
+                "SELECT incident_number, COALESCE(ori_id, 0), report_date FROM incident_facts "
+                "WHERE incident_number IS NOT NULL ORDER BY report_date"
+            )
+            conn.commit()
+        # mark the schema as current so the read-only commands open the database as it is
+        cur.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
         # return DB connection object
         return conn
     except Exception as ex:
         print("ERROR in creating DB: ", ex)
 
 
-def populate_db(db, incidents):
-    """Populate database with all the extracted incidents.
+def migrate_flat_incidents(db):
+    """Move the rows of a flat incidents table renamed to incidents_flat into the normalized schema.
+
+    Distinct text values are copied into the lookup tables, incidents are upserted with their
+    integer ids, the flat table is dropped and the database is vacuumed to release its pages.
+
+    Params:
+        db (sqlite3.Connection): database connection object
+    Return:
+        None
+    """
+    for table, id_column, value_column in LOOKUP_TABLES:
+        db.execute(
+            f"INSERT OR IGNORE INTO {table} ({value_column}) "
+            f"SELECT DISTINCT {value_column} FROM incidents_flat WHERE {value_column} IS NOT NULL"
+        )
+    db.execute(
+        "INSERT INTO incident_facts (report_date, incident_time, incident_number, location_id, nature_id, ori_id) "
+        "SELECT f.report_date, f.incident_time, f.incident_number, l.location_id, n.nature_id, o.ori_id "
+        "FROM incidents_flat AS f LEFT JOIN locations AS l USING (incident_location) "
+        "LEFT JOIN natures AS n USING (incident_nature) LEFT JOIN oris AS o USING (incident_ori) WHERE true "
+        "ON CONFLICT (report_date, incident_number, ori_id) DO UPDATE SET incident_time = excluded.incident_time, "
+        "location_id = excluded.location_id, nature_id = excluded.nature_id"
+    )
+    db.execute("DROP TABLE incidents_flat")
+    db.commit()
+    db.execute("VACUUM")
+
+
+def rebuild_nature_counts(db):
+    """Replace the nature counts with a full recount of the incidents.
+
+    Params:
+        db (sqlite3.Connection): database connection object
+    Return:
+        None
+    """
+    db.execute("DELETE FROM nature_counts")
+    db.execute(f"INSERT INTO nature_counts (nature_id, count) {NATURE_RECOUNT_QUERY}")
+    db.commit()
+
+
+def adjust_nature_counts(db, report_date, sign, table="incident_facts"):
+    """Add or remove the incidents of one report from the nature counts.
+
+    Upserts only touch rows of the report being loaded, so populate_db removes the report's
+    counts before the load and adds them back after it instead of counting row by row.
 
     Params:
     - db (sqlite3.Connection): database connection object
-    - incidents (list): list of all the extracted incidents
+    - report_date (str/None): date of the report, None for all incidents of the table
+    - sign (int): 1 to add the report's incidents, -1 to remove them
+    - table (str): incident_facts or the monthly partition holding the report
     Return:
         None
+    """
+    condition, params = ("WHERE report_date = ?", (sign, report_date)) if report_date is not None else ("", (sign,))
+    db.execute(
+        "INSERT INTO nature_counts (nature_id, count) "
+        f"SELECT COALESCE(nature_id, 0), ? * COUNT(*) FROM {table} {condition} "
+        "GROUP BY COALESCE(nature_id, 0) ON CONFLICT (nature_id) DO UPDATE SET count = count + excluded.count",
+        params,
+    )
+    db.execute("DELETE FROM nature_counts WHERE count <= 0")
+
+
+def lookup_ids(db, lookup, values, ids):
+    """Dictionary-encode text values into the integer ids of a lookup table.
+
+    Values missing from the ids cache are inserted into the lookup table and their ids are
+    read back in chunks, so each distinct value costs one round trip per load.
+
+    Params:
+    - db (sqlite3.Connection): database connection object
+    - lookup (tuple): table, id column and value column, one of LOOKUP_TABLES
+    - values (list): text values to encode
+    - ids (dict): value to id cache shared by the batches of a load
+    Return:
+        value_ids (list): id of every value
+    """
+    table, id_column, value_column = lookup
+    new_values = [(value,) for value in dict.fromkeys(values) if value not in ids]
+    if new_values:
+        db.executemany(f"INSERT OR IGNORE INTO {table} ({value_column}) VALUES (?)", new_values)
+        for chunk in iter_batches((value for (value,) in new_values), 500):
+            placeholders = ", ".join("?" * len(chunk))
+            ids.update(db.execute(
+                f"SELECT {value_column}, {id_column} FROM {table} WHERE {value_column} IN ({placeholders})", chunk
+            ).fetchall())
+    return [ids[value] for value in values]
+
+
+def apply_load_pragmas(db):
+    """Tune the database connection for bulk loading.
+
+    Params:
+        db (sqlite3.Connection): database connection object
+    Return:
+        None
+    """
+    for pragma, value in LOAD_PRAGMAS:
+        db.execute(f"PRAGMA {pragma} = {value}")
+
+
+def create_indexes(db, tables=None):
+    """Create the incident indexes, run after loading so rows are not indexed one by one.
+
+    Params:
+    - db (sqlite3.Connection): database connection object
+    - tables (List[str]/None): incident tables to index, incident_facts or every monthly partition by default
+    Return:
+        None
+    """
+    if tables is None:
+        tables = partition_tables(db) if is_partitioned(db) else ["incident_facts"]
+    for table in tables:
+        for query in INDEX_QUERIES:
+            db.execute(query.format(table=table))
+
+
+def create_fact_table(db, table):
+    """Create incident_facts or one of its monthly partitions with its natural key and nature count triggers.
+
+    Params:
+    - db (sqlite3.Connection): database connection object
+    - table (str): incident table name
+    Return:
+        None
+    """
+    for query in FACT_TABLE_QUERIES:
+        db.execute(query.format(table=table))
+    for query in nature_count_triggers(table).values():
+        db.execute(query)
+
+
+def fact_union_query(tables):
+    """Query of the incident rows of the given partitions, the body of the incident_facts view.
+
+    Params:
+        tables (List[str]): partition table names
+    Return:
+        query (str): UNION ALL of the partitions, a query without rows when there is no partition
+    """
+    columns = ", ".join(FACT_COLUMNS)
+    if not tables:
+        return "SELECT " + ", ".join(f"NULL AS {column}" for column in FACT_COLUMNS) + " LIMIT 0"
+    return " UNION ALL ".join(f"SELECT {columns} FROM {table}" for table in tables)
+
+
+def refresh_partition_view(db):
+    """Recreate the incident_facts view as the union of the current monthly partitions.
+
+    Params:
+        db (sqlite3.Connection): database connection object
+    Return:
+        None
+    """
+    db.execute("DROP VIEW IF EXISTS incident_facts")
+    db.execute(f"CREATE VIEW incident_facts AS {fact_union_query(partition_tables(db))}")
+
+
+def partition_incident_facts(db):
+    """Split the incident_facts table into monthly partitions by report month behind an incident_facts view.
+
+    The incidents of each report are copied into the partition of its month before the partition
+    triggers are created, so the nature counts are left as they are, and the database is vacuumed
+    to release the pages of the dropped table.
+
+    Params:
+        db (sqlite3.Connection): database connection object
+    Return:
+        None
+    """
+    columns = ", ".join(column for column in FACT_COLUMNS if column != "incident_minute")
+    report_dates = [report_date for (report_date,) in db.execute("SELECT DISTINCT report_date FROM incident_facts")]
+    tables = sorted({partition_table(report_date) for report_date in report_dates})
+    for table in tables:
+        for query in FACT_TABLE_QUERIES:
+            db.execute(query.format(table=table))
+    for report_date in report_dates:
+        db.execute(
+            f"INSERT INTO {partition_table(report_date)} ({columns}) SELECT {columns} FROM incident_facts "
+            "WHERE report_date = ?",
+            (report_date,),
+        )
+    db.execute("DROP TABLE incident_facts")
+    for table in tables:
+        for query in nature_count_triggers(table).values():
+            db.execute(query)
+    create_indexes(db, tables)
+    refresh_partition_view(db)
+    db.commit()
+    db.execute("VACUUM")
+
+
+def archive_partition(db, month, path):
+    """Move the incidents of one report month out of a partitioned database into an archive database.
+
+    The incidents of the month's partition are copied with their text values into the incidents
+    table of the archive database, which can be read on its own, then the partition is dropped and
+    its incidents are taken out of the nature counts, all in one transaction. Lookup values only
+    used by the archived month stay in the lookup tables, and the pages of the dropped partition
+    are reused by later loads rather than returned to the file system.
+
+    Params:
+    - db (sqlite3.Connection): database connection object
+    - month (str): report month in YYYY-MM format, an empty month archives the reports without a date
+    - path (str): archive database file, created when missing, further months are appended to it
+    Return:
+        rows (int): number of archived incidents
+    Raise:
+        Exception if the month has no partition / while copying the incidents
+    """
+    try:
+        table = partition_table(month)
+        if partition_month(table) != month or table not in partition_tables(db):
+            raise ValueError(f"no partition of report month '{month}'")
+        # a database can only be attached outside of a transaction
+        db.commit()
+        db.execute("ATTACH DATABASE ? AS archive", (path,))
+        try:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS archive.incidents(report_date TEXT, incident_time TEXT, "
+                "incident_number TEXT, incident_location TEXT, incident_nature TEXT, incident_ori TEXT, "
+                "incident_timestamp TEXT)"
+            )
+            rows = db.execute(
+                "INSERT INTO archive.incidents SELECT f.report_date, f.incident_time, f.incident_number, "
+                "l.incident_location, n.incident_nature, o.incident_ori, f.incident_timestamp "
+                f"FROM {table} AS f LEFT JOIN locations AS l USING (location_id) "
+                "LEFT JOIN natures AS n USING (nature_id) LEFT JOIN oris AS o USING (ori_id)"
+            ).rowcount
+            adjust_nature_counts(db, None, -1, table)
+            db.execute(f"DROP TABLE {table}")
+            refresh_partition_view(db)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.execute("DETACH DATABASE archive")
+        return rows
+    except Exception as ex:
+        print("ERROR in archiving partition: ", ex)
+
+
+def populate_db(db, incidents, batch_size=500, report_date=""):
+    """Populate database with all the extracted incidents.
+
+    Location, nature and ORI values are encoded into their lookup table ids, incidents
+    are upserted on their natural key (report date, incident number, ORI) in batches
+    with executemany inside a single transaction, indexes are built once the load is
+    complete and the load rate is reported. On a partitioned database the incidents are
+    upserted into the partition of the report month, which is created on first use. The keys of
+    the incidents are recorded in incident_keys and, when duplicate detection is enabled,
+    incidents already loaded from another report are skipped, see dedup.IncidentKeyFilter.
+
+    Params:
+    - db (sqlite3.Connection): database connection object
+    - incidents (Iterable[Incident/dict]): extracted incidents, either a list or a stream
+    - batch_size (int): number of incidents inserted per executemany call
+    - report_date (str): date of the report the incidents were published in, the date of its first
+      incident when empty, e.g. for a report file not named after its date
+    Return:
+        rows (int): number of incidents loaded
     Raise:
         Exception while data entry / missing key / saving database changes
     """
     try:
-        # insert each incident record into table one by one
-        for incident in incidents:
+        start = time.perf_counter()
+        apply_load_pragmas(db)
+        rows = skipped = 0
+        # value to id caches of the lookup tables, a missing value is stored as NULL
+        ids = {lookup: {None: None} for lookup in LOOKUP_TABLES}
+        # highest incident numbers of the duplicate detection are read again for every load
+        INCIDENT_KEY_FILTER.reset()
+        batches = iter_batches(incidents, batch_size)
+        first_batch = next(batches, None)
+        if first_batch is not None:
+            batches = itertools.chain([first_batch], batches)
+            if not report_date:
+                # a report whose name has no date is dated by its incidents, so it gets its own natural keys and
+                # the partition of its month
+                report_date = next((date for *_, date in map(incident_row, first_batch) if date), "")
+        table = "incident_facts"
+        if is_partitioned(db):
+            table = partition_table(report_date)
+            if table not in partition_tables(db):
+                create_fact_table(db, table)
+                refresh_partition_view(db)
+        upsert_query = UPSERT_QUERY.format(table=table)
+        bulk_load_triggers = {**nature_count_triggers(table), **LOCATION_SEARCH_TRIGGERS}
+        # take the report out of the nature counts and drop the per-row count and search index triggers, all
+        # within the load transaction so a failed load restores them
+        adjust_nature_counts(db, report_date, -1, table)
+        last_location_id = db.execute("SELECT COALESCE(MAX(location_id), 0) FROM locations").fetchone()[0]
+        for trigger in bulk_load_triggers:
+            db.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        # insert all batches within one transaction
+        for incident_batch in batches:
+            times, numbers, locations, natures, oris, dates = zip(
+                *(incident_row(incident) for incident in incident_batch)
+            )
+            with METRICS.stage("load"):
+                encoded = [lookup_ids(db, lookup, values, ids[lookup])
+                           for lookup, values in zip(LOOKUP_TABLES, (locations, natures, oris))]
+                timestamps = map(incident_timestamp, dates, times)
+                batch = [(report_date, *row) for row in zip(times, numbers, *encoded, timestamps)]
+            with METRICS.stage("dedup"):
+                # skip the incidents another report listed first when duplicate detection is enabled
+                keys = [(number, 0 if ori_id is None else ori_id) for number, ori_id in zip(numbers, encoded[2])]
+                duplicates = INCIDENT_KEY_FILTER.find_duplicates(db, report_date, keys)
+                if duplicates:
+                    batch = [row for row, key in zip(batch, keys) if key not in duplicates]
+                    keys = [key for key in keys if key not in duplicates]
+                    skipped += len(duplicates)
+                INCIDENT_KEY_FILTER.register(db, report_date, keys)
+            with METRICS.stage("load"):
+                db.executemany(upsert_query, batch)
+            rows += len(batch)
+        with METRICS.stage("load"):
+            # count the loaded report and index its new locations once, then restore the triggers
+            adjust_nature_counts(db, report_date, 1, table)
             db.execute(
-                "INSERT INTO incidents (incident_time, incident_number, incident_location, incident_nature, "
-                "incident_ori) VALUES (?, ?, ?, ?, ?)",
-                (
-                    incident["incident_time"],
-                    incident["incident_number"],
-                    incident["incident_location"],
-                    incident["incident_nature"],
-                    incident["incident_ori"],
-                ),
+                "INSERT INTO locations_fts (rowid, incident_location) "
+                "SELECT location_id, incident_location FROM locations WHERE location_id > ?",
+                (last_location_id,),
             )
-            # save inserted records
+            for query in bulk_load_triggers.values():
+                db.execute(query)
+            create_indexes(db, [table])
+            # save inserted records once for the whole load
             db.commit()
+        METRICS.count("load", rows=rows)
+        METRICS.count("dedup", rows=skipped)
+        if skipped:
+            print(f"Skipped {skipped} incidents already loaded from another report", file=sys.stderr)
+        elapsed = time.perf_counter() - start
+        # report load rate on stderr so stdout only carries the status output
+        print(f"Loaded {rows} rows in {elapsed:.3f}s ({rows / elapsed if elapsed else 0:.0f} rows/sec)",
+              file=sys.stderr)
+        return rows
     except Exception as ex:
+        db.rollback()
         print("ERROR in populating DB: ", ex)
 
 
-def status(conn):
-    """Print distinct incident natures and their counts by grouping them.
+def _ingest_shard_worker(shard_name, reports, batch_size, skip_hashes, page_cache=(None, 0), dedup=False):
+    # each worker process parses its reports and loads them into its own shard database, so the loads never wait
+    # on the single writer of the main database; the parent writes the JSON file from the shards once merged
+    JSON_WRITER.configure(None)
+    PAGE_CACHE.configure(*page_cache)
+    INCIDENT_KEY_FILTER.enabled = dedup
+    db = create_db(shard_name)
+    try:
+        for url, source in reports:
+            incident_data = map_report(source) if isinstance(source, str) else source
+            report_date = get_report_date(url)
+            if incident_data is None:
+                record_checkpoint(db, url, "failed", None, report_date, error="report could not be read")
+                continue
+            content_hash = hash_report(incident_data)
+            error = "incidents could not be loaded"
+            try:
+                if content_hash in skip_hashes:
+                    print(f"Skipping already ingested report: {url}", file=sys.stderr)
+                    record_checkpoint(db, url, "done", content_hash, report_date)
+                    continue
+                QUARANTINED_PAGES.clear()
+                rows = populate_db(db, extract_incidents(incident_data), batch_size, report_date)
+            except Exception as ex:
+                # a report that cannot be read fails alone, the shard goes on with the next one
+                print(f"ERROR in ingesting {url}: ", ex)
+                rows, error = None, repr(ex)
+            finally:
+                if isinstance(incident_data, MappedReport):
+                    incident_data.close()
+            if rows is not None:
+                record_ingestion(db, content_hash, url, report_date, rows)
+                record_checkpoint(db, url, "done", content_hash, report_date, rows, quarantined=QUARANTINED_PAGES)
+            else:
+                record_checkpoint(db, url, "failed", content_hash, report_date, error=error)
+        return PAGE_CACHE.hits, PAGE_CACHE.misses
+    finally:
+        db.close()
+        PAGE_CACHE.close()
+
+
+def merge_shards(db, paths):
+    """Merge shard databases into the database in one transaction.
+
+    The shards are attached together, their lookup values are added to the lookup tables and
+    their incidents are upserted with INSERT ... SELECT, re-encoded through the text values, in
+    shard order so a later report wins as in a sequential load. The incident keys of each shard are
+    added before its incidents, which skip the incidents another report listed first when duplicate
+    detection is enabled. Nature counts and the location
+    search index are adjusted once for the merged reports, as populate_db does for one report,
+    and the ingestion ledgers and checkpoint journals of the shards are copied.
 
     Params:
-        conn (sqlite3.Connection): database connection object
+    - db (sqlite3.Connection): database connection object
+    - paths (List[str]): shard database files, at most the attached database limit of the connection
     Return:
-        None
+        rows (int): number of merged incidents
     Raise:
-        Exception while creating cursor / executing query / fetching records
+        Exception while attaching the shards / copying the incidents
     """
+    aliases = [f"shard_{i}" for i in range(len(paths))]
+    # databases can only be attached outside of a transaction
+    db.commit()
+    for alias, path in zip(aliases, paths):
+        db.execute(f"ATTACH DATABASE ? AS {alias}", (path,))
     try:
-        cur = conn.cursor()
-
-        # query to get distinct incident_nature and their count
-        cur.execute(
-            """
-        SELECT incident_nature, COUNT(*) as count
-        FROM incidents
-        GROUP BY incident_nature
-        ORDER BY count DESC, incident_nature ASC;
-        """
+        report_dates = sorted({
+            report_date for alias in aliases
+            for (report_date,) in db.execute(f"SELECT DISTINCT report_date FROM {alias}.incident_facts")
+        })
+        targets = {"incident_facts": report_dates}
+        if is_partitioned(db):
+            targets = {}
+            for report_date in report_dates:
+                targets.setdefault(partition_table(report_date), []).append(report_date)
+            new_tables = [table for table in targets if table not in partition_tables(db)]
+            for table in new_tables:
+                create_fact_table(db, table)
+            if new_tables:
+                refresh_partition_view(db)
+        bulk_load_triggers = dict(LOCATION_SEARCH_TRIGGERS)
+        for table, table_dates in targets.items():
+            bulk_load_triggers.update(nature_count_triggers(table))
+            for report_date in table_dates:
+                adjust_nature_counts(db, report_date, -1, table)
+        last_location_id = db.execute("SELECT COALESCE(MAX(location_id), 0) FROM locations").fetchone()[0]
+        for trigger in bulk_load_triggers:
+            db.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        rows = 0
+        for alias in aliases:
+            for table, id_column, value_column in LOOKUP_TABLES:
+                db.execute(
+                    f"INSERT OR IGNORE INTO main.{table} ({value_column}) "
+                    f"SELECT {value_column} FROM {alias}.{table} ORDER BY {id_column}"
+                )
+            db.execute(
+                "INSERT OR IGNORE INTO main.incident_keys (incident_number, ori_id, report_date) "
+                "SELECT k.incident_number, COALESCE(o.ori_id, 0), k.report_date "
+                f"FROM {alias}.incident_keys AS k LEFT JOIN {alias}.oris AS so ON so.ori_id = k.ori_id "
+                "LEFT JOIN main.oris AS o ON o.incident_ori = so.incident_ori"
+            )
+            for table, table_dates in targets.items():
+                condition, params = "", ()
+                if table != "incident_facts":
+                    condition, params = f"AND f.report_date IN ({', '.join('?' * len(table_dates))})", table_dates
+                if INCIDENT_KEY_FILTER.enabled:
+                    condition += (
+                        " AND NOT EXISTS (SELECT 1 FROM main.incident_keys AS k WHERE k.incident_number = "
+                        "f.incident_number AND k.ori_id = COALESCE(o.ori_id, 0) AND k.report_date <> f.report_date)"
+                    )
+                rows += db.execute(
+                    f"INSERT INTO main.{table} (report_date, incident_time, incident_number, location_id, nature_id, "
+                    "ori_id, incident_timestamp) SELECT f.report_date, f.incident_time, f.incident_number, "
+                    "l.location_id, n.nature_id, o.ori_id, f.incident_timestamp "
+                    f"FROM {alias}.incident_facts AS f "
+                    f"LEFT JOIN {alias}.locations AS sl USING (location_id) "
+                    f"LEFT JOIN {alias}.natures AS sn USING (nature_id) "
+                    f"LEFT JOIN {alias}.oris AS so USING (ori_id) "
+                    "LEFT JOIN main.locations AS l ON l.incident_location = sl.incident_location "
+                    "LEFT JOIN main.natures AS n ON n.incident_nature = sn.incident_nature "
+                    "LEFT JOIN main.oris AS o ON o.incident_ori = so.incident_ori "
+                    f"WHERE true {condition} ORDER BY f.rowid "
+                    "ON CONFLICT (report_date, incident_number, ori_id) DO UPDATE SET "
+                    "incident_time = excluded.incident_time, location_id = excluded.location_id, "
+                    "nature_id = excluded.nature_id, incident_timestamp = excluded.incident_timestamp",
+                    params,
+                ).rowcount
+            db.execute(f"INSERT OR REPLACE INTO main.ingestions SELECT * FROM {alias}.ingestions")
+            db.execute(
+                f"DELETE FROM main.quarantine WHERE source IN (SELECT source FROM {alias}.checkpoints)"
+            )
+            db.execute(f"INSERT OR REPLACE INTO main.checkpoints SELECT * FROM {alias}.checkpoints")
+            db.execute(f"INSERT OR REPLACE INTO main.quarantine SELECT * FROM {alias}.quarantine")
+        for table, table_dates in targets.items():
+            for report_date in table_dates:
+                adjust_nature_counts(db, report_date, 1, table)
+        db.execute(
+            "INSERT INTO locations_fts (rowid, incident_location) "
+            "SELECT location_id, incident_location FROM locations WHERE location_id > ?",
+            (last_location_id,),
         )
+        for query in bulk_load_triggers.values():
+            db.execute(query)
+        create_indexes(db, list(targets))
+        db.commit()
+        return rows
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        for alias in aliases:
+            db.execute(f"DETACH DATABASE {alias}")
+
+
+def write_shard_json(paths):
+    """Write the incidents of the shards to the incidents JSON file of the run, in load order.
+
+    Params:
+        paths (List[str]): shard database files in report order
+    Return:
+        None
+    """
+    for path in paths:
+        conn = sqlite3.connect(path)
+        try:
+            rows = conn.execute(
+                "SELECT f.incident_time, f.incident_number, l.incident_location, n.incident_nature, o.incident_ori, "
+                "COALESCE(substr(f.incident_timestamp, 1, 10), '') FROM incident_facts AS f "
+                "LEFT JOIN locations AS l USING (location_id) LEFT JOIN natures AS n USING (nature_id) "
+                "LEFT JOIN oris AS o USING (ori_id) ORDER BY f.rowid"
+            )
+            JSON_WRITER.write(dict(zip(FIELDS, row)) for row in rows)
+        finally:
+            conn.close()
+
+
+def ingest_sharded(db, reports, shards, batch_size=500):
+    """Parse and load reports in worker processes, each into its own shard database, then merge the shards.
 
-        # fetch all rows from the result set
-        rows = cur.fetchall()
+    SQLite allows one writer, so each worker loads a contiguous range of the reports into a
+    temporary shard database under resources, and the shards are merged into the database in
+    one transaction by merge_shards. The number of shards is limited to the number of databases
+    a connection can attach. Reports whose content is in the ingestion ledger are skipped.
 
-        for row in rows:
-            # print the records
-            print(f"{row[0]}|{row[1]}")
+    Params:
+    - db (sqlite3.Connection): database connection object
+    - reports (List[tuple]): report URL and either its downloaded data (bytes) or a local PDF file path
+    - shards (int): number of worker processes and shard databases
+    - batch_size (int): number of incidents inserted per executemany call
+    Return:
+        rows (int): number of merged incidents, None if the ingest failed
+    Raise:
+        Exception while loading a shard / merging the shards
+    """
+    import shutil
+    import tempfile
+    from concurrent.futures import ProcessPoolExecutor
+    shard_dir = tempfile.mkdtemp(prefix="shards-", dir="resources")
+    try:
+        ranges = split_page_ranges(len(reports), min(shards, db.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)))
+        names = [f"{os.path.basename(shard_dir)}/shard-{i}.db" for i in range(len(ranges))]
+        skip_hashes = frozenset(content_hash for (content_hash,) in db.execute("SELECT content_hash FROM ingestions"))
+        page_cache = (PAGE_CACHE.path, PAGE_CACHE.max_bytes)
+        start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=len(ranges)) as executor:
+            futures = [
+                executor.submit(
+                    _ingest_shard_worker, name, reports[first:stop], batch_size, skip_hashes, page_cache,
+                    INCIDENT_KEY_FILTER.enabled
+                )
+                for name, (first, stop) in zip(names, ranges)
+            ]
+            for future in futures:
+                hits, misses = future.result()
+                PAGE_CACHE.hits += hits
+                PAGE_CACHE.misses += misses
+        loaded = time.perf_counter()
+        paths = [f"resources/{name}" for name in names]
+        with METRICS.stage("load"):
+            rows = merge_shards(db, paths)
+        merged = time.perf_counter()
+        write_shard_json(paths)
+        METRICS.count("load", rows=rows)
+        # report the parallel shard loads and the serial merge separately on stderr
+        print(f"Loaded {len(reports)} reports into {len(ranges)} shards in {loaded - start:.3f}s, merged {rows} rows "
+              f"in {merged - loaded:.3f}s ({rows / (merged - loaded) if merged > loaded else 0:.0f} rows/sec)",
+              file=sys.stderr)
+        return rows
     except Exception as ex:
-        print("ERROR in fetching Status: ", ex)
+        print("ERROR in ingesting shards: ", ex)
     finally:
-        conn.close()
+        shutil.rmtree(shard_dir, ignore_errors=True)
 
 
-def print_record(db_name):
-    # connect to the SQLite database
-    conn = sqlite3.connect(db_name)
+def hash_report(incident_data):
+    """Content hash of a report used to recognize already ingested reports.
 
-    # create a cursor object using the cursor() method
-    cursor = conn.cursor()
+    Params:
+        incident_data (bytes/MappedReport): PDF document data
+    Return:
+        content_hash (str): SHA-256 hex digest of the report
+    """
+    return hashlib.sha256(incident_data).hexdigest()
 
-    # SQL query to retrieve data
-    query = "SELECT * FROM incidents"
 
+def get_report_date(url):
+    """Report date taken from a daily incident summary file name.
+
+    Params:
+        url (str): report URL or local path
+    Return:
+        report_date (str): date in YYYY-MM-DD format, empty if the name has no date
+    """
+    match = re.search(r"(\d{4}-\d{2}-\d{2})_daily_incident_summary", url)
+    return match.group(1) if match else ""
+
+
+def is_ingested(db, content_hash):
+    """Check the ingestion ledger for a report.
+
+    Params:
+    - db (sqlite3.Connection): database connection object
+    - content_hash (str): content hash of the report
+    Return:
+        ingested (bool): True if the report is already loaded
+    """
+    row = db.execute("SELECT 1 FROM ingestions WHERE content_hash = ?", (content_hash,)).fetchone()
+    return row is not None
+
+
+def record_ingestion(db, content_hash, source, report_date, row_count):
+    """Record a loaded report in the ingestion ledger.
+
+    Params:
+    - db (sqlite3.Connection): database connection object
+    - content_hash (str): content hash of the report
+    - source (str): URL the report was loaded from
+    - report_date (str): date of the report
+    - row_count (int): number of incidents loaded from the report
+    Return:
+        None
+    Raise:
+        Exception while data entry / saving database changes
+    """
     try:
-        # execute the SQL command
-        cursor.execute(query)
+        db.execute(
+            "INSERT OR REPLACE INTO ingestions (content_hash, source, report_date, row_count, ingested_at) "
+            "VALUES (?, ?, ?, ?, datetime('now'))",
+            (content_hash, source, report_date, row_count),
+        )
+        db.commit()
+    except Exception as ex:
+        print("ERROR in recording ingestion: ", ex)
 
-        # fetch all the rows
-        records = cursor.fetchall()
 
-        # print the records
-        for row in records:
-            print(row)  # Each row is a tuple representing a record
+def record_checkpoint(db, source, status, content_hash=None, report_date="", row_count=None, error=None,
+                      quarantined=()):
+    """Record the outcome of a report in the checkpoint journal.
 
-    except sqlite3.Error as e:
-        print("Database error:", e)
+    A report is done once its incidents are loaded, even if some of its pages were quarantined,
+    and failed when it could not be downloaded, read or loaded; a later run with resume skips
+    the done reports without downloading them and retries the failed ones.
 
-    finally:
-        # close the cursor and connection
-        cursor.close()
-        conn.close()
+    Params:
+    - db (sqlite3.Connection): database connection object
+    - source (str): report URL or local path
+    - status (str): 'done' or 'failed'
+    - content_hash (str/None): content hash of the report
+    - report_date (str): date of the report
+    - row_count (int/None): number of incidents loaded from the report
+    - error (str/None): reason the report failed
+    - quarantined (List[tuple]): page number and error of each page skipped as unreadable
+    Return:
+        None
+    Raise:
+        Exception while data entry / saving database changes
+    """
+    try:
+        db.execute(
+            "INSERT OR REPLACE INTO checkpoints (source, status, content_hash, report_date, row_count, error, "
+            "updated_at) VALUES (?, ?, ?, ?, ?, ?, datetime('now'))",
+            (source, status, content_hash, report_date, row_count, error),
+        )
+        db.execute("DELETE FROM quarantine WHERE source = ?", (source,))
+        db.executemany(
+            "INSERT INTO quarantine (source, page, error, quarantined_at) VALUES (?, ?, ?, datetime('now'))",
+            [(source, page_num, page_error) for page_num, page_error in quarantined],
+        )
+        db.commit()
+    except Exception as ex:
+        print("ERROR in recording checkpoint: ", ex)
+
+
+def completed_sources(db):
+    """Reports recorded as done in the checkpoint journal.
+
+    Params:
+        db (sqlite3.Connection): database connection object
+    Return:
+        sources (Set[str]): URLs and local paths of the done reports
+    """
+    return {source for (source,) in db.execute("SELECT source FROM checkpoints WHERE status = 'done'")}
+
+
+def seed_vocabulary(db):
+    """Add the natures already stored in the database to the shared nature vocabulary.
+
+    Params:
+        db (sqlite3.Connection): database connection object
+    Return:
+        None
+    """
+    try:
+        NATURE_VOCABULARY.add_from_db(db)
+    except Exception as ex:
+        print("ERROR in seeding nature vocabulary: ", ex)
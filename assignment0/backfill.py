@@ -0,0 +1,554 @@
+import base64
+import binascii
+import datetime
+import hashlib
+import http.client
+import json
+import os
+import re
+import sys
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from assignment0 import assignment
+from assignment0.instrumentation import METRICS
+
+# URL of a Norman PD daily incident summary for a given date
+REPORT_URL_TEMPLATE = (
+    "https://www.normanok.gov/sites/default/files/documents/{date:%Y-%m}/{date:%Y-%m-%d}_daily_incident_summary.pdf"
+)
+
+# HTTP status codes worth retrying
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# size of the reads a download is streamed to disk in
+CHUNK_SIZE = 256 * 1024
+
+# bytes requested by the first request of a download, and the smallest byte range downloaded in parallel
+PART_SIZE = 1024 * 1024
+
+# total size of a ranged response, e.g. 'bytes 0-1048575/12582912'
+CONTENT_RANGE_PATTERN = re.compile(r"bytes (\d+)-(\d+)/(\d+)")
+
+# SHA-256 digest of a report in a Repr-Digest (RFC 9530) or Digest (RFC 3230) header, e.g. 'sha-256=:X48E...=:'
+DIGEST_PATTERN = re.compile(r"sha-256=:?([A-Za-z0-9+/]+=*):?", re.IGNORECASE)
+
+# reports a multi-report run downloads ahead of loading them
+WINDOW_SIZE = 32
+
+
+class HTTPStatusError(OSError):
+    """Response of a download that is not the report, with its HTTP status."""
+
+    def __init__(self, status):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+
+
+def build_report_urls(start_date, end_date, template=REPORT_URL_TEMPLATE):
+    """Build daily incident summary URLs for every date in a range.
+
+    Params:
+    - start_date (str): first report date in YYYY-MM-DD format
+    - end_date (str): last report date in YYYY-MM-DD format, inclusive
+    - template (str): URL template formatted with the report date
+    Return:
+        urls (List[str]): report URLs in date order
+    """
+    start = datetime.date.fromisoformat(start_date)
+    end = datetime.date.fromisoformat(end_date)
+    days = (end - start).days
+    return [template.format(date=start + datetime.timedelta(days=i)) for i in range(days + 1)]
+
+
+class ConnectionPool:
+    """Keep-alive HTTP connections, one per host for each thread."""
+
+    def __init__(self, timeout=30):
+        self.timeout = timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._all = []
+
+    def get(self, scheme, netloc):
+        """Return the current thread's connection to a host, opening it if needed."""
+        connections = getattr(self._local, "connections", None)
+        if connections is None:
+            connections = self._local.connections = {}
+        conn = connections.get((scheme, netloc))
+        if conn is None:
+            conn_class = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+            conn = connections[(scheme, netloc)] = conn_class(netloc, timeout=self.timeout)
+            with self._lock:
+                self._all.append(conn)
+        return conn
+
+    def drop(self, scheme, netloc):
+        """Close the current thread's connection to a host so the next request reconnects."""
+        conn = getattr(self._local, "connections", {}).pop((scheme, netloc), None)
+        if conn is not None:
+            conn.close()
+
+    def close(self):
+        """Close every connection opened through the pool."""
+        with self._lock:
+            for conn in self._all:
+                conn.close()
+            self._all = []
+
+
+def fetch_report(url, pool, retries=3, backoff=0.5, max_redirects=5, cache=None, headers=None):
+    """Download a single report over a reused keep-alive connection.
+
+    Params:
+    - url (str): report URL
+    - pool (ConnectionPool): keep-alive connections to reuse
+    - retries (int): number of retries after a failed attempt
+    - backoff (float): base delay in seconds, doubled after each failed attempt
+    - max_redirects (int): number of redirects followed
+    - cache (DownloadCache/None): download cache used for conditional requests
+    - headers (dict/None): additional request headers, e.g. the conditional headers of an uncached page
+    Return:
+        result (dict): url, data (bytes or None), status, attempts, elapsed seconds and the ETag and
+        Last-Modified of the response
+    """
+    start = time.perf_counter()
+    result = {
+        "url": url, "data": None, "status": None, "attempts": 0, "elapsed": 0.0, "etag": None, "last_modified": None
+    }
+    target = url
+    # add conditional headers when the report is already cached
+    request_headers = dict(assignment.HEADERS, **(headers or {}))
+    if cache is not None:
+        request_headers.update(cache.conditional_headers(url))
+    while result["attempts"] <= retries:
+        result["attempts"] += 1
+        parts = urllib.parse.urlsplit(target)
+        path = parts.path or "/"
+        if parts.query:
+            path = f"{path}?{parts.query}"
+        try:
+            conn = pool.get(parts.scheme, parts.netloc)
+            conn.request("GET", path, headers=request_headers)
+            response = conn.getresponse()
+            body = response.read()
+            result["status"] = response.status
+            if response.will_close:
+                pool.drop(parts.scheme, parts.netloc)
+            if response.status in (301, 302, 303, 307, 308) and max_redirects > 0:
+                # follow the redirect without counting it as a failed attempt
+                target = urllib.parse.urljoin(target, response.getheader("Location"))
+                max_redirects -= 1
+                result["attempts"] -= 1
+                continue
+            result["etag"] = response.getheader("ETag")
+            result["last_modified"] = response.getheader("Last-Modified")
+            if response.status == 304:
+                # report has not changed since it was cached, without a cache the caller keeps the old copy
+                result["data"] = cache.get(url) if cache is not None else None
+                break
+            if response.status == 200:
+                result["data"] = body
+                if cache is not None:
+                    cache.put(url, body, response.getheader("ETag"), response.getheader("Last-Modified"))
+                break
+            if response.status not in RETRY_STATUSES:
+                print(f"ERROR in fetching {url}: HTTP {response.status}")
+                break
+        except (OSError, http.client.HTTPException) as ex:
+            pool.drop(parts.scheme, parts.netloc)
+            print(f"ERROR in fetching {url} (attempt {result['attempts']}): {ex}")
+        if result["attempts"] <= retries:
+            time.sleep(backoff * 2 ** (result["attempts"] - 1))
+    result["elapsed"] = time.perf_counter() - start
+    return result
+
+
+def download_path(url, cache=None):
+    """File a report is downloaded to, named after its URL so an interrupted download resumes.
+
+    Params:
+    - url (str): report URL
+    - cache (DownloadCache/None): download cache the report is moved into once downloaded
+    Return:
+        path (str): file under the downloads directory of the cache, or of resources without a cache
+    """
+    download_dir = os.path.join(cache.cache_dir if cache is not None else "resources", "downloads")
+    os.makedirs(download_dir, exist_ok=True)
+    return os.path.join(download_dir, f"{hashlib.sha256(url.encode()).hexdigest()}.pdf")
+
+
+def fetch_report_file(url, pool, retries=3, backoff=0.5, max_redirects=5, cache=None, parts=4):
+    """Download a single report to a file with download_report, retrying failed attempts.
+
+    Params:
+    - url (str): report URL
+    - pool (ConnectionPool): keep-alive connections to reuse
+    - retries (int): number of retries after a failed attempt, and of a failed byte range
+    - backoff (float): base delay in seconds, doubled after each failed attempt
+    - max_redirects (int): number of redirects followed
+    - cache (DownloadCache/None): download cache used for conditional requests, new reports are moved into it
+    - parts (int): maximum number of byte ranges downloaded in parallel
+    Return:
+        result (dict): url, path (None on failure), status, size, attempts, elapsed seconds and the ETag and
+        Last-Modified of the response
+    """
+    start = time.perf_counter()
+    result = {
+        "url": url, "path": None, "status": None, "size": 0, "attempts": 0, "elapsed": 0.0, "etag": None,
+        "last_modified": None
+    }
+    path = download_path(url, cache)
+    # add conditional headers when the report is already cached
+    headers = cache.conditional_headers(url) if cache is not None else {}
+    while result["attempts"] <= retries:
+        result["attempts"] += 1
+        try:
+            download = download_report(
+                url, path, pool, parts, headers, retries=retries, backoff=backoff, max_redirects=max_redirects
+            )
+        except HTTPStatusError as ex:
+            result["status"] = ex.status
+            if ex.status not in RETRY_STATUSES:
+                print(f"ERROR in fetching {url}: HTTP {ex.status}")
+                break
+            print(f"ERROR in fetching {url} (attempt {result['attempts']}): {ex}")
+        except (OSError, http.client.HTTPException) as ex:
+            print(f"ERROR in fetching {url} (attempt {result['attempts']}): {ex}")
+        else:
+            result.update(status=download["status"], etag=download["etag"], last_modified=download["last_modified"])
+            if download["path"] is None:
+                # report has not changed since it was cached
+                result["path"] = cache.path(url)
+            elif cache is not None:
+                result["path"] = cache.put_file(
+                    url, path, download["sha256"], download["etag"], download["last_modified"]
+                )
+            else:
+                result["path"] = path
+            break
+        if result["attempts"] <= retries:
+            time.sleep(backoff * 2 ** (result["attempts"] - 1))
+    if result["path"] is not None:
+        result["size"] = os.path.getsize(result["path"])
+    result["elapsed"] = time.perf_counter() - start
+    return result
+
+
+def _request(pool, url, headers):
+    # send a GET request over a pooled connection and return the response with its body still unread
+    parts = urllib.parse.urlsplit(url)
+    path = parts.path or "/"
+    if parts.query:
+        path = f"{path}?{parts.query}"
+    conn = pool.get(parts.scheme, parts.netloc)
+    try:
+        conn.request("GET", path, headers=headers)
+        return conn.getresponse()
+    except (OSError, http.client.HTTPException):
+        pool.drop(parts.scheme, parts.netloc)
+        raise
+
+
+def _stream_to_file(response, f, part, chunk_size, on_chunk):
+    # copy a response body into the file at the next offset of a part, reporting every chunk written
+    f.seek(part[2])
+    while part[2] <= part[1]:
+        chunk = response.read(min(chunk_size, part[1] + 1 - part[2]))
+        if not chunk:
+            raise http.client.IncompleteRead(b"", part[1] + 1 - part[2])
+        f.write(chunk)
+        part[2] += len(chunk)
+        on_chunk(len(chunk))
+
+
+def response_digest(response):
+    """SHA-256 digest of the report announced by the server in a Repr-Digest or Digest header.
+
+    Params:
+        response (http.client.HTTPResponse): response of a report request
+    Return:
+        sha256 (str/None): SHA-256 hex digest, None when the server announces none
+    """
+    for name in ("Repr-Digest", "Digest"):
+        match = DIGEST_PATTERN.search(response.getheader(name) or "")
+        if match is not None:
+            try:
+                digest = base64.b64decode(match.group(1), validate=True)
+            except binascii.Error:
+                continue
+            if len(digest) == hashlib.sha256().digest_size:
+                return digest.hex()
+    return None
+
+
+def _finish_download(part_path, path, result, sha256, chunk_size, start, ranges=None):
+    # verify the complete file before it replaces the report
+    state_path = f"{part_path}.json"
+    digest = hashlib.sha256()
+    with open(part_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    error = None
+    if ranges is not None:
+        # the file is preallocated, so only the written ranges tell whether every byte of the report arrived
+        end = 0
+        for first, last, offset in sorted(ranges):
+            if first != end or offset != last + 1:
+                error = f"bytes {first}-{last} of {result['size']} were not downloaded"
+                break
+            end = last + 1
+        if error is None and end != result["size"]:
+            error = f"downloaded {end} bytes of {result['size']}"
+    if error is None and sha256 is not None and digest.hexdigest() != sha256:
+        error = f"SHA-256 {digest.hexdigest()} does not match {sha256}"
+    if error is not None:
+        # start the next download over rather than resuming a broken file
+        os.remove(part_path)
+        if os.path.exists(state_path):
+            os.remove(state_path)
+        raise OSError(error)
+    result["sha256"] = digest.hexdigest()
+    os.replace(part_path, path)
+    if os.path.exists(state_path):
+        os.remove(state_path)
+    result["elapsed"] = time.perf_counter() - start
+    return result
+
+
+def download_report(url, path, pool=None, parts=4, headers=None, sha256=None, chunk_size=CHUNK_SIZE,
+                    part_size=PART_SIZE, retries=3, backoff=0.5, timeout=30, max_redirects=5):
+    """Stream a report to a file in chunks, in parallel byte ranges when the server accepts them.
+
+    The first request asks for the first part_size bytes. A server answering with the whole
+    report (200) is streamed to the file as it arrives. A server answering with the range (206)
+    tells the size of the report, and the rest of it is split into at most parts byte ranges
+    downloaded in parallel. Bytes go to path + '.part', and the progress of each range is kept in
+    path + '.part.json' together with the ETag / Last-Modified of the report, so a download
+    interrupted in an earlier run resumes where it stopped if the report has not changed. Before
+    the complete file is moved to path, it is checked against the expected SHA-256 digest, or the
+    one announced in a Repr-Digest / Digest header of the server. Without any digest, integrity
+    relies on the byte accounting alone: the ranges of a ranged download must have been written
+    completely and cover the whole report, and a whole report response must match its
+    Content-Length.
+
+    Params:
+    - url (str): report URL
+    - path (str): file the report is saved to
+    - pool (ConnectionPool/None): keep-alive connections to reuse, a new pool by default
+    - parts (int): maximum number of byte ranges downloaded in parallel
+    - headers (dict/None): additional request headers of the first request, e.g. conditional headers
+    - sha256 (str/None): expected SHA-256 hex digest of the report, defaults to the digest announced by the server
+    - chunk_size (int): size of the reads written to the file
+    - part_size (int): size of the first request and smallest size of a parallel range
+    - retries (int): number of retries of a failed range
+    - backoff (float): base delay in seconds, doubled after each failed attempt
+    - timeout (float): socket timeout in seconds
+    - max_redirects (int): number of redirects followed
+    Return:
+        result (dict): url, path (None for 304), status of the first response, size, sha256, number of parts,
+        etag, last_modified and elapsed seconds
+    Raise:
+        Exception while requesting the report / if the downloaded file does not match the report
+    """
+    start = time.perf_counter()
+    own_pool = pool is None
+    pool = pool or ConnectionPool(timeout)
+    part_path, state_path = f"{path}.part", f"{path}.part.json"
+    try:
+        state = None
+        if os.path.exists(part_path) and os.path.exists(state_path):
+            with open(state_path) as f:
+                state = json.load(f)
+        # resume the first unfinished range of an interrupted download, or ask for the first part of the report
+        request_headers = dict(assignment.HEADERS)
+        if state is not None and all(part[2] > part[1] for part in state["parts"]):
+            # every range was written before the download stopped, only the verification is left
+            result = {
+                "url": url, "path": path, "status": 206, "size": state["size"], "sha256": None,
+                "parts": len(state["parts"]), "etag": state["etag"], "last_modified": state["last_modified"],
+                "elapsed": 0.0
+            }
+            return _finish_download(
+                part_path, path, result, sha256 or state.get("sha256"), chunk_size, start, state["parts"]
+            )
+        if state is not None:
+            first = next(part for part in state["parts"] if part[2] <= part[1])
+            request_headers["Range"] = f"bytes={first[2]}-{first[1]}"
+            request_headers["If-Range"] = state["etag"] or state["last_modified"]
+        else:
+            request_headers.update(headers or {})
+            request_headers["Range"] = f"bytes=0-{part_size - 1}"
+        target = url
+        while True:
+            response = _request(pool, target, request_headers)
+            if response.status not in (301, 302, 303, 307, 308) or max_redirects <= 0:
+                break
+            response.read()
+            target = urllib.parse.urljoin(target, response.getheader("Location"))
+            max_redirects -= 1
+        result = {
+            "url": url, "path": path, "status": response.status, "size": None, "sha256": None, "parts": 1,
+            "etag": response.getheader("ETag"), "last_modified": response.getheader("Last-Modified"), "elapsed": 0.0
+        }
+        if response.status == 304:
+            # the cached report has not changed
+            response.read()
+            result["path"] = None
+            return result
+        if response.status not in (200, 206):
+            response.read()
+            raise HTTPStatusError(response.status)
+        lock = threading.Lock()
+
+        def save_state():
+            with lock:
+                with open(f"{state_path}.tmp", "w") as f:
+                    json.dump(state, f)
+                os.replace(f"{state_path}.tmp", state_path)
+
+        if response.status == 200:
+            # the whole report in one response, byte ranges are not supported or the report changed
+            state = None
+            sha256 = sha256 or response_digest(response)
+            length = response.getheader("Content-Length")
+            size = int(length) if length is not None else None
+            written = 0
+            with open(part_path, "wb") as f:
+                while True:
+                    chunk = response.read(chunk_size)
+                    if not chunk:
+                        break
+                    f.write(chunk)
+                    written += len(chunk)
+                    METRICS.count("download", bytes=len(chunk))
+            if size is not None and written != size:
+                raise http.client.IncompleteRead(b"", size - written)
+            result["size"] = written
+        else:
+            match = CONTENT_RANGE_PATTERN.fullmatch(response.getheader("Content-Range") or "")
+            if match is None:
+                raise OSError("invalid Content-Range of a ranged response")
+            first_end, size = int(match.group(2)), int(match.group(3))
+            if state is None:
+                # split the rest of the report into ranges of [start, end, next byte] and preallocate the file
+                rest = size - first_end - 1
+                count = max(1, min(parts, rest // part_size)) if rest > 0 else 0
+                bounds = [first_end + 1 + rest * i // count for i in range(count + 1)] if count else []
+                state = {
+                    "url": url, "size": size, "etag": result["etag"], "last_modified": result["last_modified"],
+                    "sha256": response_digest(response),
+                    "parts": [[0, first_end, 0]] + [[bounds[i], bounds[i + 1] - 1, bounds[i]] for i in range(count)]
+                }
+                with open(part_path, "wb") as f:
+                    f.truncate(size)
+                first = state["parts"][0]
+            # progress can only be resumed when the report can be recognized again
+            resumable = bool(state["etag"] or state["last_modified"])
+
+            def on_chunk(length):
+                METRICS.count("download", bytes=length)
+                if resumable:
+                    save_state()
+
+            def fetch_range(part):
+                # each range thread opens its own connection, closed once the range is done since the thread ends
+                try:
+                    attempts = 0
+                    while part[2] <= part[1]:
+                        attempts += 1
+                        range_headers = dict(assignment.HEADERS, Range=f"bytes={part[2]}-{part[1]}")
+                        if resumable:
+                            range_headers["If-Range"] = state["etag"] or state["last_modified"]
+                        try:
+                            range_response = _request(pool, target, range_headers)
+                            if range_response.status != 206:
+                                range_response.read()
+                                raise OSError(f"HTTP {range_response.status} for bytes {part[2]}-{part[1]}")
+                            with open(part_path, "r+b") as f:
+                                _stream_to_file(range_response, f, part, chunk_size, on_chunk)
+                        except (OSError, http.client.HTTPException) as ex:
+                            if attempts > retries:
+                                raise
+                            print(f"ERROR in downloading {url} bytes {part[2]}-{part[1]} (attempt {attempts}): {ex}")
+                            time.sleep(backoff * 2 ** (attempts - 1))
+                finally:
+                    target_parts = urllib.parse.urlsplit(target)
+                    pool.drop(target_parts.scheme, target_parts.netloc)
+
+            with open(part_path, "r+b") as f:
+                _stream_to_file(response, f, first, chunk_size, on_chunk)
+            remaining = [part for part in state["parts"] if part[2] <= part[1]]
+            if remaining:
+                # let every range finish before failing, so a resumed download only repeats the failed ones
+                with ThreadPoolExecutor(max_workers=len(remaining)) as executor:
+                    futures = [executor.submit(fetch_range, part) for part in remaining]
+                for future in futures:
+                    future.result()
+            result["size"], result["parts"] = size, len(state["parts"])
+            # a digest announced by the server is kept with the progress of the download it belongs to
+            sha256 = sha256 or state.get("sha256")
+        return _finish_download(
+            part_path, path, result, sha256, chunk_size, start, state["parts"] if state is not None else None
+        )
+    finally:
+        if own_pool:
+            pool.close()
+
+
+def fetch_cached_report(url, cache):
+    """Serve a report from the download cache without any request.
+
+    Params:
+    - url (str): report URL
+    - cache (DownloadCache/None): download cache of previously fetched reports
+    Return:
+        result (dict): url, path (None when not cached), status, size, attempts and elapsed seconds
+    """
+    start = time.perf_counter()
+    path = cache.path(url) if cache is not None else None
+    if path is None:
+        print(f"ERROR in fetching {url}: report is not cached for offline use")
+    return {
+        "url": url, "path": path, "status": None, "size": os.path.getsize(path) if path is not None else 0,
+        "attempts": 0, "elapsed": time.perf_counter() - start, "etag": None, "last_modified": None
+    }
+
+
+def fetch_reports(urls, max_workers=4, retries=3, backoff=0.5, timeout=30, cache=None, offline=False, parts=4):
+    """Download many reports concurrently with bounded parallelism.
+
+    Each report is streamed to a file by fetch_report_file, so reports are never held in memory and
+    are loaded by memory-mapping the returned files.
+
+    Params:
+    - urls (List[str]): report URLs
+    - max_workers (int): maximum number of concurrent downloads
+    - retries (int): number of retries after a failed attempt
+    - backoff (float): base delay in seconds between attempts
+    - timeout (float): socket timeout in seconds
+    - cache (DownloadCache/None): download cache used for conditional requests
+    - offline (bool): serve reports from the cache only, without any request
+    - parts (int): maximum number of byte ranges of a report downloaded in parallel
+    Return:
+        results (List[dict]): fetch results in the same order as urls, with the path of each downloaded report
+    """
+    with METRICS.stage("download"):
+        if offline:
+            results = [fetch_cached_report(url, cache) for url in urls]
+        else:
+            pool = ConnectionPool(timeout)
+            try:
+                with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                    results = list(executor.map(
+                        lambda url: fetch_report_file(url, pool, retries, backoff, cache=cache, parts=parts), urls
+                    ))
+            finally:
+                pool.close()
+
+    for result in results:
+        # report per-URL timing on stderr so stdout only carries the status output
+        print(f"Fetched {result['url']} status={result['status']} bytes={result['size']} "
+              f"attempts={result['attempts']} in {result['elapsed']:.3f}s", file=sys.stderr)
+    return results
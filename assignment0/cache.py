@@ -0,0 +1,326 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# default location and size limit of the download cache
+CACHE_DIR = "resources/cache"
+MAX_CACHE_BYTES = 512 * 1024 * 1024
+
+# default file name and size limit of the parsed page cache
+PAGE_CACHE_FILE = "pages.db"
+MAX_PAGE_CACHE_BYTES = 64 * 1024 * 1024
+
+
+class DownloadCache:
+    """Content-addressed on-disk cache of downloaded reports keyed by URL.
+
+    Report bytes are stored once per SHA-256 digest under objects/, while index.json maps
+    each URL to its digest, ETag, Last-Modified and last use time for LRU eviction.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(cache_dir, "index.json")
+        self._lock = threading.Lock()
+        self.index = self._load_index()
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as ex:
+            print("ERROR in reading download cache index: ", ex)
+            return {}
+
+    def _save_index(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # write to a temporary file first so a crash never leaves a truncated index
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.index, f)
+        os.replace(tmp_path, self.index_path)
+
+    def _object_path(self, digest):
+        return os.path.join(self.cache_dir, "objects", digest[:2], digest)
+
+    def conditional_headers(self, url):
+        """HTTP headers turning a request for a cached URL into a conditional request.
+
+        Params:
+            url (str): report URL
+        Return:
+            headers (dict): If-None-Match / If-Modified-Since headers, empty if the URL is not cached
+        """
+        entry = self.index.get(url)
+        if entry is None or not os.path.exists(self._object_path(entry["sha256"])):
+            return {}
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def get(self, url):
+        """Cached report of a URL.
+
+        Params:
+            url (str): report URL
+        Return:
+            data (bytes/None): cached report, None if the URL is not cached
+        """
+        with self._lock:
+            entry = self.index.get(url)
+            if entry is None:
+                return None
+            try:
+                with open(self._object_path(entry["sha256"]), "rb") as f:
+                    data = f.read()
+            except FileNotFoundError:
+                del self.index[url]
+                self._save_index()
+                return None
+            entry["last_used"] = time.time()
+            self._save_index()
+            return data
+
+    def path(self, url):
+        """File of the cached report of a URL, for reading it without loading it into memory.
+
+        Params:
+            url (str): report URL
+        Return:
+            path (str/None): cached report file, None if the URL is not cached
+        """
+        with self._lock:
+            entry = self.index.get(url)
+            if entry is None:
+                return None
+            path = self._object_path(entry["sha256"])
+            if not os.path.exists(path):
+                del self.index[url]
+                self._save_index()
+                return None
+            entry["last_used"] = time.time()
+            self._save_index()
+            return path
+
+    def put(self, url, data, etag=None, last_modified=None):
+        """Store a downloaded report and evict least recently used reports over the size limit.
+
+        Params:
+        - url (str): report URL
+        - data (bytes): report content
+        - etag (str/None): ETag response header
+        - last_modified (str/None): Last-Modified response header
+        Return:
+            digest (str): SHA-256 hex digest the report is stored under
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            path = self._object_path(digest)
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            self._add(url, digest, len(data), etag, last_modified)
+        return digest
+
+    def put_file(self, url, file_path, digest, etag=None, last_modified=None):
+        """Move a report downloaded to a file into the cache, without reading it into memory.
+
+        Params:
+        - url (str): report URL
+        - file_path (str): downloaded report, moved into the cache
+        - digest (str): SHA-256 hex digest of the report
+        - etag (str/None): ETag response header
+        - last_modified (str/None): Last-Modified response header
+        Return:
+            path (str): cached report file
+        """
+        size = os.path.getsize(file_path)
+        with self._lock:
+            path = self._object_path(digest)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(file_path, path)
+            self._add(url, digest, size, etag, last_modified)
+        return path
+
+    def _add(self, url, digest, size, etag, last_modified):
+        self.index[url] = {
+            "sha256": digest,
+            "size": size,
+            "etag": etag,
+            "last_modified": last_modified,
+            "last_used": time.time(),
+        }
+        self._evict()
+        self._save_index()
+
+    def _evict(self):
+        # total size counts each stored object once even if several URLs share it
+        sizes = {entry["sha256"]: entry["size"] for entry in self.index.values()}
+        total = sum(sizes.values())
+        for url, entry in sorted(self.index.items(), key=lambda item: item[1]["last_used"]):
+            # always keep the most recently used report
+            if total <= self.max_bytes or len(self.index) == 1:
+                break
+            del self.index[url]
+            digest = entry["sha256"]
+            # remove the object once no remaining URL refers to it
+            if all(other["sha256"] != digest for other in self.index.values()):
+                total -= sizes[digest]
+                try:
+                    os.remove(self._object_path(digest))
+                except FileNotFoundError:
+                    pass
+
+
+class PageCache:
+    """Persistent cache of parsed pages keyed by a hash of the page text and parser version.
+
+    Entries are the JSON encoded incident rows of a page in an SQLite file, so lookups are one
+    indexed read. Last use times and new entries are written in one transaction by flush(),
+    which also evicts the least recently used pages over the size limit. The cache is disabled
+    until it is configured with a path, and each process opens its own connection.
+    """
+
+    def __init__(self, path=None, max_bytes=MAX_PAGE_CACHE_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._conn = None
+        self._pid = None
+        self._total = 0
+        self._touched = {}
+        self._pending = {}
+
+    def configure(self, path, max_bytes=MAX_PAGE_CACHE_BYTES):
+        """Enable the cache on an SQLite file, or disable it with a path of None.
+
+        Params:
+        - path (str/None): cache file
+        - max_bytes (int): size limit of the cached rows
+        Return:
+            None
+        """
+        self.close()
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = self.misses = 0
+        self._touched, self._pending = {}, {}
+
+    @property
+    def enabled(self):
+        return self.path is not None
+
+    def _connection(self):
+        # a connection is never shared with forked worker processes
+        if self._conn is None or self._pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS pages(key TEXT PRIMARY KEY, rows TEXT NOT NULL, size INTEGER NOT NULL, "
+                "last_used REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_pages_last_used ON pages (last_used)")
+            self._total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+            self._conn, self._pid = conn, os.getpid()
+            self._touched, self._pending = {}, {}
+        return self._conn
+
+    def get(self, key):
+        """Cached rows of a page.
+
+        Params:
+            key (str): page key
+        Return:
+            rows (list/None): incident rows of the page, None if the page is not cached
+        """
+        if self.path is None:
+            return None
+        rows = self._pending.get(key)
+        if rows is None:
+            row = self._connection().execute("SELECT rows FROM pages WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            rows = json.loads(row[0])
+        self._touched[key] = time.time()
+        self.hits += 1
+        return rows
+
+    def put(self, key, rows):
+        """Queue the parsed rows of a page for the next flush.
+
+        Params:
+        - key (str): page key
+        - rows (list): incident rows of the page
+        Return:
+            None
+        """
+        if self.path is not None:
+            self._connection()
+            self._pending[key] = rows
+
+    def flush(self):
+        """Write queued pages and last use times, then evict over the size limit.
+
+        Return:
+            None
+        """
+        if self.path is None or (not self._touched and not self._pending):
+            return
+        conn = self._connection()
+        now = time.time()
+        entries = [(key, json.dumps(rows)) for key, rows in self._pending.items()]
+        with conn:
+            conn.executemany(
+                "UPDATE pages SET last_used = ? WHERE key = ?", [(used, key) for key, used in self._touched.items()]
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO pages (key, rows, size, last_used) VALUES (?, ?, ?, ?)",
+                [(key, data, len(data), now) for key, data in entries],
+            )
+            self._total += sum(len(data) for _, data in entries)
+            if self._total > self.max_bytes:
+                self._evict(conn)
+        self._touched, self._pending = {}, {}
+
+    def _evict(self, conn):
+        # the running total is an estimate when several processes write, recount before evicting
+        self._total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+        pages = conn.execute("SELECT key, size FROM pages ORDER BY last_used").fetchall()
+        # always keep the most recently used page
+        for key, size in pages[:-1]:
+            if self._total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM pages WHERE key = ?", (key,))
+            self._total -= size
+
+    def close(self):
+        """Flush queued writes and close the connection of this process.
+
+        Return:
+            None
+        """
+        if self._conn is not None and self._pid == os.getpid():
+            self.flush()
+            self._conn.close()
+        self._conn = None
+        self._pid = None
+
+
+# cache of parsed pages shared by the pipeline, enabled by main.py
+PAGE_CACHE = PageCache()
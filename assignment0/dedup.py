@@ -0,0 +1,85 @@
+# incident keys probed by one query
+PROBE_SIZE = 250
+
+
+class IncidentKeyFilter:
+    """Cross-report duplicate detection over the incident_keys table of a database.
+
+    incident_keys holds the ORI and incident number of every loaded incident together with the
+    report it was first loaded from, under its primary key. Each agency numbers its incidents in
+    increasing order, so an incident numbered above the highest number recorded for its ORI has
+    not been loaded before and is not looked up. Only the other incidents, mostly those a report
+    lists again, are probed in the primary key, PROBE_SIZE keys per query. The highest number of an
+    ORI is one search of the primary key. Keys are always recorded, duplicates are only looked up
+    once the filter is enabled.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.high_water = {}
+        self.probes = 0
+        self.duplicates = 0
+
+    def reset(self):
+        """Forget the highest incident numbers read before, other connections may have added incidents since."""
+        self.high_water = {}
+
+    def _high_water(self, db, ori_id):
+        if ori_id not in self.high_water:
+            self.high_water[ori_id] = db.execute(
+                "SELECT MAX(incident_number) FROM incident_keys WHERE ori_id = ?", (ori_id,)
+            ).fetchone()[0]
+        return self.high_water[ori_id]
+
+    def find_duplicates(self, db, report_date, keys):
+        """Incidents of a report already loaded from another report.
+
+        Params:
+        - db (sqlite3.Connection): database connection object
+        - report_date (str): date of the report being loaded
+        - keys (list): (incident number, ORI id) of the incidents being loaded
+        Return:
+            duplicates (set): keys first loaded from another report, empty when the filter is disabled
+        """
+        if not self.enabled:
+            return set()
+        candidates = []
+        for key in keys:
+            high_water = None if key[0] is None else self._high_water(db, key[1])
+            if high_water is not None and key[0] <= high_water:
+                candidates.append(key)
+        self.probes += len(candidates)
+        duplicates = set()
+        for i in range(0, len(candidates), PROBE_SIZE):
+            chunk = candidates[i:i + PROBE_SIZE]
+            # a join of the keys searches the primary key, a row value IN list would scan the table
+            duplicates.update(db.execute(
+                f"SELECT k.incident_number, k.ori_id FROM (VALUES {', '.join(['(?, ?)'] * len(chunk))}) AS v "
+                "JOIN incident_keys AS k ON k.ori_id = v.column2 AND k.incident_number = v.column1 "
+                "WHERE k.report_date <> ?",
+                [*(value for key in chunk for value in key), report_date],
+            ))
+        self.duplicates += len(duplicates)
+        return duplicates
+
+    def register(self, db, report_date, keys):
+        """Record the incidents of a report in incident_keys, keeping the report of incidents recorded before.
+
+        Params:
+        - db (sqlite3.Connection): database connection object
+        - report_date (str): date of the report being loaded
+        - keys (list): (incident number, ORI id) of the loaded incidents
+        Return:
+            None
+        """
+        db.executemany(
+            "INSERT OR IGNORE INTO incident_keys (incident_number, ori_id, report_date) VALUES (?, ?, ?)",
+            [(*key, report_date) for key in keys if key[0] is not None],
+        )
+        # the next batch reads the highest numbers again, including the incidents of this one
+        for _, ori_id in keys:
+            self.high_water.pop(ori_id, None)
+
+
+# duplicate detection shared by the loads of a process, enabled by main.py
+INCIDENT_KEY_FILTER = IncidentKeyFilter()
@@ -0,0 +1,174 @@
+import json
+import os
+import time
+
+# counters a stage can report
+COUNTERS = ("bytes", "pages", "records", "rows")
+
+
+class _NullStage:
+    """Stage context used while instrumentation is disabled, it records nothing."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    """Context measuring wall and CPU time of one pass through a stage."""
+
+    __slots__ = ("stats", "page", "wall", "cpu")
+
+    def __init__(self, stats, page):
+        self.stats = stats
+        self.page = page
+
+    def __enter__(self):
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+        return self
+
+    def __exit__(self, *exc):
+        wall = time.perf_counter() - self.wall
+        self.stats["wall_seconds"] += wall
+        self.stats["cpu_seconds"] += time.process_time() - self.cpu
+        self.stats["calls"] += 1
+        if self.page is not None:
+            # the pages of every report of a run add up under their page number
+            page_seconds = self.stats.setdefault("page_seconds", {})
+            page_seconds[str(self.page)] = page_seconds.get(str(self.page), 0.0) + wall
+        return False
+
+
+class Instrumentation:
+    """Per-stage wall time, CPU time and counters of a pipeline run.
+
+    Stages are entered with `with METRICS.stage("extract"):` and may be entered many
+    times, their times and counters add up. While disabled, stage() and count() do no work.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.reset()
+
+    def reset(self):
+        """Forget all recorded stages and gauges and restart the run clock."""
+        self.stages = {}
+        self.gauges = {}
+        self.started = time.perf_counter()
+
+    def _stats(self, name):
+        stats = self.stages.get(name)
+        if stats is None:
+            stats = self.stages[name] = {"wall_seconds": 0.0, "cpu_seconds": 0.0, "calls": 0}
+            stats.update(dict.fromkeys(COUNTERS, 0))
+        return stats
+
+    def stage(self, name, page=None):
+        """Context measuring one pass through a stage.
+
+        Params:
+        - name (str): stage name, e.g. download, extract, parse, json, load
+        - page (int/None): page number, to also add up the time spent on that page of each report
+        Return:
+            context (contextmanager): measures the enclosed block
+        """
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self._stats(name), page)
+
+    def count(self, name, **counters):
+        """Add to the counters of a stage.
+
+        Params:
+        - name (str): stage name
+        - counters (int): bytes, pages, records and/or rows processed by the stage
+        Return:
+            None
+        """
+        if not self.enabled:
+            return
+        stats = self._stats(name)
+        for counter, value in counters.items():
+            stats[counter] += value
+
+    def gauge(self, name, value):
+        """Set a gauge of the run, e.g. the latency of the last ingested report.
+
+        Params:
+        - name (str): gauge name
+        - value (float): current value of the gauge
+        Return:
+            None
+        """
+        if not self.enabled:
+            return
+        self.gauges[name] = value
+
+    def summary(self):
+        """Machine-readable summary of the run.
+
+        Return:
+            summary (dict): total wall time, the stats of every stage and the gauges
+        """
+        return {"wall_seconds": time.perf_counter() - self.started, "stages": self.stages, "gauges": self.gauges}
+
+    def write_json(self, path):
+        """Write the run summary as JSON.
+
+        Params:
+            path (str): JSON file path
+        Return:
+            None
+        """
+        _write_atomic(path, json.dumps(self.summary(), indent=4))
+
+    def write_prometheus(self, path):
+        """Write the run summary in the Prometheus textfile collector format.
+
+        Params:
+            path (str): .prom file path, written atomically as the collector requires
+        Return:
+            None
+        """
+        summary = self.summary()
+        lines = [
+            "# HELP normanpd_run_wall_seconds Wall time of the last pipeline run.",
+            "# TYPE normanpd_run_wall_seconds gauge",
+            f"normanpd_run_wall_seconds {summary['wall_seconds']}",
+        ]
+        metrics = [
+            ("wall_seconds", "Wall time spent in each pipeline stage."),
+            ("cpu_seconds", "CPU time spent in each pipeline stage."),
+            ("calls", "Number of passes through each pipeline stage."),
+            *[(counter, f"Number of {counter} processed by each pipeline stage.") for counter in COUNTERS],
+        ]
+        for metric, description in metrics:
+            name = f"normanpd_stage_{metric}"
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} gauge")
+            for stage, stats in summary["stages"].items():
+                lines.append(f'{name}{{stage="{stage}"}} {stats[metric]}')
+        for gauge, value in summary["gauges"].items():
+            lines.append(f"# TYPE normanpd_{gauge} gauge")
+            lines.append(f"normanpd_{gauge} {value}")
+        _write_atomic(path, "\n".join(lines) + "\n")
+
+
+def _write_atomic(path, content):
+    # write to a temporary file first so readers never see a partial file
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+# instrumentation shared by the pipeline stages, disabled unless a run asks for it
+METRICS = Instrumentation()
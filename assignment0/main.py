@@ -1,37 +1,584 @@
 import argparse
-from assignment0 import assignment
+import os
+import sys
+from datetime import date
+from assignment0 import queries
+
+
+def ingest_report(db, url, incident_data, workers=1, batch_size=500, append=False, stream=False):
+    from assignment0 import assignment
+
+    # skip a report whose content is already recorded in the ingestion ledger
+    content_hash = assignment.hash_report(incident_data)
+    report_date = assignment.get_report_date(url)
+    if append and assignment.is_ingested(db, content_hash):
+        print(f"Skipping already ingested report: {url}", file=sys.stderr)
+        assignment.record_checkpoint(db, url, "done", content_hash, report_date)
+        return
+
+    # unreadable pages are quarantined and a report that cannot be read fails alone, the run goes on
+    assignment.QUARANTINED_PAGES.clear()
+    error = "incidents could not be loaded"
+    try:
+        if stream:
+            # parse pages lazily and write JSON and database rows from the same stream
+            incidents = assignment.stream_json(assignment.iter_incidents(incident_data))
+        else:
+            # extract incident data
+            incidents = assignment.extract_incidents(incident_data, workers)
+
+        # populate database table with extracted incidents
+        rows = assignment.populate_db(db, incidents, batch_size, report_date)
+    except Exception as ex:
+        print(f"ERROR in ingesting {url}: ", ex)
+        rows, error = None, repr(ex)
+
+    # record the report in the ingestion ledger and the checkpoint journal once it is loaded
+    if rows is not None:
+        assignment.record_ingestion(db, content_hash, url, report_date, rows)
+        assignment.record_checkpoint(
+            db, url, "done", content_hash, report_date, rows, quarantined=assignment.QUARANTINED_PAGES
+        )
+    else:
+        assignment.record_checkpoint(db, url, "failed", content_hash, report_date, error=error)
+
+
+def main(url, workers=1, batch_size=500, append=False, cache=None, offline=False, stream=False, partitioned=False,
+         resume=False, download_parts=4):
+    from assignment0 import assignment
 
-def main(url):
     # define database name
     db_name = "normanpd.db"
 
-    # delete existing DB
-    assignment.delete_existing_db(db_name)
+    # delete existing DB unless new reports are appended to it or an interrupted run is resumed
+    if not (append or resume):
+        assignment.delete_existing_db(db_name)
 
-    # get incident PDF data
-    incident_data = assignment.fetch_incidents(url)
+    # create new database or open the existing one
+    db = assignment.create_db(db_name, partitioned)
 
-    # extract incident data
-    incidents = assignment.extract_incidents(incident_data)
+    # grow the nature vocabulary with natures already in the database
+    assignment.seed_vocabulary(db)
 
-    # create new database
-    db = assignment.create_db(db_name)
+    if resume and url in assignment.completed_sources(db):
+        # the report was completed by an earlier run, it is not downloaded again
+        print(f"Skipping completed report: {url}", file=sys.stderr)
+    else:
+        # get incident PDF data, mapping local files instead of downloading them
+        if assignment.is_url(url):
+            incident_data = assignment.fetch_incidents(url, cache, offline, download_parts)
+        else:
+            incident_data = assignment.map_report(url)
 
-    # populate database table with extracted incidents
-    assignment.populate_db(db, incidents)
+        # load the report into the database
+        if incident_data is not None:
+            ingest_report(db, url, incident_data, workers, batch_size, append or resume, stream)
+            if isinstance(incident_data, assignment.MappedReport):
+                incident_data.close()
+        else:
+            assignment.record_checkpoint(db, url, "failed", error="report could not be fetched or read")
 
     # print incident nature with their count
     assignment.status(db)
 
 
-if __name__ == "__main__":
-    # initialize command-line argument parsing
-    parser = argparse.ArgumentParser()
-    # define the required command-line argument '--incidents' for the incident summary URL
+def backfill_main(urls, workers=1, batch_size=500, fetch_workers=4, append=False, cache=None, offline=False,
+                  stream=False, partitioned=False, shards=1, resume=False, download_parts=4):
+    from assignment0 import assignment, backfill
+
+    # define database name
+    db_name = "normanpd.db"
+
+    # delete existing DB unless new reports are appended to it or an interrupted run is resumed
+    if not (append or resume):
+        assignment.delete_existing_db(db_name)
+
+    # create new database or open the existing one
+    db = assignment.create_db(db_name, partitioned)
+
+    # grow the nature vocabulary with natures already in the database
+    assignment.seed_vocabulary(db)
+
+    if resume:
+        # reports completed by an earlier run are skipped before they are downloaded, failed ones are retried
+        completed = assignment.completed_sources(db)
+        remaining = [url for url in urls if url not in completed]
+        print(f"Resuming: {len(urls) - len(remaining)} completed reports skipped, {len(remaining)} remaining",
+              file=sys.stderr)
+        urls = remaining
+
+    # download and load the reports a window at a time, so only the downloads of one window are kept on disk and
+    # the download cache cannot evict a report of the run before it is loaded
+    for first in range(0, len(urls), backfill.WINDOW_SIZE):
+        window = urls[first:first + backfill.WINDOW_SIZE]
+        remote_urls = [url for url in window if assignment.is_url(url)]
+        fetched = {}
+        if remote_urls:
+            # download the remote reports of the window concurrently to files
+            results = backfill.fetch_reports(
+                remote_urls, max_workers=fetch_workers, cache=cache, offline=offline, parts=download_parts
+            )
+            fetched = {result["url"]: result["path"] for result in results}
+        for url in remote_urls:
+            if fetched[url] is None:
+                assignment.record_checkpoint(db, url, "failed", error="report could not be fetched")
+        try:
+            if shards > 1:
+                # parse and load the reports in worker processes into shard databases, then merge them, the
+                # downloaded and local files are mapped by the workers
+                reports = [(url, fetched.get(url, url)) for url in window]
+                assignment.ingest_sharded(db, [report for report in reports if report[1] is not None], shards,
+                                          batch_size)
+            else:
+                # load every report into the database, mapping its file one at a time
+                for url in window:
+                    path = fetched.get(url, url)
+                    if path is None:
+                        continue
+                    incident_data = assignment.map_report(path)
+                    if incident_data is not None:
+                        ingest_report(db, url, incident_data, workers, batch_size, append or resume, stream)
+                        incident_data.close()
+                    else:
+                        assignment.record_checkpoint(db, url, "failed", error="report could not be read")
+        finally:
+            if cache is None:
+                # downloads are only kept by the download cache
+                for path in fetched.values():
+                    if path is not None and os.path.exists(path):
+                        os.remove(path)
+
+    # print incident nature with their count
+    assignment.status(db)
+
+
+def ingest_main(args, parser):
+    # the PDF pipeline and its caches are only imported by the ingest command
+    from assignment0 import assignment, backfill, cache as download_cache, output
+    from assignment0.dedup import INCIDENT_KEY_FILTER
+    from assignment0.instrumentation import METRICS
+
+    urls = []
+    for source in args.incidents or []:
+        # expand local directories and glob patterns into PDF files
+        urls.extend([source] if assignment.is_url(source) else assignment.find_local_reports(source))
+    if args.start_date:
+        urls.extend(backfill.build_report_urls(args.start_date, args.end_date or args.start_date))
+    if not urls:
+        parser.error("either --incidents or --start-date is required")
+    if args.no_cache and args.offline:
+        parser.error("--offline requires the download cache")
+    cache_dir = args.cache_dir or download_cache.CACHE_DIR
+    cache_bytes = download_cache.MAX_CACHE_BYTES if args.cache_size is None else args.cache_size * 1024 * 1024
+    cache = None if args.no_cache else download_cache.DownloadCache(cache_dir, cache_bytes)
+    # write the incidents of all reports of the run to one JSON file as they are extracted
+    json_path = None if args.no_json else args.json or output.JSON_PATHS[args.json_format]
+    if json_path and args.json_gzip and not json_path.endswith(".gz"):
+        json_path += ".gz"
+    output.JSON_WRITER.configure(json_path, args.json_format)
+    # skip parsing of pages already parsed in an earlier run
+    if not args.no_page_cache:
+        page_cache_bytes = (
+            download_cache.MAX_PAGE_CACHE_BYTES if args.page_cache_size is None else args.page_cache_size * 1024 * 1024
+        )
+        download_cache.PAGE_CACHE.configure(os.path.join(cache_dir, download_cache.PAGE_CACHE_FILE), page_cache_bytes)
+    # instrument the pipeline stages only when a run summary is requested
+    METRICS.enabled = bool(args.metrics_json or args.metrics_prom)
+    METRICS.reset()
+    # skip incidents already loaded from another report
+    INCIDENT_KEY_FILTER.enabled = args.dedup
+    if len(urls) == 1:
+        main(urls[0], args.workers, args.batch_size, args.append, cache, args.offline, args.stream,
+             args.partition_by_month, args.resume, args.download_parts)
+    else:
+        backfill_main(
+            urls, args.workers, args.batch_size, args.fetch_workers, args.append, cache, args.offline, args.stream,
+            args.partition_by_month, args.shards, args.resume, args.download_parts
+        )
+    output.JSON_WRITER.close()
+    if download_cache.PAGE_CACHE.enabled:
+        print(f"Page cache: {download_cache.PAGE_CACHE.hits} hits, {download_cache.PAGE_CACHE.misses} misses",
+              file=sys.stderr)
+        download_cache.PAGE_CACHE.close()
+    if args.metrics_json:
+        METRICS.write_json(args.metrics_json)
+    if args.metrics_prom:
+        METRICS.write_prometheus(args.metrics_prom)
+
+
+def watch_main(args):
+    # poll the listing page and ingest newly published reports until interrupted
+    import asyncio
+    from assignment0 import cache as download_cache, output, watch
+    from assignment0.dedup import INCIDENT_KEY_FILTER
+    from assignment0.instrumentation import METRICS
+
+    cache_dir = args.cache_dir or download_cache.CACHE_DIR
+    cache = None if args.no_cache else download_cache.DownloadCache(cache_dir)
+    output.JSON_WRITER.configure(None if args.no_json else args.json or output.JSON_PATHS["ndjson"])
+    METRICS.enabled = bool(args.metrics_json or args.metrics_prom)
+    METRICS.reset()
+    INCIDENT_KEY_FILTER.enabled = args.dedup
+    watcher = watch.Watcher(
+        args.listing_url or watch.LISTING_URL, "normanpd.db", args.interval, args.fetch_workers, args.workers,
+        args.batch_size, cache, args.partition_by_month, args.metrics_json, args.metrics_prom
+    )
+    try:
+        asyncio.run(watcher.run(args.polls))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        output.JSON_WRITER.close()
+
+
+def archive_main(month, path):
+    # move one report month of a partitioned database into an archive database
+    from assignment0 import assignment
+
+    db = queries.open_db("normanpd.db")
+    if db is None:
+        return False
+    try:
+        rows = assignment.archive_partition(db, month, path)
+    finally:
+        db.close()
+    if rows is None:
+        return False
+    print(f"Archived {rows} incidents of {month or 'reports without a date'} to {path}", file=sys.stderr)
+    return True
+
+
+def status_main():
+    # print incident nature with their count from the existing database
+    db = queries.open_db("normanpd.db")
+    if db is None:
+        return False
+    queries.status(db)
+    return True
+
+
+def records_main():
+    # print every stored incident, once the database is known to exist and be current
+    db = queries.open_db("normanpd.db")
+    if db is None:
+        return False
+    db.close()
+    queries.print_record("resources/normanpd.db")
+    return True
+
+
+def check_counts_main():
+    # verify the maintained nature counts against a full recount of the database
+    db = queries.open_db("normanpd.db")
+    if db is None:
+        return False
+    mismatches = queries.check_nature_counts(db)
+    db.close()
+    for nature, stored, recounted in mismatches:
+        print(f"{nature}|{stored}|{recounted}")
+    if not mismatches:
+        print("nature_counts is consistent", file=sys.stderr)
+    return not mismatches
+
+
+def query_main(**filters):
+    # print the incidents matching the filters, one pipe separated row per incident
+    db = queries.open_db("normanpd.db")
+    if db is None:
+        return False
+    try:
+        for row in queries.query_incidents(db, **filters):
+            print("|".join("" if value is None else value for value in row))
+    finally:
+        db.close()
+    return True
+
+
+def calls_main(start_date=None, end_date=None, limit=None):
+    # print the calls listed by more than one agency as timestamp|location|natures|incidents
+    db = queries.open_db("normanpd.db")
+    if db is None:
+        return False
+    try:
+        for timestamp, location, natures, incidents in queries.linked_calls(db, start_date, end_date, limit):
+            print(f"{timestamp}|{location or ''}|{natures or ''}|{incidents}")
+    finally:
+        db.close()
+    return True
+
+
+def search_main(text, limit=10):
+    # print the locations best matching the search text as location|incidents|similarity
+    db = queries.open_db("normanpd.db")
+    if db is None:
+        return False
+    try:
+        for location, incidents, similarity in queries.search_locations(db, text, limit):
+            print(f"{location}|{incidents}|{similarity}")
+    finally:
+        db.close()
+    return True
+
+
+def date_option(value):
+    """Validate a YYYY-MM-DD date option.
+
+    Params:
+        value (str): command-line value, e.g. 2024-01-01
+    Return:
+        value (str): the validated date
+    Raise:
+        argparse.ArgumentTypeError if the value is not a date in YYYY-MM-DD format
+    """
+    try:
+        return date.fromisoformat(value).isoformat()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date (YYYY-MM-DD): {value}")
+
+
+def time_option(value):
+    """Validate an H:MM time of the day option.
+
+    Params:
+        value (str): command-line value, e.g. 9:05 or 23:14
+    Return:
+        value (str): the validated time
+    Raise:
+        argparse.ArgumentTypeError if the value is not a time of the day in H:MM format
+    """
+    try:
+        queries.parse_minute(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid time of the day (H:MM): {value}")
+    return value
+
+
+def add_ingest_arguments(parser):
+    # cache defaults are resolved by ingest_main, so building the parser imports neither the caches nor the writer
+    # define the command-line argument '--incidents' for one or more incident summary URLs or local files
+    parser.add_argument(
+        "--incidents", type=str, nargs="+",
+        help="Incident summary url(s), local PDF file(s), directories of PDF files or glob patterns."
+    )
+    # define the optional command-line arguments for a date range of daily reports
+    parser.add_argument(
+        "--start-date", type=date_option, help="First report date (YYYY-MM-DD) of a backfill."
+    )
+    parser.add_argument(
+        "--end-date", type=date_option, help="Last report date (YYYY-MM-DD) of a backfill, defaults to start date."
+    )
+    # define the optional command-line argument '--fetch-workers' for concurrent downloads
+    parser.add_argument(
+        "--fetch-workers", type=int, default=4, help="Maximum number of concurrent report downloads."
+    )
+    # define the optional command-line argument '--download-parts' for parallel byte range downloads
+    parser.add_argument(
+        "--download-parts", type=int, default=4,
+        help="Maximum number of byte ranges a report is downloaded in parallel when the server accepts Range "
+             "requests."
+    )
+    # define the optional command-line argument '--workers' for parallel page extraction
     parser.add_argument(
-        "--incidents", type=str, required=True, help="Incident summary url."
+        "--workers", type=int, default=1, help="Number of worker processes used to extract PDF pages."
     )
-    # parse command-line arguments
-    args = parser.parse_args()
-    if args.incidents:
-        main(args.incidents)
+    # define the optional command-line argument '--shards' for sharded parallel loading of a backfill
+    parser.add_argument(
+        "--shards", type=int, default=1,
+        help="Number of worker processes parsing and loading the reports of a backfill into shard databases, "
+             "which are then merged into the database."
+    )
+    # define the optional command-line argument '--batch-size' for bulk loading
+    parser.add_argument(
+        "--batch-size", type=int, default=500, help="Number of incidents inserted per batch."
+    )
+    # define the optional command-line argument '--append' to keep the existing database
+    parser.add_argument(
+        "--append", action="store_true", help="Append new reports to the existing database instead of rebuilding it."
+    )
+    # define the optional command-line argument '--resume' to continue an interrupted run
+    parser.add_argument(
+        "--resume", action="store_true",
+        help="Resume an interrupted run: keep the database, skip the reports completed by an earlier run without "
+             "downloading them and retry the failed ones."
+    )
+    # define the optional command-line argument '--stream' for streaming page-to-row ingestion
+    parser.add_argument(
+        "--stream", action="store_true",
+        help="Parse pages lazily and write JSON and database rows in batches as incidents are parsed."
+    )
+    # define the optional command-line arguments of the download cache
+    parser.add_argument(
+        "--cache-dir", type=str, help="Directory of the report download cache, defaults to resources/cache."
+    )
+    parser.add_argument(
+        "--cache-size", type=int, help="Maximum size of the report download cache in MB, defaults to 512."
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true", help="Always download reports without the download cache."
+    )
+    parser.add_argument(
+        "--offline", action="store_true", help="Run the pipeline purely from the download cache."
+    )
+    # define the optional command-line arguments of the parsed page cache
+    parser.add_argument(
+        "--page-cache-size", type=int, help="Maximum size of the parsed page cache in MB, defaults to 64."
+    )
+    parser.add_argument(
+        "--no-page-cache", action="store_true", help="Always parse pages without the parsed page cache."
+    )
+    # define the optional command-line argument '--partition-by-month' for partitioned storage
+    parser.add_argument(
+        "--partition-by-month", action="store_true",
+        help="Store incidents in one table per report month, an existing database is partitioned once."
+    )
+    # define the optional command-line argument '--dedup' for cross-report duplicate detection
+    parser.add_argument(
+        "--dedup", action="store_true",
+        help="Skip incidents (incident number and ORI) already loaded from another report."
+    )
+    # define the optional command-line arguments of the incidents JSON file
+    parser.add_argument(
+        "--json", type=str,
+        help="Incidents JSON file path, defaults to resources/incidents.ndjson (resources/incidents.json for an "
+             "array), a path ending in .gz is gzip compressed."
+    )
+    parser.add_argument(
+        "--json-format", choices=("ndjson", "array"), default="ndjson",
+        help="Write one JSON object per line (ndjson) or a single compact JSON array (array)."
+    )
+    parser.add_argument(
+        "--json-gzip", action="store_true", help="Gzip compress the incidents JSON file."
+    )
+    parser.add_argument(
+        "--no-json", action="store_true", help="Do not write the incidents JSON file."
+    )
+    # define the optional command-line arguments of the run summary
+    parser.add_argument(
+        "--metrics-json", type=str, help="Write per-stage timings and counters of the run as JSON."
+    )
+    parser.add_argument(
+        "--metrics-prom", type=str, help="Write per-stage timings and counters in Prometheus textfile format."
+    )
+
+
+def build_parser():
+    # initialize command-line argument parsing with one subcommand per command
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    # define the 'ingest' subcommand to load reports into the database
+    ingest_parser = subparsers.add_parser("ingest", help="Load incident summaries into the database.")
+    add_ingest_arguments(ingest_parser)
+    # define the 'watch' subcommand to ingest reports as soon as they are published
+    watch_parser = subparsers.add_parser(
+        "watch", help="Poll the daily activity listing page and ingest newly published reports."
+    )
+    watch_parser.add_argument(
+        "--listing-url", type=str, help="Listing page linking the daily incident summaries, defaults to the Norman PD "
+                                        "department activity reports page."
+    )
+    watch_parser.add_argument("--interval", type=float, default=300, help="Seconds between two polls.")
+    watch_parser.add_argument("--polls", type=int, help="Stop after this many polls, polls forever by default.")
+    watch_parser.add_argument(
+        "--fetch-workers", type=int, default=4, help="Maximum number of concurrent report downloads."
+    )
+    watch_parser.add_argument(
+        "--workers", type=int, default=1, help="Number of worker processes used to extract PDF pages."
+    )
+    watch_parser.add_argument("--batch-size", type=int, default=500, help="Number of incidents inserted per batch.")
+    watch_parser.add_argument(
+        "--cache-dir", type=str, help="Directory of the report download cache, defaults to resources/cache."
+    )
+    watch_parser.add_argument(
+        "--no-cache", action="store_true", help="Always download reports without the download cache."
+    )
+    watch_parser.add_argument(
+        "--partition-by-month", action="store_true", help="Store incidents in one table per report month."
+    )
+    watch_parser.add_argument(
+        "--dedup", action="store_true",
+        help="Skip incidents (incident number and ORI) already loaded from another report."
+    )
+    watch_parser.add_argument(
+        "--json", type=str, help="Incidents NDJSON file path, defaults to resources/incidents.ndjson."
+    )
+    watch_parser.add_argument("--no-json", action="store_true", help="Do not write the incidents JSON file.")
+    watch_parser.add_argument(
+        "--metrics-json", type=str, help="Rewrite stage timings and ingest latencies as JSON after each report."
+    )
+    watch_parser.add_argument(
+        "--metrics-prom", type=str,
+        help="Rewrite stage timings and ingest latencies in Prometheus textfile format after each report."
+    )
+    # define the 'status' subcommand to print the incident natures with their count
+    subparsers.add_parser("status", help="Print the incident natures of the database with their count.")
+    # define the 'query' subcommand to read incidents back from the database
+    query_parser = subparsers.add_parser("query", help="Print the stored incidents matching the filters.")
+    query_parser.add_argument("--start-date", type=date_option, help="First report date (YYYY-MM-DD).")
+    query_parser.add_argument("--end-date", type=date_option, help="Last report date (YYYY-MM-DD).")
+    query_parser.add_argument("--start-time", type=time_option, help="Earliest incident time of the day (H:MM).")
+    query_parser.add_argument("--end-time", type=time_option, help="Latest incident time of the day (H:MM).")
+    query_parser.add_argument("--nature", type=str, help="Incident nature.")
+    query_parser.add_argument("--ori", type=str, help="Incident ORI.")
+    query_parser.add_argument("--location", type=str, help="Location prefix, e.g. '1000 108TH'.")
+    query_parser.add_argument("--limit", type=int, help="Maximum number of incidents printed.")
+    # define the 'search' subcommand for fuzzy location search
+    search_parser = subparsers.add_parser("search", help="Print the stored locations best matching a search text.")
+    search_parser.add_argument("text", type=str, help="Location search text, e.g. 'james garner / apache'.")
+    search_parser.add_argument("--limit", type=int, default=10, help="Maximum number of locations printed.")
+    # define the 'calls' subcommand to group the incidents of one call listed by several agencies
+    calls_parser = subparsers.add_parser(
+        "calls", help="Print the calls listed by more than one agency, e.g. police, fire and EMS rows of one call."
+    )
+    calls_parser.add_argument("--start-date", type=date_option, help="First incident date (YYYY-MM-DD).")
+    calls_parser.add_argument("--end-date", type=date_option, help="Last incident date (YYYY-MM-DD).")
+    calls_parser.add_argument("--limit", type=int, help="Maximum number of calls printed.")
+    # define the 'records' subcommand to print every stored incident
+    subparsers.add_parser("records", help="Print every stored incident.")
+    # define the 'archive' subcommand to move a report month out of a partitioned database
+    archive_parser = subparsers.add_parser(
+        "archive", help="Move the incidents of one report month of a partitioned database into an archive database."
+    )
+    archive_parser.add_argument("month", type=str, help="Report month (YYYY-MM).")
+    archive_parser.add_argument("path", type=str, help="Archive database file, further months are appended to it.")
+    # define the 'check-counts' subcommand to verify the nature counts
+    subparsers.add_parser(
+        "check-counts",
+        help="Verify the maintained nature counts against a full recount, mismatches are printed as "
+             "nature|stored|recounted."
+    )
+    return parser
+
+
+def run(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    # keep the original command line, e.g. '--incidents <url>', working as an ingest run
+    if argv and argv[0].startswith("-") and argv[0] not in ("-h", "--help"):
+        argv.insert(0, "ingest")
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == "ingest":
+        ingest_main(args, parser)
+    elif args.command == "watch":
+        watch_main(args)
+    elif args.command == "status":
+        return 0 if status_main() else 1
+    elif args.command == "query":
+        return 0 if query_main(
+            start_date=args.start_date, end_date=args.end_date, start_time=args.start_time, end_time=args.end_time,
+            nature=args.nature, ori=args.ori, location=args.location, limit=args.limit
+        ) else 1
+    elif args.command == "search":
+        return 0 if search_main(args.text, args.limit) else 1
+    elif args.command == "calls":
+        return 0 if calls_main(args.start_date, args.end_date, args.limit) else 1
+    elif args.command == "records":
+        return 0 if records_main() else 1
+    elif args.command == "archive":
+        return 0 if archive_main(args.month, args.path) else 1
+    elif args.command == "check-counts":
+        return 0 if check_counts_main() else 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(run())
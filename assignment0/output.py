@@ -0,0 +1,109 @@
+import atexit
+import gzip
+import json
+import os
+from assignment0.instrumentation import METRICS
+from assignment0.records import to_json
+
+# default location of the incidents JSON file of each format, next to the database
+JSON_PATHS = {"ndjson": "resources/incidents.ndjson", "array": "resources/incidents.json"}
+JSON_FORMATS = tuple(JSON_PATHS)
+
+
+class JsonWriter:
+    """Streaming writer of the incidents JSON file of a run.
+
+    Incidents are written as they are produced, one compact JSON object per line (NDJSON) or
+    as one compact JSON array, and gzip compressed when the path ends in .gz. The file is
+    opened by the first write and stays open for all reports of a run until close(). A writer
+    without a path writes nothing.
+    """
+
+    def __init__(self, path=JSON_PATHS["ndjson"], json_format="ndjson"):
+        self.path = path
+        self.json_format = json_format
+        self._file = None
+        self._first = True
+        self._encode = json.JSONEncoder(default=to_json, separators=(",", ":")).encode
+
+    def configure(self, path, json_format="ndjson"):
+        """Set the output file of the following writes, closing the current one.
+
+        Params:
+        - path (str/None): JSON file path, ending in .gz for a gzip compressed file, None to write nothing
+        - json_format (str): 'ndjson' or 'array'
+        Return:
+            None
+        """
+        if json_format not in JSON_FORMATS:
+            raise ValueError(f"Unknown JSON format: {json_format}")
+        self.close()
+        self.path = path
+        self.json_format = json_format
+
+    def _open(self):
+        if self._file is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            if self.path.endswith(".gz"):
+                # a middle compression level, the highest ones cost far more time for little size
+                self._file = gzip.open(self.path, "wt", compresslevel=6, encoding="utf-8")
+            else:
+                self._file = open(self.path, "w", encoding="utf-8", buffering=1024 * 1024)
+            self._first = True
+            if self.json_format == "array":
+                self._file.write("[")
+        return self._file
+
+    def stream(self, incidents):
+        """Write incidents as they pass through the stream.
+
+        Params:
+            incidents (Iterable[Incident/dict]): stream of extracted incidents
+        Yield:
+            incident (Incident/dict): each incident, unchanged, once it is written
+        """
+        if self.path is None:
+            yield from incidents
+            return
+        f = self._open()
+        separator = "\n" if self.json_format == "ndjson" else ","
+        for incident in incidents:
+            with METRICS.stage("json"):
+                record = self._encode(incident)
+                if self.json_format == "ndjson":
+                    f.write(record + separator)
+                else:
+                    f.write(record if self._first else separator + record)
+                self._first = False
+            METRICS.count("json", records=1)
+            yield incident
+
+    def write(self, incidents):
+        """Write all incidents.
+
+        Params:
+            incidents (Iterable[Incident/dict]): extracted incidents
+        Return:
+            None
+        """
+        for _ in self.stream(incidents):
+            pass
+
+    def close(self):
+        """Finish and close the file of the run.
+
+        Return:
+            None
+        """
+        if self._file is not None:
+            if self.json_format == "array":
+                self._file.write("]")
+            self._file.close()
+            self._file = None
+
+
+# writer of the incidents JSON file shared by the pipeline, configured by main.py
+JSON_WRITER = JsonWriter()
+atexit.register(JSON_WRITER.close)
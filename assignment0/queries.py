@@ -0,0 +1,388 @@
+import os
+import re
+import sqlite3
+import sys
+
+# full recount of the incidents per nature, the source of truth of nature_counts
+NATURE_RECOUNT_QUERY = (
+    "SELECT COALESCE(nature_id, 0), COUNT(*) FROM incident_facts GROUP BY COALESCE(nature_id, 0)"
+)
+
+# schema version stored in PRAGMA user_version by assignment.create_db, a database of an older version is
+# migrated by create_db before it is read
+SCHEMA_VERSION = 3
+
+# monthly partition of incident_facts by report month, e.g. incident_facts_2024_01, or of reports without a date
+PARTITION_PATTERN = re.compile(r"incident_facts_(?:\d{4}_\d{2}|undated)")
+
+
+def open_db(db_name):
+    """Opens the database under resources dir for the read-only commands.
+
+    A database of the current schema version is opened as it is. Only an older database goes through
+    assignment.create_db, so the read-only commands neither import the PDF pipeline nor write to a
+    current database. A missing database is reported rather than created empty.
+
+    Params:
+        db_name (str): name of the database
+    Return:
+        conn (sqlite3.Connection/None): Database connection object, None when the database does not exist
+    """
+    db_file_loc = f"resources/{db_name}"
+    if not os.path.exists(db_file_loc):
+        print(f"ERROR in opening DB: {db_file_loc} does not exist, run ingest first", file=sys.stderr)
+        return None
+    conn = sqlite3.connect(db_file_loc)
+    if conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION:
+        return conn
+    conn.close()
+    from assignment0 import assignment
+    return assignment.create_db(db_name)
+
+
+def partition_tables(conn):
+    """Monthly partitions of incident_facts of a partitioned database.
+
+    Params:
+        conn (sqlite3.Connection): database connection object
+    Return:
+        tables (List[str]): partition table names in month order, the undated partition last, empty when the
+        database is not partitioned
+    """
+    names = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE 'incident_facts_%' ORDER BY name"
+    ).fetchall()
+    return [name for (name,) in names if PARTITION_PATTERN.fullmatch(name)]
+
+
+def is_partitioned(conn):
+    """Check whether incident_facts is the view over monthly partitions rather than a table.
+
+    Params:
+        conn (sqlite3.Connection): database connection object
+    Return:
+        partitioned (bool): True for a partitioned database
+    """
+    row = conn.execute("SELECT type FROM sqlite_master WHERE name = 'incident_facts'").fetchone()
+    return row is not None and row[0] == "view"
+
+
+def partition_table(report_date):
+    """Monthly partition holding the incidents of a report.
+
+    Params:
+        report_date (str): date of the report in YYYY-MM-DD format, or a month in YYYY-MM format
+    Return:
+        table (str): partition table name, e.g. incident_facts_2024_01, incident_facts_undated for a report
+        without a date
+    """
+    month = report_date[:7]
+    if re.fullmatch(r"\d{4}-\d{2}", month):
+        return "incident_facts_" + month.replace("-", "_")
+    return "incident_facts_undated"
+
+
+def partition_month(table):
+    """Report month of a partition table.
+
+    Params:
+        table (str): partition table name, e.g. incident_facts_2024_01
+    Return:
+        month (str): report month in YYYY-MM format, empty for the partition of reports without a date
+    """
+    suffix = table[len("incident_facts_"):]
+    return "" if suffix == "undated" else suffix.replace("_", "-")
+
+
+def prune_partitions(tables, start_date=None, end_date=None):
+    """Partitions holding incidents of a report date range.
+
+    Params:
+    - tables (List[str]): partition table names
+    - start_date, end_date (str): inclusive report date range in YYYY-MM-DD format
+    Return:
+        tables (List[str]): partitions whose report month overlaps the range
+    """
+    pruned = []
+    for table in tables:
+        month = partition_month(table)
+        # reports without a date are only matched when there is no start date, like report_date >= start_date
+        if start_date and (not month or month < start_date[:7]):
+            continue
+        if end_date and month > end_date[:7]:
+            continue
+        pruned.append(table)
+    return pruned
+
+
+def check_nature_counts(conn):
+    """Verify the maintained nature counts against a full recount of the incidents.
+
+    Params:
+        conn (sqlite3.Connection): database connection object
+    Return:
+        mismatches (list): (nature, stored count, recounted count) of every nature whose counts differ,
+        empty when the counts are consistent
+    """
+    stored = dict(conn.execute("SELECT nature_id, count FROM nature_counts").fetchall())
+    recounted = dict(conn.execute(NATURE_RECOUNT_QUERY).fetchall())
+    natures = dict(conn.execute("SELECT nature_id, incident_nature FROM natures").fetchall())
+    return [
+        (natures.get(nature_id), stored.get(nature_id, 0), recounted.get(nature_id, 0))
+        for nature_id in sorted(stored.keys() | recounted.keys())
+        if stored.get(nature_id, 0) != recounted.get(nature_id, 0)
+    ]
+
+
+def parse_minute(value):
+    """Minute of the day of an H:MM time.
+
+    Params:
+        value (str): time of the day, e.g. 9:05 or 23:14
+    Return:
+        minute (int): minutes since midnight
+    Raise:
+        ValueError if the time is not in H:MM format or not a time of the day
+    """
+    hours, minutes = value.split(":")
+    if len(minutes) != 2 or not 0 <= int(hours) <= 23 or not 0 <= int(minutes) <= 59:
+        raise ValueError(f"invalid time of the day: {value}")
+    return int(hours) * 60 + int(minutes)
+
+
+def build_incident_query(start_date=None, end_date=None, start_time=None, end_time=None, nature=None, ori=None,
+                         location=None, limit=None, table="incident_facts"):
+    """Build the incident query of the given filters.
+
+    Nature and ORI are resolved to their ids and a location prefix to a range of the unique
+    location index, so every filter is served by one of the composite indexes.
+
+    Params:
+    - start_date, end_date (str): inclusive report date range in YYYY-MM-DD format
+    - start_time, end_time (str): inclusive time of the day range in H:MM format
+    - nature (str): incident nature
+    - ori (str): incident ORI
+    - location (str): case-sensitive location prefix
+    - limit (int): maximum number of incidents returned
+    - table (str): incident table read, incident_facts or one of its monthly partitions
+    Return:
+        query (str): SQL query of the incidents view columns
+        params (list): query parameters
+    """
+    conditions, params = [], []
+    if start_date:
+        conditions.append("f.report_date >= ?")
+        params.append(start_date)
+    if end_date:
+        conditions.append("f.report_date <= ?")
+        params.append(end_date)
+    if start_time:
+        conditions.append("f.incident_minute >= ?")
+        params.append(parse_minute(start_time))
+    if end_time:
+        conditions.append("f.incident_minute <= ?")
+        params.append(parse_minute(end_time))
+    if nature:
+        conditions.append("f.nature_id = (SELECT nature_id FROM natures WHERE incident_nature = ?)")
+        params.append(nature)
+    if ori:
+        conditions.append("f.ori_id = (SELECT ori_id FROM oris WHERE incident_ori = ?)")
+        params.append(ori)
+    if location:
+        # prefix range instead of LIKE, which cannot use the case-sensitive unique index
+        conditions.append(
+            "f.location_id IN (SELECT location_id FROM locations "
+            "WHERE incident_location >= ? AND incident_location < ?)"
+        )
+        params.extend([location, location[:-1] + chr(ord(location[-1]) + 1)])
+    query = (
+        "SELECT f.report_date, f.incident_time, f.incident_number, l.incident_location, n.incident_nature, "
+        f"o.incident_ori FROM {table} AS f LEFT JOIN locations AS l USING (location_id) "
+        "LEFT JOIN natures AS n USING (nature_id) LEFT JOIN oris AS o USING (ori_id)"
+    )
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY f.report_date, f.incident_minute, f.incident_number"
+    if limit:
+        query += " LIMIT ?"
+        params.append(limit)
+    return query, params
+
+
+def query_incidents(conn, **filters):
+    """Query incidents matching the filters of build_incident_query.
+
+    The monthly partitions of a partitioned database hold disjoint report months, so only the
+    partitions overlapping the report date range are queried, one at a time in report date order,
+    which keeps the incidents in order and stops at the limit without reading further partitions.
+
+    Params:
+    - conn (sqlite3.Connection): database connection object
+    - filters: filters passed to build_incident_query
+    Yield:
+        incident (tuple): report date, time, number, location, nature, ORI
+    """
+    if not is_partitioned(conn):
+        query, params = build_incident_query(**filters)
+        yield from conn.execute(query, params)
+        return
+    limit = filters.pop("limit", None)
+    tables = prune_partitions(partition_tables(conn), filters.get("start_date"), filters.get("end_date"))
+    # reports without a date sort before any dated report
+    for table in sorted(tables, key=partition_month):
+        query, params = build_incident_query(limit=limit, table=table, **filters)
+        for incident in conn.execute(query, params):
+            yield incident
+            if limit:
+                limit -= 1
+                if not limit:
+                    return
+
+
+def linked_calls(conn, start_date=None, end_date=None, limit=None):
+    """Calls listed by more than one agency, e.g. the 14005 and EMSSTAT rows of one medical call.
+
+    The rows of such a call have their own incident number and ORI but share the incident time
+    and location, so they are grouped on the call index (incident_timestamp, location_id) and
+    read next to each other without joining the incidents to themselves. Incidents loaded before
+    incident dates were kept have no timestamp and are not grouped.
+
+    Params:
+    - conn (sqlite3.Connection): database connection object
+    - start_date, end_date (str): inclusive incident date range in YYYY-MM-DD format
+    - limit (int): maximum number of calls returned
+    Return:
+        calls (list): (timestamp, location, natures, incidents) tuples in time order, the incidents of a call
+        as "number ORI" joined by ", "
+    """
+    conditions, params = ["f.incident_timestamp IS NOT NULL"], []
+    if start_date:
+        conditions.append("f.incident_timestamp >= ?")
+        params.append(start_date)
+    if end_date:
+        # any time of the last day sorts before the date followed by a later character
+        conditions.append("f.incident_timestamp < ?")
+        params.append(f"{end_date}U")
+    query = (
+        "SELECT f.incident_timestamp, l.incident_location, group_concat(DISTINCT n.incident_nature), "
+        "group_concat(f.incident_number || ' ' || COALESCE(o.incident_ori, ''), ', ') "
+        "FROM incident_facts AS f LEFT JOIN locations AS l USING (location_id) "
+        "LEFT JOIN natures AS n USING (nature_id) LEFT JOIN oris AS o USING (ori_id) "
+        f"WHERE {' AND '.join(conditions)} GROUP BY f.incident_timestamp, f.location_id "
+        "HAVING COUNT(DISTINCT f.ori_id) > 1 ORDER BY f.incident_timestamp, f.location_id"
+    )
+    if limit:
+        query += " LIMIT ?"
+        params.append(limit)
+    return conn.execute(query, params).fetchall()
+
+
+def location_trigrams(text):
+    """Case-insensitive trigrams of a location with its whitespace collapsed.
+
+    Params:
+        text (str): location or search text
+    Return:
+        trigrams (set): three character substrings
+    """
+    text = " ".join(text.upper().split())
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def search_locations(conn, text, limit=10, candidates=200):
+    """Fuzzy search of the stored locations ranked by trigram similarity.
+
+    Locations sharing any trigram with the search text are found through the FTS5 trigram
+    index, the best candidates by bm25 rank are re-ranked by the share of trigrams they have
+    in common with the search text (Jaccard similarity), so misspellings and abbreviations
+    still match.
+
+    Params:
+    - conn (sqlite3.Connection): database connection object
+    - text (str): search text, e.g. "james garner / apache"
+    - limit (int): maximum number of locations returned
+    - candidates (int): number of index matches re-ranked
+    Return:
+        matches (list): (location, number of incidents, similarity) tuples, best match first
+    """
+    trigrams = location_trigrams(text)
+    if not trigrams:
+        return []
+    match = " OR ".join('"' + trigram.replace('"', '""') + '"' for trigram in sorted(trigrams))
+    rows = conn.execute(
+        "SELECT rowid, incident_location FROM locations_fts WHERE locations_fts MATCH ? ORDER BY rank LIMIT ?",
+        (match, candidates),
+    ).fetchall()
+    scored = []
+    for location_id, location in rows:
+        location_grams = location_trigrams(location)
+        scored.append((len(trigrams & location_grams) / len(trigrams | location_grams), location_id, location))
+    scored.sort(key=lambda match: (-match[0], match[2]))
+    return [
+        (location, conn.execute("SELECT COUNT(*) FROM incident_facts WHERE location_id = ?", (location_id,))
+         .fetchone()[0], round(score, 3))
+        for score, location_id, location in scored[:limit]
+    ]
+
+
+def status(conn):
+    """Print distinct incident natures and their counts by grouping them.
+
+    Params:
+        conn (sqlite3.Connection): database connection object
+    Return:
+        None
+    Raise:
+        Exception while creating cursor / executing query / fetching records
+    """
+    try:
+        cur = conn.cursor()
+
+        # query to get distinct incident_nature and their count from the maintained nature counts
+        cur.execute(
+            """
+        SELECT n.incident_nature, c.count
+        FROM nature_counts AS c
+        LEFT JOIN natures AS n USING (nature_id)
+        ORDER BY c.count DESC, n.incident_nature ASC;
+        """
+        )
+
+        # fetch all rows from the result set
+        rows = cur.fetchall()
+
+        for row in rows:
+            # print the records
+            print(f"{row[0]}|{row[1]}")
+    except Exception as ex:
+        print("ERROR in fetching Status: ", ex)
+    finally:
+        if conn is not None:
+            conn.close()
+
+
+def print_record(db_name):
+    # connect to the SQLite database
+    conn = sqlite3.connect(db_name)
+
+    # create a cursor object using the cursor() method
+    cursor = conn.cursor()
+
+    # SQL query to retrieve data
+    query = "SELECT * FROM incidents"
+
+    try:
+        # execute the SQL command
+        cursor.execute(query)
+
+        # print the records as they are read rather than fetching all the rows first
+        for row in cursor:
+            print(row)  # Each row is a tuple representing a record
+
+    except sqlite3.Error as e:
+        print("Database error:", e)
+
+    finally:
+        # close the cursor and connection
+        cursor.close()
+        conn.close()
@@ -0,0 +1,117 @@
+import functools
+import sys
+
+# fields of an incident in the order they are stored in the database, the date is the ISO date of the incident
+FIELDS = ("incident_time", "incident_number", "incident_location", "incident_nature", "incident_ori", "incident_date")
+
+
+class Incident:
+    """Compact incident record.
+
+    Slots avoid a per-record dict, and the time, nature, ORI and date values, which repeat
+    thousands of times in a report, are interned so every record shares one string.
+    Records can still be read like the incident dicts, e.g. incident["incident_nature"].
+    """
+
+    __slots__ = FIELDS
+
+    def __init__(self, incident_time, incident_number, incident_location, incident_nature, incident_ori,
+                 incident_date=""):
+        self.incident_time = sys.intern(incident_time)
+        self.incident_number = incident_number
+        self.incident_location = incident_location
+        self.incident_nature = sys.intern(incident_nature)
+        self.incident_ori = sys.intern(incident_ori)
+        self.incident_date = sys.intern(incident_date)
+
+    def __getitem__(self, key):
+        if key not in FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def as_row(self):
+        """Field values in database column order.
+
+        Return:
+            row (tuple): time, number, location, nature, ORI, date
+        """
+        return (self.incident_time, self.incident_number, self.incident_location, self.incident_nature,
+                self.incident_ori, self.incident_date)
+
+    @property
+    def incident_timestamp(self):
+        """ISO timestamp of the incident, see incident_timestamp."""
+        return incident_timestamp(self.incident_date, self.incident_time)
+
+    def as_dict(self):
+        """Incident as a dict with the same keys as the extracted incident dicts.
+
+        Return:
+            incident (dict): field name to value
+        """
+        return dict(zip(FIELDS, self.as_row()))
+
+    def __eq__(self, other):
+        if isinstance(other, Incident):
+            return self.as_row() == other.as_row()
+        if isinstance(other, dict):
+            return self.as_dict() == other
+        return NotImplemented
+
+    def __repr__(self):
+        return f"Incident{self.as_row()!r}"
+
+    def __getstate__(self):
+        return self.as_row()
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+
+def incident_row(incident):
+    """Field values of an incident record or incident dict in database column order.
+
+    Params:
+        incident (Incident/dict): extracted incident
+    Return:
+        row (tuple): time, number, location, nature, ORI, date
+    """
+    if isinstance(incident, Incident):
+        return incident.as_row()
+    # incident dicts extracted before dates were kept have no date
+    return (*(incident[field] for field in FIELDS[:-1]), incident.get("incident_date", ""))
+
+
+@functools.lru_cache(maxsize=1024)
+def iso_date(date):
+    """ISO date of an M/D/YYYY date of a daily incident summary.
+
+    Params:
+        date (str): date as printed in the report, e.g. 1/1/2024
+    Return:
+        iso_date (str): date in YYYY-MM-DD format, e.g. 2024-01-01
+    """
+    month, day, year = date.split("/")
+    return f"{year}-{month.zfill(2)}-{day.zfill(2)}"
+
+
+def incident_timestamp(incident_date, incident_time):
+    """ISO timestamp combining the date and the H:MM time of an incident.
+
+    Params:
+    - incident_date (str): ISO date of the incident, empty when it is not known
+    - incident_time (str): time of the day, e.g. 9:05
+    Return:
+        timestamp (str/None): timestamp in YYYY-MM-DDTHH:MM format, e.g. 2024-01-01T09:05, None without a date
+    """
+    if not incident_date:
+        return None
+    hours, _, minutes = incident_time.partition(":")
+    return f"{incident_date}T{hours.zfill(2)}:{minutes}"
+
+
+def to_json(incident):
+    """json.dump default hook serializing incident records as dicts."""
+    if isinstance(incident, Incident):
+        return incident.as_dict()
+    raise TypeError(f"Object of type {type(incident).__name__} is not JSON serializable")
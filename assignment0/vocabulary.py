@@ -0,0 +1,190 @@
+import hashlib
+import sys
+
+# incident natures known to appear in Norman PD daily incident summaries
+KNOWN_NATURES = (
+    "911 Call Nature Unknown",
+    "Abdominal Pains/Problems",
+    "Alarm",
+    "Alarm Holdup/Panic",
+    "Animal Bites/Attacks",
+    "Animal Complaint",
+    "Animal Livestock",
+    "Assault",
+    "Assault EMS Needed",
+    "Assist Fire",
+    "Assist Police",
+    "Back Pain",
+    "Body Reported",
+    "Bomb/Threats/Package",
+    "Breathing Problems",
+    "Burglary",
+    "Cardiac Respritory Arrest",
+    "Check Area",
+    "Chest Pain",
+    "Civil Standby",
+    "COP DDACTS",
+    "COP Problem Solving",
+    "Contact a Subject",
+    "Convulsion/Seizure",
+    "Debris in Roadway",
+    "Diabetic Problems",
+    "Disturbance/Domestic",
+    "Drunk Driver",
+    "Escort/Transport",
+    "Extra Patrol",
+    "Falls",
+    "Fight",
+    "Fire Alarm",
+    "Fire Commercial",
+    "Fire Controlled Burn",
+    "Fire Dumpster",
+    "Fire Grass",
+    "Fire Residential",
+    "Fire Smoke Investigation",
+    "Fire Vehicle",
+    "Fireworks",
+    "Follow Up",
+    "Found Item",
+    "Fraud",
+    "Harassment / Threats Report",
+    "Heart Problems/AICD",
+    "Hemorrhage/Lacerations",
+    "Hit and Run",
+    "Item Assignment",
+    "Larceny",
+    "Medical Call Pd Requested",
+    "Molesting",
+    "Motorist Assist",
+    "Mutual Aid",
+    "MVA Non Injury",
+    "MVA With Injuries",
+    "Noise Complaint",
+    "Open Door/Premises Check",
+    "Overdose/Poisoning",
+    "Pick Up Partner",
+    "Prowler",
+    "Public Assist",
+    "Public Intoxication",
+    "Reckless Driving",
+    "Runaway or Lost Child",
+    "Shooting",
+    "Shooting Stabbing Penetrating",
+    "Shots Heard",
+    "Sick Person",
+    "Special Assignment",
+    "Stolen Vehicle",
+    "Stroke",
+    "Supplement Report",
+    "Suspicious",
+    "Traffic Stop",
+    "Transfer/Interfacility",
+    "Traumatic Injury",
+    "Trespassing",
+    "Unconscious/Fainting",
+    "Unknown Problem/Man Down",
+    "Vandalism",
+    "Warrant Service",
+    "Welfare Check",
+)
+
+# marks a trie node where a complete nature ends, split() never yields an empty token
+_END = ""
+
+
+class NatureVocabulary:
+    """Token trie of known incident natures, stored right to left.
+
+    Natures are the trailing tokens of a record, so the trie is keyed by their tokens in
+    reverse order and the longest known nature suffix is found in one right-to-left pass.
+    """
+
+    def __init__(self, natures=()):
+        self.root = {}
+        self.unknown = set()
+        self.natures = set()
+        self._fingerprint = None
+        for nature in natures:
+            self.add(nature)
+
+    def add(self, nature):
+        """Add an incident nature to the vocabulary.
+
+        Params:
+            nature (str): incident nature
+        Return:
+            None
+        """
+        tokens = nature.split()
+        if not tokens:
+            return
+        self.natures.add(" ".join(tokens))
+        self._fingerprint = None
+        node = self.root
+        for token in reversed(tokens):
+            node = node.setdefault(token, {})
+        node[_END] = True
+
+    def fingerprint(self):
+        """Digest of the natures in the vocabulary, which decide how records are split.
+
+        Return:
+            fingerprint (str): SHA-256 hex digest of the sorted natures
+        """
+        if self._fingerprint is None:
+            self._fingerprint = hashlib.sha256("\n".join(sorted(self.natures)).encode()).hexdigest()
+        return self._fingerprint
+
+    def __contains__(self, nature):
+        node = self.root
+        for token in reversed(nature.split()):
+            node = node.get(token)
+            if node is None:
+                return False
+        return _END in node
+
+    def match_suffix(self, record):
+        """Number of trailing tokens of a record forming the longest known nature.
+
+        Params:
+            record (list): segment of an incident holding location and nature tokens
+        Return:
+            length (int): number of nature tokens, 0 if the record ends with no known nature
+        """
+        node = self.root
+        length = 0
+        for i in range(len(record) - 1, -1, -1):
+            node = node.get(record[i])
+            if node is None:
+                break
+            if _END in node:
+                length = len(record) - i
+        return length
+
+    def add_from_db(self, conn):
+        """Add the incident natures already stored in the natures lookup table.
+
+        Params:
+            conn (sqlite3.Connection): database connection object
+        Return:
+            None
+        """
+        for (nature,) in conn.execute("SELECT incident_nature FROM natures").fetchall():
+            if nature:
+                self.add(nature)
+
+    def report_unknown(self, nature):
+        """Log a nature that is not in the vocabulary, once per nature.
+
+        Params:
+            nature (str): incident nature
+        Return:
+            None
+        """
+        if nature and nature not in self.unknown:
+            self.unknown.add(nature)
+            print(f"Unknown incident nature: {nature}", file=sys.stderr)
+
+
+# vocabulary shared by the extraction functions
+NATURE_VOCABULARY = NatureVocabulary(KNOWN_NATURES)
@@ -0,0 +1,286 @@
+import asyncio
+import email.utils
+import html
+import os
+import re
+import sys
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from assignment0 import assignment, backfill
+from assignment0.instrumentation import METRICS
+
+# Norman PD page listing the published daily activity reports
+LISTING_URL = (
+    "https://www.normanok.gov/public-safety/police-department/crime-prevention-data/department-activity-reports"
+)
+
+# links of the listing page to daily incident summaries
+REPORT_LINK_PATTERN = re.compile(r"""href=["']([^"']*_daily_incident_summary\.pdf)["']""", re.IGNORECASE)
+
+
+def find_report_urls(page, base_url):
+    """Daily incident summary URLs linked from the listing page.
+
+    Params:
+    - page (bytes): HTML of the listing page
+    - base_url (str): URL of the listing page, relative links are resolved against it
+    Return:
+        urls (List[str]): absolute report URLs in page order, without duplicates
+    """
+    text = page.decode("utf-8", errors="replace")
+    urls = (urllib.parse.urljoin(base_url, html.unescape(link)) for link in REPORT_LINK_PATTERN.findall(text))
+    return list(dict.fromkeys(urls))
+
+
+def published_at(last_modified):
+    """Publication time of a report taken from its Last-Modified header.
+
+    Params:
+        last_modified (str/None): Last-Modified header of the report response
+    Return:
+        timestamp (float/None): seconds since the epoch, None if the header is missing or invalid
+    """
+    try:
+        return email.utils.parsedate_to_datetime(last_modified).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+class Watcher:
+    """Poll the listing page and ingest every newly linked report into the database.
+
+    Each new report runs through its own task: the download on a pool of fetch threads, parsing on
+    a parse thread and the load on the single thread owning the database connection, so a report
+    is parsed while the next is downloaded and the previous one is loaded. Reports whose URL is in
+    the ingestion ledger are never fetched again and the listing is requested conditionally.
+    """
+
+    def __init__(self, listing_url=LISTING_URL, db_name="normanpd.db", interval=300, fetch_workers=4, workers=1,
+                 batch_size=500, cache=None, partitioned=False, metrics_json=None, metrics_prom=None):
+        self.listing_url = listing_url
+        self.db_name = db_name
+        self.interval = interval
+        self.workers = workers
+        self.batch_size = batch_size
+        self.cache = cache
+        self.partitioned = partitioned
+        self.metrics_json = metrics_json
+        self.metrics_prom = metrics_prom
+        self.db = None
+        self.seen = set()
+        self.failed = set()
+        self.listing_headers = {}
+        self.latencies = []
+        self.pool = backfill.ConnectionPool()
+        self.fetch_executor = ThreadPoolExecutor(max_workers=fetch_workers)
+        self.parse_executor = ThreadPoolExecutor(max_workers=1)
+        # sqlite connections may only be used from the thread that opened them
+        self.db_executor = ThreadPoolExecutor(max_workers=1)
+
+    def open(self):
+        """Open the database and remember the reports it already holds."""
+        self.db = assignment.create_db(self.db_name, self.partitioned)
+        assignment.seed_vocabulary(self.db)
+        self.seen.update(source for (source,) in self.db.execute("SELECT source FROM ingestions"))
+
+    def close(self):
+        """Close the database connection."""
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+    def poll(self, retries=()):
+        """Request the listing page and pick the report URLs not seen before.
+
+        Params:
+            retries (List[str]): reports that failed before, taken from failed on the event loop thread
+        Return:
+            urls (List[str]): new report URLs and the reports that failed before, only the latter if the
+            listing is unchanged or could not be fetched
+        """
+        retries = list(retries)
+        result = backfill.fetch_report(self.listing_url, self.pool, headers=self.listing_headers)
+        if result["data"] is None:
+            return retries
+        # make the next request conditional on this version of the listing
+        self.listing_headers = {}
+        if result["etag"]:
+            self.listing_headers["If-None-Match"] = result["etag"]
+        if result["last_modified"]:
+            self.listing_headers["If-Modified-Since"] = result["last_modified"]
+        urls = [url for url in find_report_urls(result["data"], self.listing_url) if url not in self.seen]
+        self.seen.update(urls)
+        return retries + urls
+
+    def extract(self, incident_data):
+        """Parse the incidents of a report on the parse thread.
+
+        Params:
+            incident_data (MappedReport): memory-mapped PDF document
+        Return:
+        - incidents (list): parsed incidents of the report
+        - quarantined (List[tuple]): page number and error of each page skipped as unreadable
+        """
+        # the quarantined pages are collected per report, the next report clears them on this same thread
+        assignment.QUARANTINED_PAGES.clear()
+        incidents = assignment.extract_incidents(incident_data, self.workers)
+        quarantined = list(assignment.QUARANTINED_PAGES)
+        assignment.QUARANTINED_PAGES.clear()
+        return incidents, quarantined
+
+    def load(self, url, content_hash, incidents, quarantined=()):
+        """Load the incidents of a report and record it in the ingestion ledger and the checkpoint journal.
+
+        Params:
+        - url (str): report URL
+        - content_hash (str): content hash of the report
+        - incidents (list): parsed incidents of the report
+        - quarantined (List[tuple]): page number and error of each page skipped as unreadable
+        Return:
+            rows (int/None): number of loaded incidents, None if the load failed
+        """
+        report_date = assignment.get_report_date(url)
+        rows = assignment.populate_db(self.db, incidents, self.batch_size, report_date)
+        if rows is not None:
+            assignment.record_ingestion(self.db, content_hash, url, report_date, rows)
+            assignment.record_checkpoint(
+                self.db, url, "done", content_hash, report_date, rows, quarantined=quarantined
+            )
+        else:
+            assignment.record_checkpoint(
+                self.db, url, "failed", content_hash, report_date, error="incidents could not be loaded"
+            )
+        return rows
+
+    def record_failure(self, url, error):
+        """Record a report that could not be fetched or ingested as failed in the checkpoint journal.
+
+        Params:
+        - url (str): report URL
+        - error (str): reason the report failed
+        Return:
+            None
+        """
+        assignment.record_checkpoint(self.db, url, "failed", report_date=assignment.get_report_date(url), error=error)
+
+    async def ingest(self, url, discovered):
+        """Download, parse and load one newly published report.
+
+        Params:
+        - url (str): report URL
+        - discovered (float): time the report was first seen on the listing, seconds since the epoch
+        Return:
+            None
+        """
+        loop = asyncio.get_running_loop()
+        incident_data = None
+        try:
+            # stream the report to a file and map it, so the report is never held in memory
+            result = await loop.run_in_executor(
+                self.fetch_executor, lambda: backfill.fetch_report_file(url, self.pool, cache=self.cache)
+            )
+            error = "report could not be fetched"
+            if result["path"] is not None:
+                error = "report could not be read"
+                incident_data = assignment.map_report(result["path"])
+                if self.cache is None:
+                    # downloads are only kept by the download cache, the memory map keeps the data readable
+                    os.remove(result["path"])
+                    if incident_data is not None:
+                        incident_data.path = None
+            if incident_data is None:
+                # try the report again on the next poll
+                self.failed.add(url)
+                await loop.run_in_executor(self.db_executor, self.record_failure, url, error)
+                return
+            content_hash = assignment.hash_report(incident_data)
+            if await loop.run_in_executor(self.db_executor, assignment.is_ingested, self.db, content_hash):
+                print(f"Skipping already ingested report: {url}", file=sys.stderr)
+                await loop.run_in_executor(
+                    self.db_executor, assignment.record_checkpoint, self.db, url, "done", content_hash,
+                    assignment.get_report_date(url)
+                )
+                return
+            incidents, quarantined = await loop.run_in_executor(self.parse_executor, self.extract, incident_data)
+            rows = await loop.run_in_executor(
+                self.db_executor, self.load, url, content_hash, incidents, quarantined
+            )
+            if rows is None:
+                self.failed.add(url)
+                return
+            self.record_latency(url, rows, discovered, published_at(result["last_modified"]), time.time())
+        except Exception as ex:
+            self.failed.add(url)
+            print(f"ERROR in ingesting {url}: ", ex)
+            await loop.run_in_executor(self.db_executor, self.record_failure, url, repr(ex))
+        finally:
+            if incident_data is not None:
+                incident_data.close()
+
+    def record_latency(self, url, rows, discovered, published, loaded):
+        """Report the time from publication and from discovery of a report until its rows were stored.
+
+        Params:
+        - url (str): report URL
+        - rows (int): number of loaded incidents
+        - discovered (float): time the report was first seen on the listing
+        - published (float/None): Last-Modified time of the report, None if unknown
+        - loaded (float): time the incidents were committed
+        Return:
+            None
+        """
+        latency = {
+            "url": url, "rows": rows, "discovery_seconds": loaded - discovered,
+            "publication_seconds": None if published is None else loaded - published
+        }
+        self.latencies.append(latency)
+        message = f"Ingested {url}: {rows} incidents {latency['discovery_seconds']:.3f}s after discovery"
+        if published is not None:
+            message += f", {latency['publication_seconds']:.1f}s after publication"
+        print(message, file=sys.stderr)
+        # keep the run summary current for a textfile collector scraping the daemon
+        METRICS.gauge("watch_discovery_latency_seconds", latency["discovery_seconds"])
+        if published is not None:
+            METRICS.gauge("watch_publication_latency_seconds", latency["publication_seconds"])
+        METRICS.count("watch", records=rows)
+        if self.metrics_json:
+            METRICS.write_json(self.metrics_json)
+        if self.metrics_prom:
+            METRICS.write_prometheus(self.metrics_prom)
+
+    async def run(self, polls=None):
+        """Poll the listing every interval seconds and ingest the new reports until cancelled.
+
+        Params:
+            polls (int/None): number of polls after which the watcher stops once the reports found
+            are loaded, None to poll forever
+        Return:
+            None
+        """
+        loop = asyncio.get_running_loop()
+        tasks = set()
+        try:
+            await loop.run_in_executor(self.db_executor, self.open)
+            count = 0
+            while polls is None or count < polls:
+                if count:
+                    await asyncio.sleep(self.interval)
+                count += 1
+                # failed is only changed on the event loop thread, where the ingest tasks add to it
+                retries, self.failed = sorted(self.failed), set()
+                with METRICS.stage("poll"):
+                    urls = await loop.run_in_executor(self.fetch_executor, self.poll, retries)
+                discovered = time.time()
+                for url in urls:
+                    task = asyncio.create_task(self.ingest(url, discovered))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await loop.run_in_executor(self.db_executor, self.close)
+            for executor in (self.fetch_executor, self.parse_executor, self.db_executor):
+                executor.shutdown(wait=True)
+            self.pool.close()
@@ -0,0 +1,40 @@
+"""Compare the regex tokenizer with split_all_incidents + refactor_page_data.
+
+Run from the repository root:
+    python benchmarks/bench_tokenizer.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.getcwd())
+from assignment0 import assignment  # noqa: E402
+
+# fixture pages with the page text trimming and page type of extract_page_text
+PAGES = (
+    ("page0.txt", slice(57, -55), None),
+    ("random_page.txt", slice(None), None),
+    ("last_page.txt", slice(None), "last"),
+)
+
+
+def split_and_refactor(page_text, page_type):
+    return assignment.refactor_page_data(assignment.split_all_incidents(page_text, page_type))
+
+
+def main(number=2000):
+    for file_name, trim, page_type in PAGES:
+        with open(f"tests/data/{file_name}", "r") as f:
+            page_text = f.read()[trim]
+        expected = split_and_refactor(page_text, page_type)
+        assert assignment.parse_page_text(page_text, page_type) == expected, file_name
+
+        old = timeit.timeit(lambda: split_and_refactor(page_text, page_type), number=number)
+        new = timeit.timeit(lambda: assignment.parse_page_text(page_text, page_type), number=number)
+        records = len(expected) * number
+        print(f"{file_name}: split+refactor {records / old:,.0f} records/sec, "
+              f"tokenizer {records / new:,.0f} records/sec ({old / new:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
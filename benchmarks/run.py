@@ -0,0 +1,159 @@
+"""Pipeline benchmark suite on synthetic daily incident summaries.
+
+Run from the repository root:
+    python benchmarks/run.py --scales 1 10 100 --output results.json
+    python benchmarks/run.py --baseline results.json
+
+Each scale runs in a fresh process so its peak RSS is measured on its own.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from assignment0 import assignment  # noqa: E402
+from benchmarks import synthetic  # noqa: E402
+
+# whether a higher value of each metric is better, used to flag regressions
+METRICS = {
+    "extract_pages_per_sec": True,
+    "refactor_records_per_sec": True,
+    "tokenizer_records_per_sec": True,
+    "populate_rows_per_sec": True,
+    "status_ms": False,
+    "peak_rss_kb": False,
+}
+
+
+def run_scale(scale):
+    """Measure every pipeline stage on a synthetic report of the given scale.
+
+    Params:
+        scale (int): size multiple of the sample report
+    Return:
+        result (dict): metrics of the scale
+    """
+    incident_data, incident_lines = synthetic.generate_summary_pdf(scale)
+
+    # pypdf text extraction
+    start = time.perf_counter()
+    reader = assignment.open_pdf(io.BytesIO(incident_data))
+    tot_pages = len(reader.pages)
+    page_texts = [assignment.read_page_text(reader.pages[i], i, tot_pages) for i in range(tot_pages)]
+    extract_time = time.perf_counter() - start
+
+    # splitting and field parsing
+    start = time.perf_counter()
+    incidents = []
+    for page_text, page_type in page_texts:
+        incidents.extend(assignment.refactor_page_data(assignment.split_all_incidents(page_text, page_type)))
+    refactor_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for page_text, page_type in page_texts:
+        assignment.parse_page_text(page_text, page_type)
+    tokenizer_time = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cwd = os.getcwd()
+        os.chdir(tmp_dir)
+        try:
+            os.mkdir("resources")
+            db = assignment.create_db("bench.db")
+            with contextlib.redirect_stderr(io.StringIO()):
+                start = time.perf_counter()
+                rows = assignment.populate_db(db, incidents)
+                populate_time = time.perf_counter() - start
+            db.close()
+
+            # status closes its connection, so it gets a fresh one
+            db = assignment.create_db("bench.db")
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                assignment.status(db)
+                status_time = time.perf_counter() - start
+        finally:
+            os.chdir(cwd)
+
+    return {
+        "pages": tot_pages,
+        "records": len(incidents),
+        "expected_records": len(incident_lines),
+        "rows": rows,
+        "extract_pages_per_sec": tot_pages / extract_time,
+        "refactor_records_per_sec": len(incidents) / refactor_time,
+        "tokenizer_records_per_sec": len(incidents) / tokenizer_time,
+        "populate_rows_per_sec": rows / populate_time,
+        "status_ms": status_time * 1000,
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Flag metrics that are worse than the baseline by more than the tolerance.
+
+    Params:
+    - results (dict): metrics of each scale
+    - baseline (dict): stored metrics of each scale
+    - tolerance (float): allowed relative change, 0.2 allows 20%
+    Return:
+        regressions (List[str]): description of every regressed metric
+    """
+    regressions = []
+    for scale, metrics in results.items():
+        for metric, higher_is_better in METRICS.items():
+            old = baseline.get(scale, {}).get(metric)
+            if not old:
+                continue
+            change = (metrics[metric] - old) / old
+            if (change < -tolerance) if higher_is_better else (change > tolerance):
+                regressions.append(f"{scale} {metric}: {old:,.1f} -> {metrics[metric]:,.1f} ({change:+.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100], help="Report size multiples.")
+    parser.add_argument("--output", type=str, help="JSON file the results are written to.")
+    parser.add_argument("--baseline", type=str, help="JSON results of an earlier run to compare against.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression.")
+    args = parser.parse_args()
+
+    results = {}
+    for scale in args.scales:
+        # a fresh process per scale keeps peak RSS measurements independent
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            results[f"{scale}x"] = executor.submit(run_scale, scale).result()
+        metrics = results[f"{scale}x"]
+        print(f"{scale}x: {metrics['pages']} pages, {metrics['extract_pages_per_sec']:,.0f} pages/sec, "
+              f"{metrics['refactor_records_per_sec']:,.0f} records/sec, "
+              f"{metrics['populate_rows_per_sec']:,.0f} rows/sec, status {metrics['status_ms']:.2f} ms, "
+              f"peak RSS {metrics['peak_rss_kb']:,} KB", file=sys.stderr)
+
+    report = {"python": platform.python_version(), "platform": platform.platform(), "results": results}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+    else:
+        print(json.dumps(report, indent=4))
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
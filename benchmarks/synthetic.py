@@ -0,0 +1,123 @@
+"""Synthetic Norman PD style daily incident summary PDFs for benchmarks."""
+import datetime
+import io
+import random
+
+# header and title the real first page starts and ends with once its text is extracted
+HEADER = "Date / Time Incident Number Location Nature Incident ORI"
+TITLE = ("NORMAN POLICE DEPARTMENT", "Daily Incident Summary (Public)")
+
+# size of tests/data/2024-01-01_daily_incident_summary.pdf
+BASE_PAGES = 20
+RECORDS_PER_PAGE = 17
+
+# fields incidents are drawn from
+LOCATIONS = (
+    "608 S FLOOD AVE", "2700 W LINDSEY ST", "941 HEATHER GLEN DR", "1307 BEVERLY HILLS ST", "2501 N PORTER AVE",
+    "DOVER ST / VICKSBURG AVE", "S JAMES GARNER AVE / W APACHE ST", "1144 24TH AVE SE", "313 SUMMIT WAY",
+    "3300 HEALTHPLEX PKWY", "E BOYD ST / TROUT AVE", "750 S I35 NB I", "WYLIE RD / LINDALE AVE", "1028 LESLIE LN",
+)
+NATURES = (
+    "Traffic Stop", "Transfer/Interfacility", "Sick Person", "Check Area", "Alarm", "Public Assist", "Falls",
+    "Medical Call Pd Requested", "Motorist Assist", "911 Call Nature Unknown", "Noise Complaint", "MVA With Injuries",
+    "Welfare Check", "Larceny", "Fire Alarm", "Assault EMS Needed",
+)
+ORIS = ("OK0140200", "OK0140200", "OK0140200", "14005", "EMSSTAT")
+
+
+def generate_incidents(count, report_date=datetime.date(2024, 1, 1), seed=0):
+    """Generate incident lines of a daily summary with unique incident numbers.
+
+    Params:
+    - count (int): number of incidents
+    - report_date (date): date of the incidents
+    - seed (int): random seed, the same seed gives the same incidents
+    Return:
+        lines (List[str]): incident lines in time order
+    """
+    rng = random.Random(seed)
+    date = f"{report_date.month}/{report_date.day}/{report_date.year}"
+    lines = []
+    for i in range(count):
+        minutes = i * 24 * 60 // max(count, 1)
+        lines.append(
+            f"{date} {minutes // 60}:{minutes % 60:02d} {report_date.year}-{i + 1:08d} "
+            f"{rng.choice(LOCATIONS)} {rng.choice(NATURES)} {rng.choice(ORIS)}"
+        )
+    return lines
+
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _content_stream(lines):
+    # one text line per row, moving down the page like the real report
+    ops = ["BT", "/F1 8 Tf", "50 560 Td", "12 TL"]
+    ops.append(" T*\n".join(f"({_escape(line)}) Tj" for line in lines))
+    ops.append("ET")
+    return "\n".join(ops).encode("latin-1")
+
+
+def build_pdf(pages):
+    """Build a PDF document with one text line per row.
+
+    Params:
+        pages (List[List[str]]): text lines of each page
+    Return:
+        data (bytes): PDF document data
+    """
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for lines in pages:
+        stream = _content_stream(lines)
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 792 612] /Resources << /Font << /F1 3 0 R >> >> "
+            b"/Contents %d 0 R >>" % content_id
+        )
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % kid for kid in kids), len(kids)
+    )
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return out.getvalue()
+
+
+def generate_summary_pdf(scale=1, report_date=datetime.date(2024, 1, 1), seed=0):
+    """Generate a daily incident summary PDF scaled from the sample report.
+
+    Params:
+    - scale (int): size multiple of the sample report, 1 gives the same number of pages
+    - report_date (date): date of the incidents
+    - seed (int): random seed
+    Return:
+    - data (bytes): PDF document data
+    - incident_lines (List[str]): incident lines written to the document
+    """
+    tot_pages = BASE_PAGES * scale
+    incident_lines = generate_incidents(tot_pages * RECORDS_PER_PAGE, report_date, seed)
+    pages = []
+    for page_num in range(tot_pages):
+        lines = incident_lines[page_num * RECORDS_PER_PAGE:(page_num + 1) * RECORDS_PER_PAGE]
+        if page_num == 0:
+            # the real report's title follows the last incident of the first page on the same line
+            lines = [HEADER, *lines[:-1], lines[-1] + TITLE[0], TITLE[1]]
+        if page_num == tot_pages - 1:
+            # footer with the date and time the report was printed
+            printed = report_date + datetime.timedelta(days=1)
+            lines = [*lines, f"{printed.month}/{printed.day}/{printed.year} 10:25"]
+        pages.append(lines)
+    return build_pdf(pages), incident_lines
@@ -7,7 +7,7 @@ setup(
     author='Pratiksha Deodhar',
     author_email='pdeodhar@ufl.edu',
     url="https://github.com/pratikshadeo24/cis6930sp24-assignment0",
-    packages=find_packages(exclude=('tests', 'docs', 'resources')),
+    packages=find_packages(exclude=('tests', 'docs', 'resources', 'benchmarks')),
     install_requires=[
         'pypdf==4.0.0'
     ],
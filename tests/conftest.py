@@ -0,0 +1,118 @@
+import os
+import re
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from assignment0.output import JSON_WRITER
+
+
+@pytest.fixture(autouse=True)
+def no_json_output():
+    """Keep tests from writing the incidents JSON file unless they configure it"""
+    JSON_WRITER.configure(None)
+    yield
+    JSON_WRITER.configure(None)
+
+
+class ReportRequestHandler(SimpleHTTPRequestHandler):
+    """Serve files from tests/data over keep-alive HTTP/1.1 and record each request"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.server.requests.append((self.path, self.client_address))
+        if self.server.failures.get(self.path, 0) > 0:
+            # fail the request the configured number of times before serving it
+            self.server.failures[self.path] -= 1
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if self.path in self.server.pages:
+            # serve a generated page, e.g. a listing of reports, with an ETag of its version
+            body = self.server.pages[self.path]
+            etag = f'"{hash(body)}"'
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("ETag", etag)
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        path = self.translate_path(self.path)
+        if "Range" in self.headers and "If-Modified-Since" not in self.headers and os.path.isfile(path):
+            if self.send_range(path):
+                return
+        super().do_GET()
+
+    def send_range(self, path):
+        """Serve the requested byte range of a file, return False to serve the whole file instead"""
+        self.server.ranges.append((self.path, self.headers["Range"]))
+        last_modified = self.date_time_string(int(os.path.getmtime(path)))
+        match = re.fullmatch(r"bytes=(\d+)-(\d+)", self.headers["Range"])
+        # a changed file is served whole when the range is conditional on its old version
+        if match is None or self.headers.get("If-Range", last_modified) != last_modified:
+            return False
+        size = os.path.getsize(path)
+        start, end = int(match.group(1)), min(int(match.group(2)), size - 1)
+        if start > 0 and self.server.range_failures > 0:
+            # fail a range after the first one the configured number of times
+            self.server.range_failures -= 1
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return True
+        with open(path, "rb") as f:
+            f.seek(start)
+            body = f.read(end + 1 - start)
+        self.send_response(206)
+        self.send_header("Content-Type", self.guess_type(path))
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Last-Modified", last_modified)
+        self.end_headers()
+        self.wfile.write(body)
+        return True
+
+    def end_headers(self):
+        # announce the configured Repr-Digest of a file in each of its responses
+        if self.path in self.server.digests:
+            self.send_header("Repr-Digest", self.server.digests[self.path])
+        super().end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def report_server():
+    """Local stand-in HTTP server serving the PDFs from tests/data and the generated pages"""
+    data_dir = f"{os.getcwd()}/tests/data"
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(ReportRequestHandler, directory=data_dir))
+    server.requests = []
+    server.failures = {}
+    server.pages = {}
+    server.ranges = []
+    server.range_failures = 0
+    server.digests = {}
+    server.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def sample_pdf_data():
+    """Sample daily incident summary PDF document in bytes"""
+    file_path = f"{os.getcwd()}/tests/data/2024-01-01_daily_incident_summary.pdf"
+    with open(file_path, "rb") as file:
+        return file.read()
@@ -1,6 +1,13 @@
+import gzip
+import io
+import json
 import os
+import sqlite3
 import pytest
 from assignment0 import assignment
+from assignment0.dedup import INCIDENT_KEY_FILTER
+from assignment0.output import JSON_WRITER
+from assignment0.vocabulary import NatureVocabulary
 from tests import result_page_0, result_random_page, result_last_page
 
 
@@ -76,6 +83,16 @@ def mock_sqlite(mocker):
     return mocker.patch('assignment0.assignment.sqlite3.connect')
 
 
+@pytest.fixture
+def test_db(tmp_path, monkeypatch):
+    """Database created by create_db under a temporary working directory"""
+    monkeypatch.chdir(tmp_path)
+    os.mkdir("resources")
+    conn = assignment.create_db("test.db")
+    yield conn
+    conn.close()
+
+
 @pytest.fixture
 def expected_incidents():
     """Sample extracted incidents with defined fields"""
@@ -86,6 +103,7 @@ def expected_incidents():
             "incident_location": "4741 N PORTER AVE",
             "incident_nature": "Traffic Stop",
             "incident_ori": "OK0140200",
+            "incident_date": "2024-01-01",
         },
         {
             "incident_time": "23:17",
@@ -93,6 +111,7 @@ def expected_incidents():
             "incident_location": "2000 ANN BRANDEN BLVD",
             "incident_nature": "Transfer/Interfacility",
             "incident_ori": "EMSSTAT",
+            "incident_date": "2024-01-01",
         },
         {
             "incident_time": "23:38",
@@ -100,6 +119,7 @@ def expected_incidents():
             "incident_location": "1028 LESLIE LN",
             "incident_nature": "911 Call Nature Unknown",
             "incident_ori": "OK0140200",
+            "incident_date": "2024-01-01",
         },
     ]
 
@@ -152,28 +172,51 @@ def test_delete_existing_db_failure(mocker, mock_cwd):
     mocked_remove.assert_not_called()
 
 
-def test_fetch_incidents_success(mocker, sample_url):
-    """Test successful fetching of PDF file data"""
+def test_fetch_incidents_success(mocker, sample_url, tmp_path, monkeypatch):
+    """Test the downloaded PDF file is memory-mapped and its file removed"""
     # Mocks
     mock_data = b"test response data"
-    request = mocker.patch(
-        "urllib.request.urlopen", return_value=mocker.Mock(read=lambda: mock_data)
-    )
+    monkeypatch.chdir(tmp_path)
+
+    def download(url, path, **kwargs):
+        with open(path, "wb") as f:
+            f.write(mock_data)
+        return {"path": path, "sha256": "digest", "etag": None, "last_modified": None}
+
+    request = mocker.patch("assignment0.backfill.download_report", side_effect=download)
 
     # Execute
     data = assignment.fetch_incidents(sample_url)
 
     # Asserts
     request.assert_called_once()
-    assert data == mock_data
+    assert isinstance(data, assignment.MappedReport)
+    assert data[:] == mock_data
+    assert os.listdir("resources/downloads") == []
 
 
-def test_fetch_incidents_failure(mocker, sample_url):
+def test_fetch_incidents_no_cache_parallel(report_server, tmp_path, monkeypatch):
+    """Test a downloaded report removed without a cache is still extracted by worker processes"""
+    # Mocks
+    monkeypatch.chdir(tmp_path)
+    url = f"{report_server.base_url}/2024-01-01_daily_incident_summary.pdf"
+
+    # Execute
+    report = assignment.fetch_incidents(url)
+    incidents = assignment.extract_incidents(report, workers=2)
+
+    # Asserts
+    assert report.path is None
+    assert os.listdir("resources/downloads") == []
+    assert len(incidents) == 328
+    report.close()
+
+
+def test_fetch_incidents_failure(mocker, sample_url, tmp_path, monkeypatch):
     """Test exception while fetching of PDF file data"""
     # Mocks
-    request = mocker.patch(
-        "urllib.request.urlopen", side_effect=Exception("Test exception")
-    )
+    monkeypatch.chdir(tmp_path)
+    request = mocker.patch("assignment0.backfill.download_report", side_effect=Exception("Test exception"))
 
     # Execute
     data = assignment.fetch_incidents(sample_url)
@@ -190,8 +233,8 @@ def test_extract_incidents(mocker, mock_object, sample_page_text, expected_incid
     reader.pages = [mock_object]
     sample_incident_data = mock_object
     mocker.patch("assignment0.assignment.io.BytesIO", return_vale=mock_object)
-    mocker.patch("assignment0.assignment.PdfReader", return_value=reader)
-    mocker.patch("assignment0.assignment.extract_page_text", return_value=sample_page_text)
+    mocker.patch("assignment0.assignment.open_pdf", return_value=reader)
+    mocker.patch("assignment0.assignment.read_page_text", return_value=("\n".join(sample_page_text), None))
 
     # Execute
     incidents = assignment.extract_incidents(sample_incident_data)
@@ -202,6 +245,202 @@ def test_extract_incidents(mocker, mock_object, sample_page_text, expected_incid
     assert incidents[2] == expected_incidents[2]
 
 
+@pytest.mark.parametrize("workers", [1, 3])
+def test_extract_incidents_quarantines_page(mocker, sample_pdf_data, workers):
+    """Test pages that fail to parse are quarantined and the last page is still extracted"""
+    # Mocks
+    mocker.patch("assignment0.assignment.create_json")
+    parse_page_text = assignment.parse_page_text
+    mocker.patch(
+        "assignment0.assignment.parse_page_text",
+        side_effect=lambda text, page_type=None: parse_page_text(text, page_type) if page_type else [][1],
+    )
+    assignment.QUARANTINED_PAGES.clear()
+    tot_pages = len(assignment.open_pdf(io.BytesIO(sample_pdf_data)).pages)
+
+    # Execute
+    incidents = assignment.extract_incidents(sample_pdf_data, workers)
+
+    # Asserts
+    assert 0 < len(incidents) < 328
+    assert sorted(page_num for page_num, _ in assignment.QUARANTINED_PAGES) == list(range(tot_pages - 1))
+    assert "IndexError" in assignment.QUARANTINED_PAGES[0][1]
+    assignment.QUARANTINED_PAGES.clear()
+
+
+def test_extract_incidents_parallel_matches_serial(mocker, sample_pdf_data):
+    """Test parallel page extraction returns the same incidents as serial extraction"""
+    # Mocks
+    mocker.patch("assignment0.assignment.create_json")
+
+    # Execute
+    serial_incidents = assignment.extract_incidents(sample_pdf_data)
+    parallel_incidents = assignment.extract_incidents(sample_pdf_data, workers=3)
+
+    # Asserts
+    assert len(serial_incidents) == 328
+    assert parallel_incidents == serial_incidents
+
+
+def test_map_report(mocker, sample_pdf_data):
+    """Test a memory-mapped local report extracts the same incidents as its bytes"""
+    # Mocks
+    mocker.patch("assignment0.assignment.create_json")
+    path = f"{os.getcwd()}/tests/data/2024-01-01_daily_incident_summary.pdf"
+
+    # Execute
+    report = assignment.map_report(path)
+    incidents = assignment.extract_incidents(report)
+    parallel_incidents = assignment.extract_incidents(report, workers=2)
+
+    # Asserts
+    assert report.path == path
+    assert assignment.hash_report(report) == assignment.hash_report(sample_pdf_data)
+    assert assignment.pdf_stream(report) is report
+    assert incidents == parallel_incidents == assignment.extract_incidents(sample_pdf_data)
+    report.close()
+
+
+def test_map_report_failure():
+    """Test a missing local report returns no data"""
+    # Execute
+    report = assignment.map_report("/test/missing.pdf")
+
+    # Asserts
+    assert report is None
+
+
+def test_extract_page_range_worker_missing_report():
+    """Test a worker given a report path that cannot be mapped raises a clear error"""
+    # Execute / Asserts
+    with pytest.raises(OSError, match="cannot map report /test/missing.pdf"):
+        assignment._extract_page_range_worker("/test/missing.pdf", 0, 1, 1)
+
+
+def test_find_local_reports(tmp_path):
+    """Test local directories and glob patterns expand into PDF files"""
+    # Initialize
+    for name in ("2024-01-02_daily_incident_summary.pdf", "2024-01-01_daily_incident_summary.pdf", "notes.txt"):
+        (tmp_path / name).write_bytes(b"")
+
+    # Execute
+    from_dir = assignment.find_local_reports(str(tmp_path))
+    from_glob = assignment.find_local_reports(f"{tmp_path}/2024-01-02_*.pdf")
+
+    # Asserts
+    assert [os.path.basename(path) for path in from_dir] == [
+        "2024-01-01_daily_incident_summary.pdf",
+        "2024-01-02_daily_incident_summary.pdf",
+    ]
+    assert from_glob == [f"{tmp_path}/2024-01-02_daily_incident_summary.pdf"]
+    assert assignment.find_local_reports("report.pdf") == ["report.pdf"]
+    assert assignment.is_url("file:///tmp/report.pdf") is True
+    assert assignment.is_url("/tmp/report.pdf") is False
+
+
+def test_split_page_ranges():
+    """Test page ranges cover all pages in order without overlap"""
+    # Execute
+    ranges = assignment.split_page_ranges(20, 3)
+
+    # Asserts
+    assert ranges == [(0, 7), (7, 14), (14, 20)]
+    assert assignment.split_page_ranges(2, 8) == [(0, 1), (1, 2)]
+
+
+def test_iter_incidents_matches_extract_incidents(mocker, sample_pdf_data):
+    """Test lazily extracted incidents are the same as the extracted list"""
+    # Mocks
+    mocker.patch("assignment0.assignment.create_json")
+
+    # Execute
+    stream = assignment.iter_incidents(sample_pdf_data)
+    first = next(stream)
+
+    # Asserts
+    assert [first, *stream] == assignment.extract_incidents(sample_pdf_data)
+
+
+@pytest.fixture
+def json_writer(tmp_path):
+    """Incidents JSON writer of the pipeline writing NDJSON under a temporary directory"""
+    JSON_WRITER.configure(str(tmp_path / "incidents.ndjson"))
+    yield JSON_WRITER
+    JSON_WRITER.configure(None)
+
+
+def test_stream_json(json_writer, expected_incidents):
+    """Test streamed incidents are written one compact JSON object per line"""
+    # Execute
+    passed = list(assignment.stream_json(iter(expected_incidents)))
+    assignment.create_json(expected_incidents[:1])
+    json_writer.close()
+
+    # Asserts
+    assert passed == expected_incidents
+    with open(json_writer.path) as f:
+        lines = f.read().splitlines()
+    assert [json.loads(line) for line in lines] == expected_incidents + expected_incidents[:1]
+    assert lines[0] == json.dumps(expected_incidents[0], separators=(",", ":"))
+
+
+@pytest.mark.parametrize("file_name", ["incidents.json", "incidents.json.gz"])
+def test_create_json_array(tmp_path, expected_incidents, file_name):
+    """Test incidents of several reports are written as one compact JSON array, optionally gzip compressed"""
+    # Initialize
+    path = str(tmp_path / file_name)
+    JSON_WRITER.configure(path, "array")
+
+    # Execute
+    assignment.create_json(expected_incidents[:2])
+    assignment.create_json(assignment.parse_page_text(
+        "1/1/2024 23:38 2024-00000218 1028 LESLIE LN 911 Call Nature Unknown OK0140200"
+    ))
+    JSON_WRITER.configure(None)
+
+    # Asserts
+    with (gzip.open(path, "rt") if path.endswith(".gz") else open(path)) as f:
+        assert json.load(f) == expected_incidents
+
+
+def test_create_json_disabled(tmp_path, expected_incidents):
+    """Test nothing is written without an output path"""
+    # Initialize
+    JSON_WRITER.configure(None)
+
+    # Execute
+    passed = list(assignment.stream_json(iter(expected_incidents)))
+    assignment.create_json(expected_incidents)
+
+    # Asserts
+    assert passed == expected_incidents
+    assert os.listdir(tmp_path) == []
+
+
+def test_create_json_empty(tmp_path):
+    """Test a run without incidents writes an empty JSON array"""
+    # Initialize
+    path = tmp_path / "incidents.json"
+    JSON_WRITER.configure(str(path), "array")
+
+    # Execute
+    assignment.create_json([])
+    JSON_WRITER.close()
+
+    # Asserts
+    assert path.read_text() == "[]"
+    JSON_WRITER.configure(None)
+
+
+def test_iter_batches():
+    """Test streams are grouped into bounded batches"""
+    # Execute
+    batches = list(assignment.iter_batches(iter(range(5)), 2))
+
+    # Asserts
+    assert batches == [[0, 1], [2, 3], [4]]
+
+
 def test_extract_page_text_page0(mock_object, sample_page0):
     """Test extracted first page content"""
     # Mocks
@@ -267,6 +506,74 @@ def test_split_all_incidents_last_page(sample_last_page):
     assert extracted_incidents[-1] == result_last_page[-1]
 
 
+@pytest.mark.parametrize(
+    "fixture_name, trim, page_type",
+    [
+        ("sample_page0", slice(57, -55), None),
+        ("sample_random_page", slice(None), None),
+        ("sample_last_page", slice(None), "last"),
+    ],
+)
+def test_parse_page_text_matches_refactor(request, fixture_name, trim, page_type):
+    """Test the regex tokenizer extracts the same incidents as splitting and refactoring"""
+    # Initialize
+    page_text = request.getfixturevalue(fixture_name)[trim]
+
+    # Execute
+    page_incidents = assignment.parse_page_text(page_text, page_type)
+
+    # Asserts
+    assert page_incidents == assignment.refactor_page_data(assignment.split_all_incidents(page_text, page_type))
+
+
+def test_parse_page_text_edge_cases():
+    """Test location glued to the incident number and two-digit months"""
+    # Initialize
+    page_text = (
+        "11/17/2024 0:08 2024-00003584ABC ST Check Area OK0140200\n"
+        "12/17/2024 0:13 2024-00003585 EMSSTAT\n"
+    )
+
+    # Execute
+    page_incidents = assignment.parse_page_text(page_text)
+
+    # Asserts
+    assert len(page_incidents) == 2
+    assert page_incidents[0]["incident_number"] == "2024-00003584"
+    assert page_incidents[0]["incident_location"] == "ABC ST"
+    assert page_incidents[0]["incident_nature"] == "Check Area"
+    assert page_incidents[1]["incident_location"] == ""
+    assert page_incidents[1]["incident_ori"] == "EMSSTAT"
+    assert page_incidents == assignment.refactor_page_data(assignment.split_all_incidents(page_text))
+
+
+def test_parse_page_text_irregular_record(capsys):
+    """Test a record the tokenizer does not match is parsed like the legacy path and logged"""
+    # Initialize
+    page_text = (
+        "1/1/2024 0:05 2024-00000357 1 MAIN ST Traffic Stop OK0140200\n"
+        "1/1/2024 0:08 2024-0000358 123 MAIN ST Check Area OK0140200\n"
+        "1/1/2024 0:13 2024-00000359 EMSSTAT\n"
+    )
+
+    # Execute
+    page_incidents = assignment.parse_page_text(page_text)
+
+    # Asserts
+    assert page_incidents == assignment.refactor_page_data(assignment.split_all_incidents(page_text))
+    assert [incident["incident_number"] for incident in page_incidents] == [
+        "2024-00000357", "2024-0000358", "2024-00000359"
+    ]
+    assert "Irregular incident parsed by position: 1/1/2024 0:08 2024-0000358" in capsys.readouterr().err
+
+
+def test_parse_page_text_unparsable():
+    """Test text that is not an incident raises so the page is quarantined"""
+    # Execute / Asserts
+    with pytest.raises(ValueError):
+        assignment.parse_page_text("1/1/2024 0:05 2024-00000357 1 MAIN ST Traffic Stop OK0140200\n1/1/2024 0:08\n")
+
+
 def test_refactor_page_data(sample_page_text, expected_incidents):
     """Test refactoring of page content to get required fields"""
     # Execute
@@ -312,27 +619,39 @@ def test_extract_location_and_nature_case2():
     assert nature == "911 Call Nature Unknown"
 
 
+def test_extract_location_and_nature_unknown_nature(capsys):
+    """Test an unknown nature ending in a known one falls back to the heuristics and is logged"""
+    # Initialize
+    record = ["1420", "OAKCREST", "AVE", "Fire", "Carbon", "Monoxide", "Alarm"]
+    vocabulary = NatureVocabulary(["Alarm"])
+
+    # Execute
+    location, nature = assignment.extract_location_and_nature(record, vocabulary)
+
+    # Asserts
+    assert location == "1420 OAKCREST AVE"
+    assert nature == "Fire Carbon Monoxide Alarm"
+    assert "Unknown incident nature: Fire Carbon Monoxide Alarm" in capsys.readouterr().err
+
+
 def test_create_db_success(mock_object, mock_sqlite):
     """Test successful creation of database with provided name"""
     # Mocks
     mock_cursor = mock_object
     mock_connection = mock_object
     mock_connection.cursor.return_value = mock_cursor
+    mock_cursor.execute.return_value.fetchall.return_value = []
     mock_sqlite.return_value = mock_connection
 
     # Initialize
     db_name = "test.db"
-    query = (
-        "CREATE TABLE incidents(incident_time TEXT, incident_number TEXT, incident_location TEXT, "
-        "incident_nature TEXT, incident_ori TEXT)"
-    )
-
     # Execute
     conn = assignment.create_db(db_name)
 
     # Asserts
     mock_sqlite.assert_called_once_with(f'resources/{db_name}')
-    mock_cursor.execute.assert_called_with(query)
+    for query in assignment.SCHEMA_QUERIES:
+        mock_cursor.execute.assert_any_call(query)
     assert conn == mock_connection
 
 
@@ -352,11 +671,8 @@ def test_create_db_failure(mock_object, mock_sqlite):
     assert result is None
 
 
-def test_populate_db_success(mock_object):
+def test_populate_db_success(test_db):
     """Test if database is being populated successfully"""
-    # Mock
-    mock_db = mock_object
-
     # Initialize
     sample_incidents = [
         {
@@ -369,28 +685,97 @@ def test_populate_db_success(mock_object):
     ]
 
     # Execute
-    assignment.populate_db(mock_db, sample_incidents)
+    rows = assignment.populate_db(test_db, sample_incidents)
 
     # Asserts
-    mock_db.execute.assert_called_once_with(
-        "INSERT INTO incidents (incident_time, incident_number, incident_location, incident_nature, "
-        "incident_ori) VALUES (?, ?, ?, ?, ?)",
-        (
-            "16:07",
-            "2024-00000153",
-            "1000 108TH AVE SE",
-            "Reckless Driving",
-            "OK0140200",
-        ),
-    )
-    mock_db.commit.assert_called_once()
+    assert rows == 1
+    assert test_db.execute("SELECT * FROM incidents").fetchall() == [
+        ("", "16:07", "2024-00000153", "1000 108TH AVE SE", "Reckless Driving", "OK0140200", None)
+    ]
+    assert test_db.execute("SELECT location_id, nature_id, ori_id FROM incident_facts").fetchall() == [(1, 1, 1)]
+    assert test_db.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_populate_db_batches(test_db, expected_incidents):
+    """Test incidents are loaded in batches within a single transaction"""
+    # Execute
+    rows = assignment.populate_db(test_db, iter(expected_incidents), batch_size=2, report_date="2024-01-01")
+
+    # Asserts
+    assert rows == 3
+    assert test_db.execute("SELECT COUNT(*) FROM incidents").fetchone()[0] == 3
+    indexes = [row[0] for row in test_db.execute("SELECT name FROM sqlite_master WHERE type = 'index'")]
+    assert "idx_incident_facts_nature_date" in indexes
+
+
+def test_populate_db_upsert(test_db, expected_incidents):
+    """Test re-loading a report updates rows on their natural key instead of duplicating them"""
+    # Initialize
+    assignment.populate_db(test_db, expected_incidents, report_date="2024-01-01")
+    updated = [dict(expected_incidents[0], incident_nature="Check Area")]
+
+    # Execute
+    assignment.populate_db(test_db, updated, report_date="2024-01-01")
+    assignment.populate_db(test_db, updated, report_date="2024-01-02")
+
+    # Asserts
+    rows = test_db.execute(
+        "SELECT report_date, incident_nature FROM incidents WHERE incident_number = '2024-00000215'"
+    ).fetchall()
+    assert rows == [("2024-01-01", "Check Area"), ("2024-01-02", "Check Area")]
+
+
+@pytest.fixture
+def dedup():
+    """Cross-report duplicate detection enabled for the test"""
+    INCIDENT_KEY_FILTER.enabled = True
+    yield INCIDENT_KEY_FILTER
+    INCIDENT_KEY_FILTER.enabled = False
+    INCIDENT_KEY_FILTER.reset()
+
+
+def test_populate_db_records_incident_keys(test_db, expected_incidents):
+    """Test the incident keys are recorded for the report that first loaded them"""
+    # Execute
+    assignment.populate_db(test_db, expected_incidents, report_date="2024-01-01")
+    assignment.populate_db(test_db, expected_incidents[:1], report_date="2024-01-02")
+
+    # Asserts
+    assert test_db.execute("SELECT COUNT(*) FROM incidents").fetchone()[0] == 4
+    keys = test_db.execute("SELECT incident_number, report_date FROM incident_keys ORDER BY incident_number")
+    assert keys.fetchall() == [
+        ("2024-00000062", "2024-01-01"), ("2024-00000215", "2024-01-01"), ("2024-00000218", "2024-01-01")
+    ]
+
+
+def test_populate_db_dedup(test_db, expected_incidents, dedup, capsys):
+    """Test incidents listed again by a later report are skipped while a re-loaded report is updated"""
+    # Initialize
+    assignment.populate_db(test_db, expected_incidents[:2], report_date="2024-01-01")
+    updated = [dict(expected_incidents[0], incident_nature="Check Area")]
+
+    # Execute
+    rows = assignment.populate_db(test_db, expected_incidents, batch_size=2, report_date="2024-01-02")
+    reloaded = assignment.populate_db(test_db, updated, report_date="2024-01-01")
+
+    # Asserts
+    assert rows == 1
+    assert reloaded == 1
+    assert test_db.execute("SELECT report_date, incident_number, incident_nature FROM incidents").fetchall() == [
+        ("2024-01-01", "2024-00000215", "Check Area"),
+        ("2024-01-01", "2024-00000062", "Transfer/Interfacility"),
+        ("2024-01-02", "2024-00000218", "911 Call Nature Unknown"),
+    ]
+    assert assignment.check_nature_counts(test_db) == []
+    assert "Skipped 2 incidents already loaded from another report" in capsys.readouterr().err
 
 
 def test_populate_db_failure(mock_object):
     """Test exception in populating database"""
     # Mocks
     mock_db = mock_object
-    mock_db.execute.side_effect = Exception("Test exception")
+    mock_db.execute.return_value.fetchone.return_value = (0,)
+    mock_db.executemany.side_effect = Exception("Test exception")
 
     # Initialize
     sample_incidents = [
@@ -407,18 +792,459 @@ def test_populate_db_failure(mock_object):
     assignment.populate_db(mock_db, sample_incidents)
 
     # Asserts
-    mock_db.execute.assert_called_once_with(
-        "INSERT INTO incidents (incident_time, incident_number, incident_location, incident_nature, "
-        "incident_ori) VALUES (?, ?, ?, ?, ?)",
-        (
-            "16:07",
-            "2024-00000153",
-            "1000 108TH AVE SE",
-            "Reckless Driving",
-            "OK0140200",
-        ),
-    )
+    mock_db.executemany.assert_called_once()
     mock_db.commit.assert_not_called()
+    mock_db.rollback.assert_called_once()
+
+
+def test_create_db_existing(test_db):
+    """Test creating the database again keeps existing incidents"""
+    # Initialize
+    test_db.execute("INSERT INTO incidents (incident_number, incident_ori) VALUES ('2024-00000001', 'EMSSTAT')")
+    test_db.commit()
+
+    # Execute
+    conn = assignment.create_db("test.db")
+
+    # Asserts
+    assert conn.execute("SELECT COUNT(*) FROM incidents").fetchone()[0] == 1
+    conn.close()
+
+
+def test_create_db_migrates_flat_table(tmp_path, monkeypatch):
+    """Test a flat incidents table is converted to the normalized schema"""
+    # Initialize
+    monkeypatch.chdir(tmp_path)
+    os.mkdir("resources")
+    conn = sqlite3.connect("resources/test.db")
+    conn.execute(
+        "CREATE TABLE incidents(incident_time TEXT, incident_number TEXT, incident_location TEXT, "
+        "incident_nature TEXT, incident_ori TEXT)"
+    )
+    conn.executemany("INSERT INTO incidents VALUES (?, ?, ?, ?, ?)", [
+        ("23:14", "2024-00000215", "4741 N PORTER AVE", "Traffic Stop", "OK0140200"),
+        ("23:38", "2024-00000218", "1028 LESLIE LN", "Traffic Stop", "OK0140200"),
+        ("23:40", "2024-00000219", None, "Traffic Stop", "EMSSTAT"),
+    ])
+    conn.commit()
+    conn.close()
+
+    # Execute
+    conn = assignment.create_db("test.db")
+
+    # Asserts
+    tables = dict(conn.execute("SELECT name, type FROM sqlite_master WHERE name LIKE 'incident%'").fetchall())
+    assert tables["incidents"] == "view"
+    assert "incidents_flat" not in tables
+    assert conn.execute("SELECT * FROM incidents ORDER BY incident_number").fetchall() == [
+        ("", "23:14", "2024-00000215", "4741 N PORTER AVE", "Traffic Stop", "OK0140200", None),
+        ("", "23:38", "2024-00000218", "1028 LESLIE LN", "Traffic Stop", "OK0140200", None),
+        ("", "23:40", "2024-00000219", None, "Traffic Stop", "EMSSTAT", None),
+    ]
+    assert conn.execute("SELECT COUNT(*) FROM natures").fetchone()[0] == 1
+    conn.close()
+
+
+def test_incidents_view_writes(test_db, expected_incidents):
+    """Test rows written through the incidents view are encoded and upserted"""
+    # Initialize
+    assignment.populate_db(test_db, expected_incidents, report_date="2024-01-01")
+
+    # Execute
+    test_db.execute(
+        "INSERT INTO incidents VALUES ('2024-01-01', '23:59', '2024-00000215', '4741 N PORTER AVE', "
+        "'Check Area', 'OK0140200', '2024-01-01T23:59')"
+    )
+    test_db.execute("DELETE FROM incidents WHERE incident_number = '2024-00000062'")
+
+    # Asserts
+    assert test_db.execute(
+        "SELECT incident_number, incident_time, incident_nature, incident_timestamp FROM incidents"
+    ).fetchall() == [
+        ("2024-00000215", "23:59", "Check Area", "2024-01-01T23:59"),
+        ("2024-00000218", "23:38", "911 Call Nature Unknown", "2024-01-01T23:38"),
+    ]
+
+
+def test_nature_counts_maintained(test_db, expected_incidents):
+    """Test nature counts follow loads, upserts and deletes and match a full recount"""
+    # Initialize
+    assignment.populate_db(test_db, expected_incidents, report_date="2024-01-01")
+    assignment.populate_db(test_db, expected_incidents, report_date="2024-01-02")
+    updated = [dict(expected_incidents[0], incident_nature="Check Area")]
+
+    # Execute
+    assignment.populate_db(test_db, updated, report_date="2024-01-01")
+    test_db.execute("DELETE FROM incidents WHERE report_date = '2024-01-02' AND incident_number = '2024-00000062'")
+
+    # Asserts
+    counts = test_db.execute(
+        "SELECT incident_nature, count FROM nature_counts JOIN natures USING (nature_id) ORDER BY incident_nature"
+    ).fetchall()
+    assert counts == [("911 Call Nature Unknown", 2), ("Check Area", 1), ("Traffic Stop", 1),
+                      ("Transfer/Interfacility", 1)]
+    assert assignment.check_nature_counts(test_db) == []
+    triggers = [row[0] for row in test_db.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")]
+    assert set(assignment.NATURE_COUNT_TRIGGERS) <= set(triggers)
+
+
+def test_check_nature_counts_mismatch(test_db, expected_incidents):
+    """Test drifted nature counts are reported and fixed by a rebuild"""
+    # Initialize
+    assignment.populate_db(test_db, expected_incidents)
+    test_db.execute("UPDATE nature_counts SET count = 5 WHERE nature_id = 1")
+
+    # Execute
+    mismatches = assignment.check_nature_counts(test_db)
+    assignment.rebuild_nature_counts(test_db)
+
+    # Asserts
+    assert mismatches == [("Traffic Stop", 5, 1)]
+    assert assignment.check_nature_counts(test_db) == []
+
+
+def test_populate_db_failure_keeps_counts(test_db, expected_incidents):
+    """Test a failed load rolls back the nature counts and keeps the count triggers"""
+    # Initialize
+    assignment.populate_db(test_db, expected_incidents)
+
+    # Execute
+    assignment.populate_db(test_db, [{"incident_time": "23:14"}])
+
+    # Asserts
+    assert test_db.execute("SELECT SUM(count) FROM nature_counts").fetchone()[0] == 3
+    triggers = [row[0] for row in test_db.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")]
+    assert set(assignment.NATURE_COUNT_TRIGGERS) <= set(triggers)
+
+
+@pytest.fixture
+def query_db(test_db, expected_incidents):
+    """Database with the sample incidents loaded for two report dates"""
+    assignment.populate_db(test_db, expected_incidents, report_date="2024-01-01")
+    assignment.populate_db(test_db, expected_incidents[:2], report_date="2024-01-02")
+    return test_db
+
+
+@pytest.mark.parametrize("filters, numbers", [
+    ({"start_date": "2024-01-02"}, ["2024-00000215", "2024-00000062"]),
+    ({"end_date": "2024-01-01", "start_time": "23:15"}, ["2024-00000062", "2024-00000218"]),
+    ({"start_time": "23:00", "end_time": "23:20"}, ["2024-00000215", "2024-00000062"] * 2),
+    ({"nature": "Traffic Stop"}, ["2024-00000215", "2024-00000215"]),
+    ({"ori": "EMSSTAT", "start_date": "2024-01-01", "end_date": "2024-01-01"}, ["2024-00000062"]),
+    ({"location": "1028 LES"}, ["2024-00000218"]),
+    ({"nature": "Assault"}, []),
+])
+def test_query_incidents(query_db, filters, numbers):
+    """Test incidents are filtered by date, time, nature, ORI and location prefix"""
+    # Execute
+    incidents = list(assignment.query_incidents(query_db, **filters))
+
+    # Asserts
+    assert [incident[2] for incident in incidents] == numbers
+
+
+@pytest.mark.parametrize("filters", [
+    {"start_date": "2024-01-01", "end_date": "2024-01-31"},
+    {"start_time": "8:00", "end_time": "9:00"},
+    {"nature": "Traffic Stop"},
+    {"nature": "Traffic Stop", "start_date": "2024-01-01"},
+    {"ori": "EMSSTAT", "end_date": "2024-01-31"},
+    {"location": "1028"},
+])
+def test_query_incidents_uses_indexes(query_db, filters):
+    """Test no supported filter makes the query scan the whole incidents table"""
+    # Initialize
+    query, params = assignment.build_incident_query(**filters)
+
+    # Execute
+    plan = [row[3] for row in query_db.execute(f"EXPLAIN QUERY PLAN {query}", params)]
+
+    # Asserts
+    assert any(step.startswith("SEARCH f USING") for step in plan)
+    assert not any(step.startswith("SCAN") for step in plan)
+
+
+def test_search_locations(query_db):
+    """Test misspelled and differently spaced searches rank the closest location first"""
+    # Execute
+    matches = assignment.search_locations(query_db, "4741 n  portr ave")
+    ranked = assignment.search_locations(query_db, "1028 branden")
+
+    # Asserts
+    assert matches == [("4741 N PORTER AVE", 2, 0.706)]
+    assert [match[0] for match in ranked] == ["2000 ANN BRANDEN BLVD", "1028 LESLIE LN"]
+    assert assignment.search_locations(query_db, "ln") == []
+
+
+def test_search_locations_incremental(query_db):
+    """Test locations of later loads and of databases created before the search index are searchable"""
+    # Initialize
+    incident = {"incident_time": "1:05", "incident_number": "2024-00000300", "incident_location": "S JAMES GARNER AVE",
+                "incident_nature": "Assault", "incident_ori": "OK0140200"}
+    assignment.populate_db(query_db, [incident], report_date="2024-01-03")
+    query_db.execute("DROP TABLE locations_fts")
+    query_db.commit()
+
+    # Execute
+    conn = assignment.create_db("test.db")
+
+    # Asserts
+    assert assignment.search_locations(conn, "james garner", 1) == [("S JAMES GARNER AVE", 1, 0.625)]
+    conn.close()
+
+
+def test_populate_db_timestamps(test_db, expected_incidents):
+    """Test incident dates are kept and combined with the incident times"""
+    # Initialize
+    incidents = [dict(expected_incidents[0], incident_time="0:05", incident_date="2023-12-31"), expected_incidents[1]]
+
+    # Execute
+    assignment.populate_db(test_db, incidents, report_date="2024-01-01")
+
+    # Asserts
+    assert test_db.execute("SELECT incident_timestamp FROM incidents ORDER BY incident_timestamp").fetchall() == [
+        ("2023-12-31T00:05",), ("2024-01-01T23:17",)
+    ]
+
+
+def test_create_db_adds_timestamps(test_db, expected_incidents):
+    """Test a database created before incident dates were kept gets the timestamp column and view"""
+    # Initialize
+    assignment.populate_db(test_db, expected_incidents, report_date="2024-01-01")
+    test_db.execute("DROP VIEW incidents")
+    test_db.execute(
+        "CREATE VIEW incidents AS SELECT f.report_date, f.incident_time, f.incident_number FROM incident_facts AS f"
+    )
+    test_db.execute("DROP INDEX idx_incident_facts_call")
+    test_db.execute("ALTER TABLE incident_facts DROP COLUMN incident_timestamp")
+    test_db.commit()
+
+    # Execute
+    conn = assignment.create_db("test.db")
+
+    # Asserts
+    assert conn.execute("SELECT COUNT(*), COUNT(incident_timestamp) FROM incidents").fetchone() == (3, 0)
+    assignment.populate_db(conn, expected_incidents[:1], report_date="2024-01-01")
+    assert conn.execute("SELECT COUNT(incident_timestamp) FROM incidents").fetchone() == (1,)
+
+
+def test_create_db_records_incident_keys(test_db, expected_incidents):
+    """Test the incidents of a database created before duplicates were detected are recorded once"""
+    # Initialize
+    assignment.populate_db(test_db, expected_incidents, report_date="2024-01-02")
+    assignment.populate_db(test_db, expected_incidents[:1], report_date="2024-01-01")
+    test_db.execute("DROP TABLE incident_keys")
+    test_db.commit()
+
+    # Execute
+    conn = assignment.create_db("test.db")
+
+    # Asserts
+    keys = conn.execute("SELECT incident_number, report_date FROM incident_keys ORDER BY incident_number").fetchall()
+    assert keys == [("2024-00000062", "2024-01-02"), ("2024-00000215", "2024-01-01"), ("2024-00000218", "2024-01-02")]
+    conn.close()
+
+
+@pytest.fixture
+def partitioned_db(tmp_path, monkeypatch, expected_incidents):
+    """Partitioned database with the sample incidents loaded for reports of three months"""
+    monkeypatch.chdir(tmp_path)
+    os.mkdir("resources")
+    conn = assignment.create_db("test.db", partitioned=True)
+    assignment.populate_db(conn, expected_incidents, report_date="2024-01-31")
+    assignment.populate_db(conn, expected_incidents[:2], report_date="2024-02-01")
+    assignment.populate_db(conn, expected_incidents[:1], report_date="2024-03-15")
+    yield conn
+    conn.close()
+
+
+def test_populate_db_partitioned(partitioned_db, expected_incidents):
+    """Test reports are loaded into the partition of their month behind the incident_facts view"""
+    # Execute
+    assignment.populate_db(partitioned_db, [dict(expected_incidents[0], incident_nature="Check Area")],
+                           report_date="2024-02-01")
+
+    # Asserts
+    assert assignment.partition_tables(partitioned_db) == [
+        "incident_facts_2024_01", "incident_facts_2024_02", "incident_facts_2024_03"
+    ]
+    assert partitioned_db.execute("SELECT COUNT(*) FROM incident_facts_2024_02").fetchone()[0] == 2
+    assert partitioned_db.execute("SELECT COUNT(*) FROM incidents").fetchone()[0] == 6
+    assert assignment.check_nature_counts(partitioned_db) == []
+    indexes = [row[0] for row in partitioned_db.execute("SELECT name FROM sqlite_master WHERE type = 'index'")]
+    assert "idx_incident_facts_2024_03_nature_date" in indexes
+
+
+def test_query_incidents_partitioned(partitioned_db):
+    """Test queries only read the partitions of the months in range and stop at the limit"""
+    # Mocks
+    queries = []
+    partitioned_db.set_trace_callback(queries.append)
+
+    # Execute
+    in_range = list(assignment.query_incidents(partitioned_db, start_date="2024-02-01", end_date="2024-03-31"))
+    limited = list(assignment.query_incidents(partitioned_db, nature="Traffic Stop", limit=2))
+
+    # Asserts
+    assert [incident[0] for incident in in_range] == ["2024-02-01", "2024-02-01", "2024-03-15"]
+    assert [incident[0] for incident in limited] == ["2024-01-31", "2024-02-01"]
+    read = [query for query in queries if query.startswith("SELECT f.report_date")]
+    assert [query.split(" AS f")[0].rsplit(" ", 1)[-1] for query in read] == [
+        "incident_facts_2024_02", "incident_facts_2024_03", "incident_facts_2024_01", "incident_facts_2024_02"
+    ]
+
+
+def test_create_db_partitions_existing(query_db):
+    """Test an existing database is split into monthly partitions with the same incidents and counts"""
+    # Initialize
+    rows = query_db.execute("SELECT * FROM incidents ORDER BY report_date, incident_number").fetchall()
+    counts = query_db.execute("SELECT * FROM nature_counts ORDER BY nature_id").fetchall()
+
+    # Execute
+    conn = assignment.create_db("test.db", partitioned=True)
+
+    # Asserts
+    assert assignment.partition_tables(conn) == ["incident_facts_2024_01"]
+    assert conn.execute("SELECT * FROM incidents ORDER BY report_date, incident_number").fetchall() == rows
+    assert conn.execute("SELECT * FROM nature_counts ORDER BY nature_id").fetchall() == counts
+    assert assignment.check_nature_counts(conn) == []
+    conn.close()
+
+
+def test_archive_partition(partitioned_db, tmp_path):
+    """Test a report month is moved into a readable archive database and out of the nature counts"""
+    # Execute
+    rows = assignment.archive_partition(partitioned_db, "2024-01", str(tmp_path / "archive.db"))
+    missing = assignment.archive_partition(partitioned_db, "2024-01", str(tmp_path / "archive.db"))
+
+    # Asserts
+    assert rows == 3
+    assert missing is None
+    assert assignment.partition_tables(partitioned_db) == ["incident_facts_2024_02", "incident_facts_2024_03"]
+    assert partitioned_db.execute("SELECT COUNT(*) FROM incidents").fetchone()[0] == 3
+    assert assignment.check_nature_counts(partitioned_db) == []
+    archive = sqlite3.connect(tmp_path / "archive.db")
+    assert archive.execute("SELECT incident_nature, incident_timestamp FROM incidents ORDER BY 2").fetchall() == [
+        ("Traffic Stop", "2024-01-01T23:14"), ("Transfer/Interfacility", "2024-01-01T23:17"),
+        ("911 Call Nature Unknown", "2024-01-01T23:38"),
+    ]
+    archive.close()
+
+
+@pytest.fixture
+def sample_reports(sample_pdf_data):
+    """The sample report published for three dates, across two months"""
+    return [
+        (f"http://testurl.com/{report_date}_daily_incident_summary.pdf", sample_pdf_data + report_date.encode())
+        for report_date in ("2024-01-30", "2024-01-31", "2024-02-01")
+    ]
+
+
+@pytest.mark.parametrize("partitioned", [False, True])
+def test_ingest_sharded(sample_reports, test_db, partitioned):
+    """Test reports loaded through merged shards match a sequential load, counts and ledger included"""
+    # Initialize
+    sequential = assignment.create_db("sequential.db", partitioned)
+    for url, data in sample_reports:
+        assignment.populate_db(sequential, assignment.extract_incidents(data), 500, assignment.get_report_date(url))
+    db = assignment.create_db("sharded.db", partitioned)
+    # a report already loaded is upserted again by the merge
+    assignment.populate_db(db, assignment.extract_incidents(sample_reports[0][1]), report_date="2024-01-30")
+
+    # Execute
+    rows = assignment.ingest_sharded(db, sample_reports, 2)
+
+    # Asserts
+    query = "SELECT * FROM incidents ORDER BY report_date, incident_number"
+    assert rows == 328 * 3
+    assert db.execute(query).fetchall() == sequential.execute(query).fetchall()
+    assert assignment.check_nature_counts(db) == []
+    assert db.execute("SELECT COUNT(*) FROM ingestions").fetchone()[0] == 3
+    assert db.execute("SELECT COUNT(*) FROM locations_fts").fetchone()[0] == db.execute(
+        "SELECT COUNT(*) FROM locations"
+    ).fetchone()[0]
+    assert not [name for name in os.listdir("resources") if name.startswith("shards-")]
+    sequential.close()
+    db.close()
+
+
+def test_ingest_sharded_dedup(sample_reports, test_db, dedup):
+    """Test incidents of merged shards are skipped when another report listed them first"""
+    # Execute
+    rows = assignment.ingest_sharded(test_db, sample_reports, 2)
+
+    # Asserts
+    assert rows == 328
+    assert test_db.execute("SELECT DISTINCT report_date FROM incidents").fetchall() == [("2024-01-30",)]
+    assert test_db.execute("SELECT COUNT(*) FROM ingestions").fetchone()[0] == 3
+    assert assignment.check_nature_counts(test_db) == []
+
+
+def test_ingest_sharded_skips_reports(sample_reports, test_db):
+    """Test reports in the ingestion ledger and unreadable local files are left out of the shards"""
+    # Initialize
+    assignment.record_ingestion(test_db, assignment.hash_report(sample_reports[0][1]), "earlier", "2024-01-30", 328)
+
+    # Execute
+    rows = assignment.ingest_sharded(test_db, [sample_reports[0], (sample_reports[1][0], "missing.pdf")], 4)
+
+    # Asserts
+    assert rows == 0
+    assert test_db.execute("SELECT COUNT(*) FROM incidents").fetchone()[0] == 0
+    assert test_db.execute("SELECT source FROM ingestions").fetchall() == [("earlier",)]
+
+
+def test_get_report_date():
+    """Test report date is taken from the daily incident summary file name"""
+    # Execute
+    report_date = assignment.get_report_date(
+        "https://www.normanok.gov/sites/default/files/documents/2024-01/2024-01-01_daily_incident_summary.pdf"
+    )
+
+    # Asserts
+    assert report_date == "2024-01-01"
+    assert assignment.get_report_date("http://testurl.com") == ""
+
+
+def test_record_ingestion(test_db):
+    """Test ingested reports are recognized by their content hash"""
+    # Initialize
+    content_hash = assignment.hash_report(b"test report")
+
+    # Execute
+    before = assignment.is_ingested(test_db, content_hash)
+    assignment.record_ingestion(test_db, content_hash, "http://testurl.com", "2024-01-01", 3)
+
+    # Asserts
+    assert before is False
+    assert assignment.is_ingested(test_db, content_hash) is True
+    assert assignment.is_ingested(test_db, assignment.hash_report(b"other report")) is False
+
+
+def test_record_checkpoint(test_db):
+    """Test done reports are completed and a new outcome of a report replaces its quarantined pages"""
+    # Execute
+    assignment.record_checkpoint(test_db, "a.pdf", "done", "hash a", "2024-01-01", 300, quarantined=[(3, "IndexError")])
+    assignment.record_checkpoint(test_db, "b.pdf", "failed", error="EOF marker not found")
+    quarantined = test_db.execute("SELECT source, page, error FROM quarantine").fetchall()
+    assignment.record_checkpoint(test_db, "a.pdf", "done", "hash a", "2024-01-01", 328)
+
+    # Asserts
+    assert quarantined == [("a.pdf", 3, "IndexError")]
+    assert assignment.completed_sources(test_db) == {"a.pdf"}
+    assert test_db.execute("SELECT COUNT(*) FROM quarantine").fetchone()[0] == 0
+    assert test_db.execute("SELECT error FROM checkpoints WHERE source = 'b.pdf'").fetchone() == (
+        "EOF marker not found",
+    )
+
+
+def test_status_no_connection(capsys):
+    """Test status without a database connection reports the error without closing it"""
+    # Execute
+    assignment.status(None)
+
+    # Asserts
+    assert "ERROR in fetching Status" in capsys.readouterr().out
 
 
 def test_status_success(mock_object):
@@ -432,10 +1258,10 @@ def test_status_success(mock_object):
 
     # Initialize
     query = """
-        SELECT incident_nature, COUNT(*) as count
-        FROM incidents
-        GROUP BY incident_nature
-        ORDER BY count DESC, incident_nature ASC;
+        SELECT n.incident_nature, c.count
+        FROM nature_counts AS c
+        LEFT JOIN natures AS n USING (nature_id)
+        ORDER BY c.count DESC, n.incident_nature ASC;
         """
 
     # Execute
@@ -458,10 +1284,10 @@ def test_status_failure(mock_object):
 
     # Initialize
     query = """
-        SELECT incident_nature, COUNT(*) as count
-        FROM incidents
-        GROUP BY incident_nature
-        ORDER BY count DESC, incident_nature ASC;
+        SELECT n.incident_nature, c.count
+        FROM nature_counts AS c
+        LEFT JOIN natures AS n USING (nature_id)
+        ORDER BY c.count DESC, n.incident_nature ASC;
         """
 
     # Execute
@@ -0,0 +1,237 @@
+import base64
+import hashlib
+import json
+import os
+import pytest
+from assignment0 import backfill
+
+
+def test_build_report_urls():
+    """Test report URLs are built for every date in the range"""
+    # Execute
+    urls = backfill.build_report_urls("2024-01-30", "2024-02-01")
+
+    # Asserts
+    assert len(urls) == 3
+    assert urls[0].endswith("/2024-01/2024-01-30_daily_incident_summary.pdf")
+    assert urls[-1].endswith("/2024-02/2024-02-01_daily_incident_summary.pdf")
+
+
+def test_fetch_reports_success(report_server, sample_pdf_data, tmp_path, monkeypatch):
+    """Test concurrent download of reports to files in input order"""
+    # Initialize
+    monkeypatch.chdir(tmp_path)
+    urls = [
+        f"{report_server.base_url}/2024-01-01_daily_incident_summary.pdf",
+        f"{report_server.base_url}/page0.txt",
+    ]
+
+    # Execute
+    results = backfill.fetch_reports(urls, max_workers=2, backoff=0)
+
+    # Asserts
+    assert [result["url"] for result in results] == urls
+    with open(results[0]["path"], "rb") as f:
+        assert f.read() == sample_pdf_data
+    with open(results[1]["path"], "rb") as f:
+        assert f.read().startswith(b"Date / Time")
+    assert results[0]["size"] == len(sample_pdf_data)
+    assert os.path.dirname(results[0]["path"]) == os.path.join("resources", "downloads")
+    assert all(result["elapsed"] > 0 for result in results)
+
+
+def test_fetch_reports_reuses_connection(report_server, tmp_path, monkeypatch):
+    """Test a single worker downloads all reports over one keep-alive connection"""
+    # Initialize
+    monkeypatch.chdir(tmp_path)
+    urls = [f"{report_server.base_url}/{name}" for name in ("page0.txt", "page6.txt", "last_page.txt")]
+
+    # Execute
+    results = backfill.fetch_reports(urls, max_workers=1, backoff=0)
+
+    # Asserts
+    assert all(result["path"] is not None for result in results)
+    assert len({client for _, client in report_server.requests}) == 1
+
+
+def test_fetch_reports_retries(report_server, tmp_path, monkeypatch):
+    """Test failed downloads are retried until they succeed"""
+    # Mocks
+    monkeypatch.chdir(tmp_path)
+    report_server.failures["/page0.txt"] = 2
+
+    # Execute
+    results = backfill.fetch_reports([f"{report_server.base_url}/page0.txt"], retries=3, backoff=0)
+
+    # Asserts
+    assert results[0]["attempts"] == 3
+    assert results[0]["path"] is not None
+
+
+def test_fetch_reports_failure(report_server, tmp_path, monkeypatch):
+    """Test a missing report is not retried and returns no file"""
+    # Mocks
+    monkeypatch.chdir(tmp_path)
+
+    # Execute
+    results = backfill.fetch_reports([f"{report_server.base_url}/missing.pdf"], backoff=0)
+
+    # Asserts
+    assert results[0]["status"] == 404
+    assert results[0]["attempts"] == 1
+    assert results[0]["path"] is None
+
+
+def test_download_report_parallel_ranges(report_server, sample_pdf_data, tmp_path):
+    """Test a report is downloaded in parallel byte ranges into one verified file"""
+    # Initialize
+    url = f"{report_server.base_url}/2024-01-01_daily_incident_summary.pdf"
+    path = str(tmp_path / "report.pdf")
+
+    # Execute
+    result = backfill.download_report(url, path, parts=4, part_size=32 * 1024, chunk_size=8 * 1024)
+
+    # Asserts
+    with open(path, "rb") as f:
+        assert f.read() == sample_pdf_data
+    assert result["status"] == 206
+    assert result["parts"] == 5
+    assert result["size"] == len(sample_pdf_data)
+    assert result["sha256"] == hashlib.sha256(sample_pdf_data).hexdigest()
+    assert len(report_server.ranges) == 5
+    assert os.listdir(tmp_path) == ["report.pdf"]
+
+
+def test_download_report_whole_response(report_server, tmp_path):
+    """Test a server ignoring the Range header is streamed to the file in chunks"""
+    # Initialize
+    report_server.pages["/report"] = b"report " * 1000
+    path = str(tmp_path / "report.pdf")
+
+    # Execute
+    result = backfill.download_report(f"{report_server.base_url}/report", path, chunk_size=100)
+
+    # Asserts
+    with open(path, "rb") as f:
+        assert f.read() == b"report " * 1000
+    assert result["status"] == 200
+    assert result["parts"] == 1
+
+
+def test_download_report_resumes(report_server, sample_pdf_data, tmp_path):
+    """Test an interrupted download only requests the ranges that were not completed"""
+    # Mocks
+    report_server.range_failures = 2
+
+    # Initialize
+    url = f"{report_server.base_url}/2024-01-01_daily_incident_summary.pdf"
+    path = str(tmp_path / "report.pdf")
+    with pytest.raises(OSError):
+        backfill.download_report(url, path, parts=4, part_size=32 * 1024, retries=0)
+    requested = len(report_server.ranges)
+
+    # Execute
+    result = backfill.download_report(url, path, parts=4, part_size=32 * 1024, retries=0)
+
+    # Asserts
+    with open(path, "rb") as f:
+        assert f.read() == sample_pdf_data
+    assert result["sha256"] == hashlib.sha256(sample_pdf_data).hexdigest()
+    assert requested == 5
+    assert len(report_server.ranges) == requested + 2
+    assert not os.path.exists(f"{path}.part.json")
+
+
+def test_download_report_completed_ranges(mocker, report_server, sample_pdf_data, tmp_path):
+    """Test a download stopped after its last range is verified and moved without any request"""
+    # Mocks
+    replace = os.replace
+    mocker.patch(
+        "assignment0.backfill.os.replace",
+        side_effect=lambda src, dst: replace(src, dst) if dst.endswith(".json") else [][1],
+    )
+
+    # Initialize
+    url = f"{report_server.base_url}/2024-01-01_daily_incident_summary.pdf"
+    path = str(tmp_path / "report.pdf")
+    with pytest.raises(IndexError):
+        backfill.download_report(url, path, parts=4, part_size=32 * 1024)
+    requested = len(report_server.requests)
+    mocker.stopall()
+
+    # Execute
+    result = backfill.download_report(url, path, parts=4, part_size=32 * 1024)
+
+    # Asserts
+    with open(path, "rb") as f:
+        assert f.read() == sample_pdf_data
+    assert result["sha256"] == hashlib.sha256(sample_pdf_data).hexdigest()
+    assert len(report_server.requests) == requested
+    assert not os.path.exists(f"{path}.part.json")
+
+
+def test_download_report_missing_range(mocker, report_server, tmp_path):
+    """Test a download whose ranges do not cover the report is discarded instead of moved"""
+    # Mocks
+    replace = os.replace
+    mocker.patch(
+        "assignment0.backfill.os.replace",
+        side_effect=lambda src, dst: replace(src, dst) if dst.endswith(".json") else [][1],
+    )
+
+    # Initialize
+    url = f"{report_server.base_url}/2024-01-01_daily_incident_summary.pdf"
+    path = str(tmp_path / "report.pdf")
+    with pytest.raises(IndexError):
+        backfill.download_report(url, path, parts=4, part_size=32 * 1024)
+    mocker.stopall()
+    with open(f"{path}.part.json") as f:
+        state = json.load(f)
+    # drop a middle range, as if its bytes were never written to the preallocated file
+    del state["parts"][2]
+    with open(f"{path}.part.json", "w") as f:
+        json.dump(state, f)
+
+    # Execute
+    with pytest.raises(OSError, match="were not downloaded"):
+        backfill.download_report(url, path, parts=4, part_size=32 * 1024)
+
+    # Asserts
+    assert os.listdir(tmp_path) == []
+
+
+# a conditional request is answered with the whole report, any other one with byte ranges
+@pytest.mark.parametrize("headers", [None, {"If-Modified-Since": "Mon, 01 Jan 2001 00:00:00 GMT"}])
+def test_download_report_server_digest(report_server, sample_pdf_data, tmp_path, headers):
+    """Test ranged and whole report downloads are verified against the digest announced by the server"""
+    # Initialize
+    name = "/2024-01-01_daily_incident_summary.pdf"
+    path = str(tmp_path / "report.pdf")
+    digest = base64.b64encode(hashlib.sha256(sample_pdf_data).digest()).decode()
+    report_server.digests[name] = f"sha-256=:{digest}:"
+    url = f"{report_server.base_url}{name}"
+    result = backfill.download_report(url, path, parts=4, headers=headers, part_size=32 * 1024)
+    os.remove(path)
+    report_server.digests[name] = f"sha-256=:{base64.b64encode(bytes(32)).decode()}:"
+
+    # Execute
+    with pytest.raises(OSError, match="does not match"):
+        backfill.download_report(url, path, parts=4, headers=headers, part_size=32 * 1024)
+
+    # Asserts
+    assert result["status"] == (206 if headers is None else 200)
+    assert result["sha256"] == hashlib.sha256(sample_pdf_data).hexdigest()
+    assert os.listdir(tmp_path) == []
+
+
+def test_download_report_hash_mismatch(report_server, tmp_path):
+    """Test a download not matching the expected digest is discarded"""
+    # Initialize
+    path = str(tmp_path / "report.pdf")
+
+    # Execute
+    with pytest.raises(OSError):
+        backfill.download_report(f"{report_server.base_url}/page0.txt", path, sha256="0" * 64)
+
+    # Asserts
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,61 @@
+import pytest
+from assignment0 import assignment
+from benchmarks import run, synthetic
+
+
+def test_generate_summary_pdf(mocker):
+    """Test synthetic reports parse back to the generated incidents"""
+    # Mocks
+    mocker.patch("assignment0.assignment.create_json")
+
+    # Execute
+    incident_data, incident_lines = synthetic.generate_summary_pdf(scale=2)
+    incidents = assignment.extract_incidents(incident_data)
+
+    # Asserts
+    assert len(assignment.open_pdf(assignment.io.BytesIO(incident_data)).pages) == 2 * synthetic.BASE_PAGES
+    assert len(incidents) == len(incident_lines)
+    assert [incident["incident_number"] for incident in incidents] == [line.split()[2] for line in incident_lines]
+
+
+def test_generate_incidents_deterministic():
+    """Test the same seed generates the same incidents"""
+    # Asserts
+    assert synthetic.generate_incidents(50, seed=1) == synthetic.generate_incidents(50, seed=1)
+    assert synthetic.generate_incidents(50, seed=1) != synthetic.generate_incidents(50, seed=2)
+
+
+def test_run_scale(mocker):
+    """Test every stage of the benchmark runs on the sample scale"""
+    # Mocks
+    mocker.patch("assignment0.assignment.create_json")
+
+    # Execute
+    metrics = run.run_scale(1)
+
+    # Asserts
+    assert metrics["records"] == metrics["expected_records"] == metrics["rows"]
+    assert set(run.METRICS) <= set(metrics)
+
+
+@pytest.mark.parametrize(
+    "metric, value, regressed",
+    [
+        ("populate_rows_per_sec", 70.0, True),
+        ("populate_rows_per_sec", 90.0, False),
+        ("status_ms", 130.0, True),
+        ("status_ms", 50.0, False),
+    ],
+)
+def test_compare(metric, value, regressed):
+    """Test metrics worse than the baseline beyond the tolerance are flagged"""
+    # Initialize
+    baseline = {"1x": {"populate_rows_per_sec": 100.0, "status_ms": 100.0}}
+    results = {"1x": {name: 100.0 for name in run.METRICS}}
+    results["1x"][metric] = value
+
+    # Execute
+    regressions = run.compare(results, baseline, tolerance=0.2)
+
+    # Asserts
+    assert bool(regressions) is regressed
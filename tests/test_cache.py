@@ -0,0 +1,190 @@
+import os
+import pytest
+from assignment0 import assignment, backfill
+from assignment0.cache import DownloadCache, PAGE_CACHE, PageCache
+
+
+@pytest.fixture
+def download_cache(tmp_path):
+    """Empty download cache under a temporary directory"""
+    return DownloadCache(str(tmp_path / "cache"))
+
+
+@pytest.fixture
+def page_cache(tmp_path):
+    """Parsed page cache shared by the pipeline, enabled under a temporary directory"""
+    PAGE_CACHE.configure(str(tmp_path / "cache" / "pages.db"))
+    yield PAGE_CACHE
+    PAGE_CACHE.configure(None)
+
+
+def test_put_and_get(download_cache):
+    """Test cached reports are stored content-addressed and served by URL"""
+    # Execute
+    digest = download_cache.put("http://testurl.com/a", b"report", etag='"abc"')
+    download_cache.put("http://testurl.com/b", b"report")
+
+    # Asserts
+    assert download_cache.get("http://testurl.com/a") == b"report"
+    assert download_cache.get("http://testurl.com/missing") is None
+    assert os.listdir(os.path.join(download_cache.cache_dir, "objects", digest[:2])) == [digest]
+    assert download_cache.conditional_headers("http://testurl.com/a") == {"If-None-Match": '"abc"'}
+
+
+def test_index_persisted(download_cache):
+    """Test a new cache object reads the entries of an earlier one"""
+    # Initialize
+    download_cache.put("http://testurl.com/a", b"report", last_modified="Mon, 01 Jan 2024 00:00:00 GMT")
+
+    # Execute
+    reopened = DownloadCache(download_cache.cache_dir)
+
+    # Asserts
+    assert reopened.get("http://testurl.com/a") == b"report"
+    assert reopened.conditional_headers("http://testurl.com/a") == {
+        "If-Modified-Since": "Mon, 01 Jan 2024 00:00:00 GMT"
+    }
+
+
+def test_lru_eviction(tmp_path):
+    """Test least recently used reports are evicted over the size limit"""
+    # Initialize
+    download_cache = DownloadCache(str(tmp_path / "cache"), max_bytes=10)
+    download_cache.put("http://testurl.com/a", b"aaaa")
+    download_cache.put("http://testurl.com/b", b"bbbb")
+    download_cache.get("http://testurl.com/a")
+
+    # Execute
+    download_cache.put("http://testurl.com/c", b"cccc")
+
+    # Asserts
+    assert download_cache.get("http://testurl.com/b") is None
+    assert download_cache.get("http://testurl.com/a") == b"aaaa"
+    assert download_cache.get("http://testurl.com/c") == b"cccc"
+
+
+def test_fetch_incidents_conditional(report_server, download_cache):
+    """Test an unchanged report is served from the cache after a 304 response"""
+    # Initialize
+    url = f"{report_server.base_url}/page0.txt"
+    data = assignment.fetch_incidents(url, download_cache)
+
+    # Execute
+    cached_data = assignment.fetch_incidents(url, download_cache)
+
+    # Asserts
+    assert cached_data[:] == data[:]
+    assert download_cache.conditional_headers(url)["If-Modified-Since"]
+    assert len(report_server.requests) == 2
+
+
+def test_fetch_incidents_offline(report_server, download_cache):
+    """Test offline mode serves cached reports without any request"""
+    # Initialize
+    url = f"{report_server.base_url}/page0.txt"
+    data = assignment.fetch_incidents(url, download_cache)
+
+    # Execute
+    offline_data = assignment.fetch_incidents(url, download_cache, offline=True)
+    missing_data = assignment.fetch_incidents(f"{report_server.base_url}/page6.txt", download_cache, offline=True)
+
+    # Asserts
+    assert offline_data[:] == data[:]
+    assert missing_data is None
+    assert len(report_server.requests) == 1
+
+
+def test_fetch_reports_conditional(report_server, download_cache):
+    """Test concurrent downloads reuse cached reports on 304 responses"""
+    # Initialize
+    urls = [f"{report_server.base_url}/page0.txt", f"{report_server.base_url}/page6.txt"]
+    backfill.fetch_reports(urls, backoff=0, cache=download_cache)
+
+    # Execute
+    results = backfill.fetch_reports(urls, backoff=0, cache=download_cache)
+    offline_results = backfill.fetch_reports(urls, cache=download_cache, offline=True)
+
+    # Asserts
+    assert [result["status"] for result in results] == [304, 304]
+    assert all(result["path"] and result["size"] for result in results)
+    assert [result["path"] for result in offline_results] == [result["path"] for result in results]
+
+
+def test_page_cache_put_and_get(tmp_path):
+    """Test parsed pages are served after a flush, also by a new cache object, and hits and misses are counted"""
+    # Initialize
+    path = str(tmp_path / "pages.db")
+    cache = PageCache(path)
+    rows = [["23:14", "2024-00000215", "4741 N PORTER AVE", "Traffic Stop", "OK0140200"]]
+
+    # Execute
+    missing = cache.get("a")
+    cache.put("a", rows)
+    pending = cache.get("a")
+    cache.close()
+    reopened = PageCache(path)
+
+    # Asserts
+    assert missing is None
+    assert pending == rows
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert reopened.get("a") == rows
+    assert PageCache().get("a") is None
+
+
+def test_page_cache_lru_eviction(tmp_path):
+    """Test least recently used pages are evicted over the size limit"""
+    # Initialize
+    cache = PageCache(str(tmp_path / "pages.db"), max_bytes=100)
+    cache.put("a", [["a" * 30]])
+    cache.flush()
+    cache.put("b", [["b" * 30]])
+    cache.flush()
+    cache.get("a")
+    cache.flush()
+
+    # Execute
+    cache.put("c", [["c" * 30]])
+    cache.flush()
+
+    # Asserts
+    assert cache.get("a") is not None
+    assert cache.get("b") is None
+    assert cache.get("c") is not None
+
+
+def test_extract_incidents_page_cache(mocker, page_cache, sample_pdf_data):
+    """Test unchanged pages are served from the page cache without extracting their text"""
+    # Mocks
+    mocker.patch("assignment0.assignment.create_json")
+    incidents = assignment.extract_incidents(sample_pdf_data)
+    read_func = mocker.spy(assignment, "read_page_text")
+
+    # Execute
+    cached = assignment.extract_incidents(sample_pdf_data)
+    parallel = assignment.extract_incidents(sample_pdf_data, workers=2)
+
+    # Asserts
+    assert cached == parallel == incidents
+    read_func.assert_not_called()
+    assert (page_cache.hits, page_cache.misses) == (40, 20)
+
+
+def test_page_cache_key_versions(mocker, sample_pdf_data):
+    """Test the page cache key changes with the parser version, vocabulary and page position"""
+    # Initialize
+    page = assignment.open_pdf(assignment.pdf_stream(sample_pdf_data)).pages[3]
+    key = assignment.page_cache_key(page, 3, 20)
+    again = assignment.page_cache_key(page, 3, 20)
+    last_page_key = assignment.page_cache_key(page, 3, 4)
+
+    # Execute
+    mocker.patch("assignment0.assignment.PARSER_VERSION", assignment.PARSER_VERSION + 1)
+    version_key = assignment.page_cache_key(page, 3, 20)
+    mocker.patch("assignment0.assignment.NATURE_VOCABULARY.fingerprint", return_value="other")
+    vocabulary_key = assignment.page_cache_key(page, 3, 20)
+
+    # Asserts
+    assert key == again
+    assert key != last_page_key
+    assert len({key, version_key, vocabulary_key}) == 3
@@ -0,0 +1,72 @@
+import os
+import pytest
+from assignment0 import assignment
+from assignment0.dedup import IncidentKeyFilter
+
+
+@pytest.fixture
+def key_db(tmp_path, monkeypatch):
+    """Database with the incident keys of two reports"""
+    monkeypatch.chdir(tmp_path)
+    os.mkdir("resources")
+    conn = assignment.create_db("test.db")
+    conn.executemany(
+        "INSERT INTO incident_keys (incident_number, ori_id, report_date) VALUES (?, ?, ?)",
+        [("2024-00000871", 1, "2024-01-17"), ("2024-00001103", 2, "2024-01-17"), ("2024-00000872", 1, "2024-01-18")],
+    )
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def key_filter():
+    """Enabled duplicate detection"""
+    key_filter = IncidentKeyFilter()
+    key_filter.enabled = True
+    return key_filter
+
+
+def test_find_duplicates(key_db, key_filter):
+    """Test only keys first loaded from another report are duplicates and new numbers are not probed"""
+    # Initialize
+    keys = [
+        ("2024-00000871", 1), ("2024-00000871", 2), ("2024-00000872", 1), ("2024-00000870", 1),
+        ("2024-00009999", 1), ("2024-00000001", 3), (None, 1),
+    ]
+
+    # Execute
+    duplicates = key_filter.find_duplicates(key_db, "2024-01-18", keys)
+
+    # Asserts
+    assert duplicates == {("2024-00000871", 1)}
+    assert key_filter.probes == 4
+    assert key_filter.duplicates == 1
+
+
+def test_find_duplicates_disabled(key_db):
+    """Test a disabled filter finds no duplicates"""
+    # Initialize
+    key_filter = IncidentKeyFilter()
+
+    # Execute
+    duplicates = key_filter.find_duplicates(key_db, "2024-01-18", [("2024-00000871", 1)])
+
+    # Asserts
+    assert duplicates == set()
+    assert key_filter.probes == 0
+
+
+def test_register(key_db, key_filter):
+    """Test registered keys keep the report that recorded them first and raise the highest numbers"""
+    # Initialize
+    key_filter.find_duplicates(key_db, "2024-01-19", [("2024-00000900", 1)])
+
+    # Execute
+    key_filter.register(key_db, "2024-01-19", [("2024-00000900", 1), ("2024-00000871", 1), (None, 1)])
+    duplicates = key_filter.find_duplicates(key_db, "2024-01-20", [("2024-00000900", 1)])
+
+    # Asserts
+    assert duplicates == {("2024-00000900", 1)}
+    report_dates = key_db.execute("SELECT report_date FROM incident_keys WHERE incident_number = '2024-00000871'")
+    assert report_dates.fetchall() == [("2024-01-17",)]
+    assert key_db.execute("SELECT COUNT(*) FROM incident_keys").fetchone()[0] == 4
@@ -0,0 +1,102 @@
+import json
+import pytest
+from assignment0 import assignment
+from assignment0.instrumentation import Instrumentation, METRICS
+
+
+@pytest.fixture
+def metrics():
+    """Enabled instrumentation"""
+    return Instrumentation(enabled=True)
+
+
+@pytest.fixture
+def enabled_metrics():
+    """Shared pipeline instrumentation enabled for one test"""
+    METRICS.enabled = True
+    METRICS.reset()
+    yield METRICS
+    METRICS.enabled = False
+    METRICS.reset()
+
+
+def test_stage_disabled():
+    """Test disabled instrumentation records nothing"""
+    # Initialize
+    metrics = Instrumentation()
+
+    # Execute
+    with metrics.stage("extract", page=0):
+        pass
+    metrics.count("extract", pages=1)
+
+    # Asserts
+    assert metrics.summary()["stages"] == {}
+
+
+def test_stage_accumulates(metrics):
+    """Test passes through a stage add up their times and counters"""
+    # Execute
+    for page_num in range(3):
+        with metrics.stage("extract", page=page_num):
+            pass
+        metrics.count("extract", pages=1, bytes=10)
+
+    # Asserts
+    stats = metrics.summary()["stages"]["extract"]
+    assert stats["calls"] == 3
+    assert stats["pages"] == 3
+    assert stats["bytes"] == 30
+    assert stats["wall_seconds"] >= 0
+    assert sorted(stats["page_seconds"]) == ["0", "1", "2"]
+
+
+def test_stage_page_seconds_add_up(metrics, mocker):
+    """Test the times of the same page of several reports add up"""
+    # Mocks
+    mocker.patch("assignment0.instrumentation.time.perf_counter", side_effect=[0.0, 1.0, 5.0, 7.0, 8.0])
+
+    # Execute
+    for _ in range(2):
+        with metrics.stage("extract", page=0):
+            pass
+
+    # Asserts
+    assert metrics.summary()["stages"]["extract"]["page_seconds"] == {"0": 3.0}
+
+
+def test_write_json_and_prometheus(metrics, tmp_path):
+    """Test the run summary is written as JSON and Prometheus textfile"""
+    # Initialize
+    with metrics.stage("load"):
+        pass
+    metrics.count("load", rows=5)
+    metrics.gauge("watch_publication_latency_seconds", 1.5)
+
+    # Execute
+    metrics.write_json(str(tmp_path / "metrics.json"))
+    metrics.write_prometheus(str(tmp_path / "metrics.prom"))
+
+    # Asserts
+    summary = json.loads((tmp_path / "metrics.json").read_text())
+    assert summary["stages"]["load"]["rows"] == 5
+    prom = (tmp_path / "metrics.prom").read_text()
+    assert 'normanpd_stage_rows{stage="load"} 5' in prom
+    assert "# TYPE normanpd_stage_wall_seconds gauge" in prom
+    assert summary["gauges"] == {"watch_publication_latency_seconds": 1.5}
+    assert "normanpd_watch_publication_latency_seconds 1.5" in prom
+
+
+def test_pipeline_stages(mocker, enabled_metrics, sample_pdf_data):
+    """Test extraction records pages, per-page timings and parsed records"""
+    # Mocks
+    mocker.patch("assignment0.assignment.create_json")
+
+    # Execute
+    incidents = assignment.extract_incidents(sample_pdf_data)
+
+    # Asserts
+    stages = enabled_metrics.summary()["stages"]
+    assert stages["extract"]["pages"] == 20
+    assert len(stages["extract"]["page_seconds"]) == 20
+    assert stages["parse"]["records"] == len(incidents)
@@ -1,5 +1,13 @@
+import os
+import sqlite3
+import subprocess
+import sys
 import pytest
-from assignment0.main import main
+from assignment0 import assignment, backfill
+from assignment0.main import (
+    main, archive_main, backfill_main, check_counts_main, ingest_report, query_main, records_main, run, search_main,
+    status_main
+)
 
 
 @pytest.fixture
@@ -10,9 +18,10 @@ def mock_object(mocker):
 def test_main(mocker, mock_object):
     # Mocks
     delete_func = mocker.patch("assignment0.assignment.delete_existing_db", return_value=True)
-    incident_data = mocker.patch("assignment0.assignment.fetch_incidents", return_vale=mock_object)
-    incidents = mocker.patch("assignment0.assignment.extract_incidents", return_value=mock_object)
+    incident_data = mocker.patch("assignment0.assignment.fetch_incidents", return_value=b"report")
+    incidents = mocker.patch("assignment0.assignment.extract_incidents", return_value=[mock_object])
     db = mocker.patch("assignment0.assignment.create_db", return_value=mock_object)
+    seed_func = mocker.patch("assignment0.assignment.seed_vocabulary")
     mock_populate_func = mocker.patch("assignment0.assignment.populate_db", return_value=True)
     mock_print_rec_func = mocker.patch("assignment0.assignment.print_record", return_value=True)
     mock_status_func = mocker.patch("assignment0.assignment.status", return_value=True)
@@ -26,5 +35,470 @@ def test_main(mocker, mock_object):
     incident_data.assert_called_once()
     incidents.assert_called_once()
     db.assert_called_once()
+    seed_func.assert_called_once_with(mock_object)
     mock_populate_func.assert_called_once()
     mock_status_func.assert_called_once()
+
+
+def test_backfill_main(mocker, mock_object):
+    # Mocks
+    delete_func = mocker.patch("assignment0.assignment.delete_existing_db", return_value=True)
+    fetch_func = mocker.patch(
+        "assignment0.backfill.fetch_reports",
+        return_value=[
+            {"url": "http://testurl.com/1", "path": "downloads/1.pdf"},
+            {"url": "http://testurl.com/2", "path": None},
+            {"url": "http://testurl.com/3", "path": "downloads/3.pdf"},
+        ],
+    )
+    map_func = mocker.patch("assignment0.assignment.map_report", return_value=mock_object)
+    mocker.patch("assignment0.assignment.hash_report", return_value="hash")
+    extract_func = mocker.patch("assignment0.assignment.extract_incidents", return_value=[mock_object])
+    db = mocker.patch("assignment0.assignment.create_db", return_value=mock_object)
+    seed_func = mocker.patch("assignment0.assignment.seed_vocabulary")
+    mock_populate_func = mocker.patch("assignment0.assignment.populate_db", return_value=True)
+    mock_status_func = mocker.patch("assignment0.assignment.status", return_value=True)
+
+    # Execute
+    urls = ["http://testurl.com/1", "http://testurl.com/2", "http://testurl.com/3"]
+    backfill_main(urls)
+
+    # Asserts
+    delete_func.assert_called_once()
+    fetch_func.assert_called_once_with(urls, max_workers=4, cache=None, offline=False, parts=4)
+    assert [call.args for call in map_func.call_args_list] == [("downloads/1.pdf",), ("downloads/3.pdf",)]
+    assert extract_func.call_count == 2
+    db.assert_called_once()
+    seed_func.assert_called_once_with(mock_object)
+    assert mock_populate_func.call_count == 2
+    mock_populate_func.assert_called_with(mock_object, [mock_object], 500, "")
+    mock_status_func.assert_called_once()
+
+
+def test_main_append(mocker, mock_object):
+    # Mocks
+    delete_func = mocker.patch("assignment0.assignment.delete_existing_db", return_value=True)
+    mocker.patch("assignment0.assignment.fetch_incidents", return_value=b"report")
+    mocker.patch("assignment0.assignment.create_db", return_value=mock_object)
+    mocker.patch("assignment0.assignment.seed_vocabulary")
+    ingest_func = mocker.patch("assignment0.main.ingest_report")
+    mocker.patch("assignment0.assignment.status", return_value=True)
+
+    # Execute
+    main("http://testurl.com", append=True)
+
+    # Asserts
+    delete_func.assert_not_called()
+    ingest_func.assert_called_once_with(mock_object, "http://testurl.com", b"report", 1, 500, True, False)
+
+
+def test_ingest_report_skips_ingested(mocker, mock_object):
+    # Mocks
+    mocker.patch("assignment0.assignment.is_ingested", return_value=True)
+    extract_func = mocker.patch("assignment0.assignment.extract_incidents")
+    mock_populate_func = mocker.patch("assignment0.assignment.populate_db")
+
+    # Execute
+    ingest_report(mock_object, "http://testurl.com", b"report", append=True)
+
+    # Asserts
+    extract_func.assert_not_called()
+    mock_populate_func.assert_not_called()
+
+
+def test_ingest_report_records_ingestion(mocker, mock_object):
+    # Mocks
+    mocker.patch("assignment0.assignment.extract_incidents", return_value=[mock_object, mock_object])
+    mock_populate_func = mocker.patch("assignment0.assignment.populate_db", return_value=2)
+    record_func = mocker.patch("assignment0.assignment.record_ingestion")
+
+    # Execute
+    url = "http://testurl.com/2024-01-01_daily_incident_summary.pdf"
+    ingest_report(mock_object, url, b"report")
+
+    # Asserts
+    mock_populate_func.assert_called_once_with(mock_object, [mock_object, mock_object], 500, "2024-01-01")
+    record_func.assert_called_once_with(
+        mock_object, assignment.hash_report(b"report"), url, "2024-01-01", 2
+    )
+
+
+def test_ingest_report_stream(mocker, mock_object):
+    # Mocks
+    extract_func = mocker.patch("assignment0.assignment.extract_incidents")
+    iter_func = mocker.patch("assignment0.assignment.iter_incidents", return_value=iter([mock_object]))
+    stream_func = mocker.patch("assignment0.assignment.stream_json", return_value=mock_object)
+    mock_populate_func = mocker.patch("assignment0.assignment.populate_db", return_value=None)
+    record_func = mocker.patch("assignment0.assignment.record_ingestion")
+
+    # Execute
+    ingest_report(mock_object, "http://testurl.com", b"report", stream=True)
+
+    # Asserts
+    extract_func.assert_not_called()
+    iter_func.assert_called_once_with(b"report")
+    stream_func.assert_called_once_with(iter_func.return_value)
+    mock_populate_func.assert_called_once_with(mock_object, mock_object, 500, "")
+    record_func.assert_not_called()
+
+
+def test_main_local_file(mocker, mock_object):
+    # Mocks
+    mocker.patch("assignment0.assignment.delete_existing_db", return_value=True)
+    fetch_func = mocker.patch("assignment0.assignment.fetch_incidents")
+    map_func = mocker.patch("assignment0.assignment.map_report", return_value=b"report")
+    mocker.patch("assignment0.assignment.create_db", return_value=mock_object)
+    mocker.patch("assignment0.assignment.seed_vocabulary")
+    ingest_func = mocker.patch("assignment0.main.ingest_report")
+    mocker.patch("assignment0.assignment.status", return_value=True)
+
+    # Execute
+    main("tests/data/2024-01-01_daily_incident_summary.pdf")
+
+    # Asserts
+    fetch_func.assert_not_called()
+    map_func.assert_called_once_with("tests/data/2024-01-01_daily_incident_summary.pdf")
+    ingest_func.assert_called_once()
+
+
+def test_backfill_main_mixed_sources(mocker, mock_object):
+    # Mocks
+    mocker.patch("assignment0.assignment.delete_existing_db", return_value=True)
+    fetch_func = mocker.patch(
+        "assignment0.backfill.fetch_reports",
+        return_value=[{"url": "http://testurl.com/1", "path": "downloads/1.pdf"}],
+    )
+    mocker.patch("assignment0.assignment.map_report", side_effect=[mock_object, mocker.Mock()])
+    mocker.patch("assignment0.assignment.create_db", return_value=mock_object)
+    mocker.patch("assignment0.assignment.seed_vocabulary")
+    ingest_func = mocker.patch("assignment0.main.ingest_report")
+    mocker.patch("assignment0.assignment.status", return_value=True)
+
+    # Execute
+    backfill_main(["reports/a.pdf", "http://testurl.com/1"])
+
+    # Asserts
+    fetch_func.assert_called_once_with(["http://testurl.com/1"], max_workers=4, cache=None, offline=False, parts=4)
+    assert [call.args[1] for call in ingest_func.call_args_list] == ["reports/a.pdf", "http://testurl.com/1"]
+    assert ingest_func.call_args_list[0].args[2] is mock_object
+
+
+def test_backfill_main_sharded(mocker, mock_object):
+    # Mocks
+    mocker.patch("assignment0.assignment.delete_existing_db", return_value=True)
+    mocker.patch(
+        "assignment0.backfill.fetch_reports",
+        return_value=[
+            {"url": "http://testurl.com/1", "path": "downloads/1.pdf"}, {"url": "http://testurl.com/2", "path": None}
+        ],
+    )
+    mocker.patch("assignment0.assignment.create_db", return_value=mock_object)
+    mocker.patch("assignment0.assignment.seed_vocabulary")
+    sharded_func = mocker.patch("assignment0.assignment.ingest_sharded", return_value=10)
+    ingest_func = mocker.patch("assignment0.main.ingest_report")
+    mocker.patch("assignment0.assignment.status", return_value=True)
+
+    # Execute
+    backfill_main(["reports/a.pdf", "http://testurl.com/1", "http://testurl.com/2"], shards=2)
+
+    # Asserts
+    sharded_func.assert_called_once_with(
+        mock_object, [("reports/a.pdf", "reports/a.pdf"), ("http://testurl.com/1", "downloads/1.pdf")], 2, 500
+    )
+    ingest_func.assert_not_called()
+
+
+def test_backfill_main_windows(mocker, report_server, tmp_path, monkeypatch):
+    """Test reports are downloaded to files and loaded a window at a time, and removed without a cache"""
+    # Mocks
+    mocker.patch("assignment0.assignment.status")
+    mocker.patch("assignment0.backfill.WINDOW_SIZE", 1)
+    fetch_func = mocker.spy(backfill, "fetch_reports")
+    monkeypatch.chdir(tmp_path)
+    os.mkdir("resources")
+    urls = [f"{report_server.base_url}/2024-01-01_daily_incident_summary.pdf", f"{report_server.base_url}/missing.pdf"]
+
+    # Execute
+    backfill_main(urls)
+
+    # Asserts
+    assert [call.args[0] for call in fetch_func.call_args_list] == [[urls[0]], [urls[1]]]
+    assert os.listdir("resources/downloads") == []
+    conn = sqlite3.connect("resources/normanpd.db")
+    assert conn.execute("SELECT COUNT(*) FROM incidents").fetchone()[0] == 328
+    assert conn.execute("SELECT source, status FROM checkpoints ORDER BY source").fetchall() == [
+        (urls[0], "done"), (urls[1], "failed")
+    ]
+    conn.close()
+
+
+def test_backfill_main_resume(mocker, tmp_path, monkeypatch, sample_pdf_data):
+    """Test a resumed backfill keeps the database, skips the completed reports and retries the failed one"""
+    # Mocks
+    mocker.patch("assignment0.assignment.status")
+    monkeypatch.chdir(tmp_path)
+    os.mkdir("resources")
+
+    # Initialize
+    paths = []
+    for i, report_date in enumerate(("2024-01-01", "2024-01-02", "2024-01-03")):
+        path = tmp_path / f"{report_date}_daily_incident_summary.pdf"
+        path.write_bytes(b"not a pdf" if i == 1 else sample_pdf_data + bytes([i]))
+        paths.append(str(path))
+    backfill_main(paths)
+    failed = sqlite3.connect("resources/normanpd.db").execute(
+        "SELECT source FROM checkpoints WHERE status = 'failed'"
+    ).fetchall()
+    (tmp_path / "2024-01-02_daily_incident_summary.pdf").write_bytes(sample_pdf_data + bytes([1]))
+    map_func = mocker.spy(assignment, "map_report")
+
+    # Execute
+    backfill_main(paths, resume=True)
+
+    # Asserts
+    assert failed == [(paths[1],)]
+    map_func.assert_called_once_with(paths[1])
+    conn = sqlite3.connect("resources/normanpd.db")
+    assert conn.execute("SELECT COUNT(*) FROM incidents").fetchone()[0] == 3 * 328
+    assert conn.execute("SELECT COUNT(*) FROM checkpoints WHERE status = 'done'").fetchone()[0] == 3
+    conn.close()
+
+
+def test_main_undated_report_name(mocker, tmp_path, monkeypatch, sample_pdf_data):
+    """Test a report whose file name has no date is dated by its incidents and found by date range queries"""
+    # Mocks
+    mocker.patch("assignment0.assignment.status")
+    monkeypatch.chdir(tmp_path)
+    os.mkdir("resources")
+
+    # Initialize
+    (tmp_path / "report.pdf").write_bytes(sample_pdf_data)
+
+    # Execute
+    main("report.pdf", partitioned=True)
+
+    # Asserts
+    conn = sqlite3.connect("resources/normanpd.db")
+    assert assignment.partition_tables(conn) == ["incident_facts_2024_01"]
+    incidents = list(assignment.query_incidents(conn, start_date="2024-01-01", end_date="2024-01-31"))
+    assert len(incidents) == 328
+    assert {incident[0] for incident in incidents} == {"2024-01-01"}
+    conn.close()
+
+
+def test_check_counts_main(mocker, mock_object, capsys):
+    # Mocks
+    db = mocker.patch("assignment0.queries.open_db", return_value=mock_object)
+    check_func = mocker.patch(
+        "assignment0.queries.check_nature_counts", return_value=[("Traffic Stop", 3, 2)]
+    )
+
+    # Execute
+    consistent = check_counts_main()
+
+    # Asserts
+    db.assert_called_once_with("normanpd.db")
+    check_func.assert_called_once_with(mock_object)
+    mock_object.close.assert_called_once()
+    assert consistent is False
+    assert capsys.readouterr().out == "Traffic Stop|3|2\n"
+
+
+def test_query_main(mocker, mock_object, capsys):
+    # Mocks
+    db = mocker.patch("assignment0.queries.open_db", return_value=mock_object)
+    query_func = mocker.patch(
+        "assignment0.queries.query_incidents",
+        return_value=iter([("2024-01-01", "23:14", "2024-00000215", None, "Traffic Stop", "OK0140200")]),
+    )
+
+    # Execute
+    query_main(nature="Traffic Stop", limit=10)
+
+    # Asserts
+    db.assert_called_once_with("normanpd.db")
+    query_func.assert_called_once_with(mock_object, nature="Traffic Stop", limit=10)
+    mock_object.close.assert_called_once()
+    assert capsys.readouterr().out == "2024-01-01|23:14|2024-00000215||Traffic Stop|OK0140200\n"
+
+
+def test_search_main(mocker, mock_object, capsys):
+    # Mocks
+    db = mocker.patch("assignment0.queries.open_db", return_value=mock_object)
+    search_func = mocker.patch(
+        "assignment0.queries.search_locations", return_value=[("S JAMES GARNER AVE / W APACHE ST", 12, 0.567)]
+    )
+
+    # Execute
+    search_main("james garner apache", 5)
+
+    # Asserts
+    db.assert_called_once_with("normanpd.db")
+    search_func.assert_called_once_with(mock_object, "james garner apache", 5)
+    mock_object.close.assert_called_once()
+    assert capsys.readouterr().out == "S JAMES GARNER AVE / W APACHE ST|12|0.567\n"
+
+
+def test_status_main(mocker, mock_object):
+    # Mocks
+    db = mocker.patch("assignment0.queries.open_db", return_value=mock_object)
+    status_func = mocker.patch("assignment0.queries.status")
+
+    # Execute
+    status_main()
+
+    # Asserts
+    db.assert_called_once_with("normanpd.db")
+    status_func.assert_called_once_with(mock_object)
+
+
+def test_records_main(mocker, mock_object):
+    # Mocks
+    db = mocker.patch("assignment0.queries.open_db", return_value=mock_object)
+    print_func = mocker.patch("assignment0.queries.print_record")
+
+    # Execute
+    printed = records_main()
+
+    # Asserts
+    db.assert_called_once_with("normanpd.db")
+    print_func.assert_called_once_with("resources/normanpd.db")
+    assert printed is True
+
+
+def test_archive_main(mocker, mock_object, capsys):
+    # Mocks
+    db = mocker.patch("assignment0.queries.open_db", return_value=mock_object)
+    archive_func = mocker.patch("assignment0.assignment.archive_partition", side_effect=[12, None])
+
+    # Execute
+    archived = archive_main("2024-01", "archive.db")
+    failed = archive_main("2024-13", "archive.db")
+
+    # Asserts
+    db.assert_called_with("normanpd.db")
+    archive_func.assert_any_call(mock_object, "2024-01", "archive.db")
+    assert archived is True
+    assert failed is False
+    assert mock_object.close.call_count == 2
+    assert capsys.readouterr().err == "Archived 12 incidents of 2024-01 to archive.db\n"
+
+
+def test_run_subcommands(mocker):
+    # Mocks
+    status_func = mocker.patch("assignment0.main.status_main")
+    query_func = mocker.patch("assignment0.main.query_main")
+    check_func = mocker.patch("assignment0.main.check_counts_main", return_value=False)
+    calls_func = mocker.patch("assignment0.main.calls_main")
+
+    # Execute
+    status_code = run(["status"])
+    run(["query", "--nature", "Traffic Stop", "--limit", "5"])
+    run(["calls", "--start-date", "2024-01-01", "--limit", "3"])
+    check_code = run(["check-counts"])
+
+    # Asserts
+    status_func.assert_called_once_with()
+    assert query_func.call_args.kwargs["nature"] == "Traffic Stop"
+    assert query_func.call_args.kwargs["limit"] == 5
+    calls_func.assert_called_once_with("2024-01-01", None, 3)
+    check_func.assert_called_once_with()
+    assert status_code == 0
+    assert check_code == 1
+
+
+@pytest.mark.parametrize("argv, error", [
+    (["query", "--start-time", "9"], "invalid time of the day (H:MM): 9"),
+    (["query", "--end-time", "25:99"], "invalid time of the day (H:MM): 25:99"),
+    (["query", "--start-time", "9:5"], "invalid time of the day (H:MM): 9:5"),
+    (["query", "--start-date", "2024-13-01"], "invalid date (YYYY-MM-DD): 2024-13-01"),
+    (["calls", "--end-date", "yesterday"], "invalid date (YYYY-MM-DD): yesterday"),
+    (["ingest", "--start-date", "01/02/2024"], "invalid date (YYYY-MM-DD): 01/02/2024"),
+])
+def test_run_rejects_invalid_dates_and_times(mocker, capsys, argv, error):
+    """Test invalid date and time options are rejected as usage errors before any command runs"""
+    # Mocks
+    query_func = mocker.patch("assignment0.main.query_main")
+    calls_func = mocker.patch("assignment0.main.calls_main")
+    ingest_func = mocker.patch("assignment0.main.ingest_main")
+
+    # Execute
+    with pytest.raises(SystemExit) as exit_info:
+        run(argv)
+
+    # Asserts
+    assert exit_info.value.code == 2
+    assert error in capsys.readouterr().err
+    query_func.assert_not_called()
+    calls_func.assert_not_called()
+    ingest_func.assert_not_called()
+
+
+@pytest.mark.parametrize("resources", [False, True])
+@pytest.mark.parametrize(
+    "command", [["status"], ["records"], ["query"], ["search", "main"], ["calls"], ["check-counts"]]
+)
+def test_run_read_commands_missing_db(tmp_path, monkeypatch, capsys, command, resources):
+    """Test the read-only commands fail on a missing database without creating it"""
+    # Mocks
+    monkeypatch.chdir(tmp_path)
+    if resources:
+        os.mkdir("resources")
+
+    # Execute
+    status_code = run(command)
+
+    # Asserts
+    assert status_code == 1
+    assert not os.path.exists("resources/normanpd.db")
+    assert "resources/normanpd.db does not exist" in capsys.readouterr().err
+
+
+def test_run_watch(mocker):
+    # Mocks
+    watcher_class = mocker.patch("assignment0.watch.Watcher")
+    watcher_class.return_value.run = mocker.AsyncMock()
+
+    # Execute
+    status_code = run(["watch", "--interval", "60", "--polls", "2", "--no-cache", "--no-json"])
+
+    # Asserts
+    args = watcher_class.call_args.args
+    assert args[0].startswith("https://www.normanok.gov/")
+    assert args[2] == 60
+    assert args[6] is None
+    watcher_class.return_value.run.assert_awaited_once_with(2)
+    assert status_code == 0
+
+
+def test_run_legacy_ingest(mocker):
+    # Mocks
+    ingest_func = mocker.patch("assignment0.main.ingest_main")
+
+    # Execute
+    run(["--incidents", "http://testurl.com", "--workers", "2"])
+
+    # Asserts
+    args = ingest_func.call_args.args[0]
+    assert args.command == "ingest"
+    assert args.incidents == ["http://testurl.com"]
+    assert args.workers == 2
+    assert args.cache_dir is None
+    assert args.download_parts == 4
+    assert args.dedup is False
+
+
+def test_read_commands_skip_pipeline_imports():
+    """Test the command line module and the read-only commands import neither pypdf nor the PDF pipeline"""
+    # Execute
+    result = subprocess.run(
+        [
+            sys.executable, "-c",
+            "import sys, assignment0.main; "
+            "print(sorted(set(sys.modules) & {'pypdf', 'assignment0.assignment', 'urllib.request'}))"
+        ],
+        capture_output=True, text=True, check=True,
+    )
+
+    # Asserts
+    assert result.stdout == "[]\n"
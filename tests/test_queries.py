@@ -0,0 +1,117 @@
+import os
+import pytest
+from assignment0 import assignment, queries
+
+
+@pytest.fixture
+def resources_dir(tmp_path, monkeypatch):
+    """Empty resources directory as the working directory of the test"""
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("resources")
+    return tmp_path / "resources"
+
+
+def test_open_db_current(mocker, resources_dir):
+    """Test a database of the current schema is opened without create_db"""
+    # Mocks
+    conn = assignment.create_db("normanpd.db")
+    assignment.create_indexes(conn)
+    conn.close()
+    create_func = mocker.patch("assignment0.assignment.create_db")
+
+    # Execute
+    conn = queries.open_db("normanpd.db")
+
+    # Asserts
+    create_func.assert_not_called()
+    assert conn.execute("SELECT COUNT(*) FROM nature_counts").fetchone() == (0,)
+
+
+def test_open_db_missing(mocker, resources_dir, capsys):
+    """Test a missing database is reported rather than created"""
+    # Mocks
+    create_func = mocker.patch("assignment0.assignment.create_db")
+
+    # Execute
+    conn = queries.open_db("normanpd.db")
+
+    # Asserts
+    create_func.assert_not_called()
+    assert conn is None
+    assert not os.path.exists(resources_dir / "normanpd.db")
+    assert "resources/normanpd.db does not exist" in capsys.readouterr().err
+
+
+def test_open_db_older_schema(mocker, resources_dir):
+    """Test a database of an older schema version is migrated by create_db"""
+    # Mocks
+    conn = assignment.create_db("normanpd.db")
+    conn.execute("DROP TABLE nature_counts")
+    conn.execute("PRAGMA user_version = 0")
+    conn.commit()
+    conn.close()
+
+    # Execute
+    conn = queries.open_db("normanpd.db")
+
+    # Asserts
+    assert conn.execute("SELECT name FROM sqlite_master WHERE name = 'nature_counts'").fetchone() == ("nature_counts",)
+
+
+def test_partition_table():
+    """Test reports map to the partition of their month and partitions back to their month"""
+    # Asserts
+    assert queries.partition_table("2024-01-31") == "incident_facts_2024_01"
+    assert queries.partition_table("2024-02") == "incident_facts_2024_02"
+    assert queries.partition_table("") == "incident_facts_undated"
+    assert queries.partition_month("incident_facts_2024_01") == "2024-01"
+    assert queries.partition_month("incident_facts_undated") == ""
+
+
+@pytest.mark.parametrize("start_date, end_date, pruned", [
+    ("2024-01-15", "2024-02-10", ["incident_facts_2024_01", "incident_facts_2024_02"]),
+    ("2024-02-01", None, ["incident_facts_2024_02", "incident_facts_2024_03"]),
+    (None, "2024-01-31", ["incident_facts_2024_01", "incident_facts_undated"]),
+    ("2025-01-01", None, []),
+])
+def test_prune_partitions(start_date, end_date, pruned):
+    """Test only partitions overlapping the report date range are kept"""
+    # Initialize
+    tables = ["incident_facts_2024_01", "incident_facts_2024_02", "incident_facts_2024_03", "incident_facts_undated"]
+
+    # Asserts
+    assert queries.prune_partitions(tables, start_date, end_date) == pruned
+
+
+def test_linked_calls(resources_dir):
+    """Test rows of one call listed by several agencies are grouped by time and location"""
+    # Initialize
+    conn = assignment.create_db("normanpd.db")
+    incidents = [
+        {"incident_time": "0:14", "incident_number": "2024-00000871", "incident_location": "941 HEATHER GLEN DR",
+         "incident_nature": "Medical Call Pd Requested", "incident_ori": "14005", "incident_date": "2024-01-17"},
+        {"incident_time": "0:14", "incident_number": "2024-00001103", "incident_location": "941 HEATHER GLEN DR",
+         "incident_nature": "Medical Call Pd Requested", "incident_ori": "EMSSTAT", "incident_date": "2024-01-17"},
+        {"incident_time": "0:14", "incident_number": "2024-00003584", "incident_location": "608 S FLOOD AVE",
+         "incident_nature": "Check Area", "incident_ori": "OK0140200", "incident_date": "2024-01-17"},
+        {"incident_time": "0:18", "incident_number": "2024-00000872", "incident_location": "1307 BEVERLY HILLS ST",
+         "incident_nature": "Public Assist", "incident_ori": "14005", "incident_date": "2024-01-17"},
+    ]
+    assignment.populate_db(conn, incidents, report_date="2024-01-17")
+
+    # Execute
+    calls = queries.linked_calls(conn)
+    plan = [row[3] for row in conn.execute(
+        "EXPLAIN QUERY PLAN SELECT incident_timestamp FROM incident_facts WHERE incident_timestamp IS NOT NULL "
+        "GROUP BY incident_timestamp, location_id"
+    )]
+
+    # Asserts
+    assert calls == [(
+        "2024-01-17T00:14", "941 HEATHER GLEN DR", "Medical Call Pd Requested",
+        "2024-00000871 14005, 2024-00001103 EMSSTAT"
+    )]
+    assert queries.linked_calls(conn, start_date="2024-01-18") == []
+    assert queries.linked_calls(conn, end_date="2024-01-17") == calls
+    assert plan == ["SEARCH incident_facts USING COVERING INDEX idx_incident_facts_call (incident_timestamp>?)"]
+    conn.close()
@@ -0,0 +1,78 @@
+import json
+import pickle
+from assignment0.records import Incident, incident_row, incident_timestamp, iso_date, to_json
+
+
+def make_incident():
+    """Incident built from freshly created strings"""
+    return Incident("".join(["1:05"]), "2024-00000001", "1028 LESLIE LN", "".join(["Assault ", "EMS Needed"]),
+                    "".join(["OK0140200"]), "".join(["2024-01-01"]))
+
+
+def test_incident_interns_repeated_values():
+    """Test time, nature and ORI are shared between records"""
+    # Execute
+    first, second = make_incident(), make_incident()
+
+    # Asserts
+    assert first.incident_time is second.incident_time
+    assert first.incident_nature is second.incident_nature
+    assert first.incident_ori is second.incident_ori
+    assert first.incident_date is second.incident_date
+
+
+def test_incident_reads_like_dict():
+    """Test incident records expose the incident dict keys"""
+    # Execute
+    incident = make_incident()
+
+    # Asserts
+    assert incident["incident_nature"] == "Assault EMS Needed"
+    assert incident == {"incident_time": "1:05", "incident_number": "2024-00000001",
+                        "incident_location": "1028 LESLIE LN", "incident_nature": "Assault EMS Needed",
+                        "incident_ori": "OK0140200", "incident_date": "2024-01-01"}
+    assert incident_row(incident) == incident_row(incident.as_dict())
+    try:
+        incident["report_date"]
+        assert False
+    except KeyError:
+        pass
+
+
+def test_incident_pickle_round_trip():
+    """Test incidents returned by worker processes are equal and re-interned"""
+    # Execute
+    incident = pickle.loads(pickle.dumps(make_incident()))
+
+    # Asserts
+    assert incident == make_incident()
+    assert incident.incident_nature is make_incident().incident_nature
+
+
+def test_to_json():
+    """Test incident records serialize to the same JSON as incident dicts"""
+    # Execute
+    incident = make_incident()
+
+    # Asserts
+    assert json.dumps([incident], default=to_json) == json.dumps([incident.as_dict()])
+
+
+def test_incident_timestamp():
+    """Test report dates and H:MM times combine into ISO timestamps"""
+    # Asserts
+    assert iso_date("1/1/2024") == "2024-01-01"
+    assert iso_date("12/31/2023") == "2023-12-31"
+    assert make_incident().incident_timestamp == "2024-01-01T01:05"
+    assert incident_timestamp("2024-01-01", "23:14") == "2024-01-01T23:14"
+    assert incident_timestamp("", "23:14") is None
+
+
+def test_incident_row_without_date():
+    """Test incident dicts extracted before dates were kept load with an empty date"""
+    # Initialize
+    incident = make_incident().as_dict()
+    del incident["incident_date"]
+
+    # Asserts
+    assert incident_row(incident)[-1] == ""
@@ -0,0 +1,86 @@
+import sqlite3
+import pytest
+from assignment0 import assignment
+from assignment0.vocabulary import NatureVocabulary
+
+
+@pytest.fixture
+def vocabulary():
+    """Small vocabulary of incident natures"""
+    return NatureVocabulary(["Assault", "Assault EMS Needed", "911 Call Nature Unknown", "Public Assist"])
+
+
+def test_contains(vocabulary):
+    """Test only complete natures are in the vocabulary"""
+    # Asserts
+    assert "Assault EMS Needed" in vocabulary
+    assert "EMS Needed" not in vocabulary
+    assert "Public" not in vocabulary
+
+
+def test_match_suffix_longest(vocabulary):
+    """Test the longest known nature at the end of a record is matched"""
+    # Asserts
+    assert vocabulary.match_suffix(["S", "JAMES", "GARNER", "AVE", "Assault", "EMS", "Needed"]) == 3
+    assert vocabulary.match_suffix(["S", "JAMES", "GARNER", "AVE", "Assault"]) == 1
+    assert vocabulary.match_suffix(["1028", "LESLIE", "LN", "911", "Call", "Nature", "Unknown"]) == 4
+    assert vocabulary.match_suffix(["1028", "LESLIE", "LN", "Assist"]) == 0
+
+
+def test_fingerprint(vocabulary):
+    """Test the fingerprint only changes when a new nature is added"""
+    # Initialize
+    fingerprint = vocabulary.fingerprint()
+
+    # Execute
+    vocabulary.add("Assault")
+    same = vocabulary.fingerprint()
+    vocabulary.add("Drunk Driver")
+
+    # Asserts
+    assert same == fingerprint
+    assert vocabulary.fingerprint() != fingerprint
+    assert NatureVocabulary(reversed(sorted(vocabulary.natures))).fingerprint() == vocabulary.fingerprint()
+
+
+def test_add_from_db(vocabulary):
+    """Test natures stored in the natures table are added to the vocabulary"""
+    # Initialize
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE natures(nature_id INTEGER PRIMARY KEY, incident_nature TEXT)")
+    conn.executemany("INSERT INTO natures (incident_nature) VALUES (?)", [("Drunk Driver",), ("",), ("Assault",)])
+
+    # Execute
+    vocabulary.add_from_db(conn)
+
+    # Asserts
+    assert "Drunk Driver" in vocabulary
+
+
+def test_extract_location_and_nature_known(vocabulary):
+    """Test a known nature is split off the record without the heuristics"""
+    # Initialize
+    record = ["2900", "CHAUTAUQUA", "AVE", "911", "Call", "Nature", "Unknown"]
+
+    # Execute
+    location, nature = assignment.extract_location_and_nature(record, vocabulary)
+
+    # Asserts
+    assert location == "2900 CHAUTAUQUA AVE"
+    assert nature == "911 Call Nature Unknown"
+    assert not vocabulary.unknown
+
+
+def test_extract_location_and_nature_unknown(vocabulary, capsys):
+    """Test an unknown nature falls back to the heuristics and is logged once"""
+    # Initialize
+    record = ["I35", "HWYMotorist", "Assist"]
+
+    # Execute
+    first = assignment.extract_location_and_nature(record, vocabulary)
+    second = assignment.extract_location_and_nature(record, vocabulary)
+
+    # Asserts
+    assert first == second == ("I35 HWY", "Motorist Assist")
+    assert vocabulary.unknown == {"Motorist Assist"}
+    assert capsys.readouterr().err.count("Unknown incident nature: Motorist Assist") == 1
@@ -0,0 +1,178 @@
+import asyncio
+import os
+import sqlite3
+import pytest
+from assignment0 import assignment, watch
+
+
+@pytest.fixture
+def listing(report_server):
+    """Listing page of the stand-in server linking the sample report"""
+    report_server.pages["/listing"] = (
+        b'<a href="/2024-01-01_daily_incident_summary.pdf">2024-01-01 Daily Incident Summary</a>'
+        b'<a href="/2024-01-01_daily_case_summary.pdf">2024-01-01 Daily Case Summary</a>'
+    )
+    return f"{report_server.base_url}/listing"
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Temporary working directory holding the resources directory"""
+    monkeypatch.chdir(tmp_path)
+    os.mkdir("resources")
+    return tmp_path
+
+
+def test_find_report_urls():
+    """Test incident summary links are resolved against the listing URL without duplicates"""
+    # Initialize
+    page = (
+        b'<a href="/sites/default/files/documents/2024-01/2024-01-02_daily_incident_summary.pdf">1</a>'
+        b"<a href='https://example.com/2024-01-01_daily_incident_summary.pdf'>2</a>"
+        b'<a href="/sites/default/files/documents/2024-01/2024-01-02_daily_incident_summary.pdf">3</a>'
+        b'<a href="/sites/default/files/documents/2024-01/2024-01-02_daily_arrest_summary.pdf">4</a>'
+    )
+
+    # Execute
+    urls = watch.find_report_urls(page, "https://www.normanok.gov/reports")
+
+    # Asserts
+    assert urls == [
+        "https://www.normanok.gov/sites/default/files/documents/2024-01/2024-01-02_daily_incident_summary.pdf",
+        "https://example.com/2024-01-01_daily_incident_summary.pdf",
+    ]
+
+
+def test_published_at():
+    """Test the publication time is read from the Last-Modified header"""
+    # Asserts
+    assert watch.published_at("Mon, 01 Jan 2024 06:00:00 GMT") == 1704088800
+    assert watch.published_at(None) is None
+    assert watch.published_at("yesterday") is None
+
+
+def test_watcher_ingests_new_reports(report_server, listing, workdir, capsys):
+    """Test a newly listed report is loaded once and the unchanged listing is requested conditionally"""
+    # Initialize
+    watcher = watch.Watcher(listing, "test.db", interval=0)
+
+    # Execute
+    asyncio.run(watcher.run(polls=3))
+
+    # Asserts
+    conn = sqlite3.connect("resources/test.db")
+    assert conn.execute("SELECT COUNT(*) FROM incidents").fetchone()[0] > 0
+    assert conn.execute("SELECT source FROM ingestions").fetchall() == [
+        (f"{report_server.base_url}/2024-01-01_daily_incident_summary.pdf",)
+    ]
+    paths = [path for path, _ in report_server.requests]
+    assert paths.count("/listing") == 3
+    assert paths.count("/2024-01-01_daily_incident_summary.pdf") == 1
+    assert len(watcher.latencies) == 1
+    assert watcher.latencies[0]["discovery_seconds"] > 0
+    assert watcher.latencies[0]["publication_seconds"] > 0
+    assert "after discovery" in capsys.readouterr().err
+
+
+def test_watcher_streams_reports_to_files(mocker, report_server, listing, workdir):
+    """Test reports are downloaded to files and mapped, and the downloads are removed without a download cache"""
+    # Mocks
+    fetch_func = mocker.spy(watch.backfill, "fetch_report_file")
+    map_func = mocker.spy(assignment, "map_report")
+
+    # Initialize
+    watcher = watch.Watcher(listing, "test.db", interval=0, workers=2)
+
+    # Execute
+    asyncio.run(watcher.run(polls=1))
+
+    # Asserts
+    fetch_func.assert_called_once()
+    map_func.assert_called_once_with(fetch_func.spy_return["path"])
+    assert not os.path.exists(fetch_func.spy_return["path"])
+    conn = sqlite3.connect("resources/test.db")
+    assert conn.execute("SELECT COUNT(*) FROM incidents").fetchone()[0] == 328
+    assert conn.execute("SELECT status FROM checkpoints").fetchall() == [("done",)]
+    conn.close()
+
+
+def test_watcher_skips_ingested_reports(report_server, listing, workdir):
+    """Test a restarted watcher does not fetch reports already in the ingestion ledger"""
+    # Initialize
+    asyncio.run(watch.Watcher(listing, "test.db", interval=0).run(polls=1))
+    watcher = watch.Watcher(listing, "test.db", interval=0)
+
+    # Execute
+    asyncio.run(watcher.run(polls=1))
+
+    # Asserts
+    paths = [path for path, _ in report_server.requests]
+    assert paths.count("/2024-01-01_daily_incident_summary.pdf") == 1
+    assert watcher.latencies == []
+
+
+def test_watcher_retries_failed_download(mocker, report_server, listing, workdir):
+    """Test a report whose download failed is fetched again on the next poll of an unchanged listing"""
+    # Mocks
+    mocker.patch("assignment0.backfill.time.sleep")
+    report_server.failures["/2024-01-01_daily_incident_summary.pdf"] = 4
+
+    # Initialize
+    watcher = watch.Watcher(listing, "test.db", interval=0.5)
+
+    # Execute
+    asyncio.run(watcher.run(polls=2))
+
+    # Asserts
+    paths = [path for path, _ in report_server.requests]
+    assert paths.count("/2024-01-01_daily_incident_summary.pdf") == 5
+    assert len(watcher.latencies) == 1
+    assert not watcher.failed
+    conn = sqlite3.connect("resources/test.db")
+    assert conn.execute("SELECT status FROM checkpoints").fetchall() == [("done",)]
+    conn.close()
+
+
+def test_watcher_poll_keeps_failed_reports(mocker, workdir):
+    """Test a report failing while the listing is fetched is kept for the next poll"""
+    # Initialize
+    watcher = watch.Watcher("http://listing", "test.db", interval=0)
+    watcher.failed.add("http://report/1")
+
+    def fetch_listing(*args, **kwargs):
+        # an ingest task fails while the listing is requested
+        watcher.failed.add("http://report/2")
+        return {"data": None}
+
+    mocker.patch("assignment0.backfill.fetch_report", side_effect=fetch_listing)
+    mocker.patch.object(watcher, "ingest", mocker.AsyncMock())
+
+    # Execute
+    asyncio.run(watcher.run(polls=1))
+
+    # Asserts
+    watcher.ingest.assert_awaited_once_with("http://report/1", mocker.ANY)
+    assert watcher.failed == {"http://report/2"}
+
+
+def test_watcher_records_quarantined_pages(mocker, report_server, listing, workdir):
+    """Test the pages a report skips are recorded in the quarantine table and not kept by the watcher"""
+    # Mocks
+    parse_page_text = assignment.parse_page_text
+    mocker.patch(
+        "assignment0.assignment.parse_page_text",
+        side_effect=lambda text, page_type=None: parse_page_text(text, page_type) if page_type else [][1],
+    )
+
+    # Initialize
+    watcher = watch.Watcher(listing, "test.db", interval=0)
+
+    # Execute
+    asyncio.run(watcher.run(polls=1))
+
+    # Asserts
+    conn = sqlite3.connect("resources/test.db")
+    assert conn.execute("SELECT status FROM checkpoints").fetchall() == [("done",)]
+    assert conn.execute("SELECT COUNT(*) FROM quarantine").fetchone()[0] > 0
+    conn.close()
+    assert assignment.QUARANTINED_PAGES == []